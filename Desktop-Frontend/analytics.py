@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+
+# Columns need more than this many readings to appear in the heatmap.
+HEATMAP_MIN_COUNT = 3
+# ... and a column pair more than this many shared readings to be reported in the insights.
+INSIGHT_MIN_PAIRS = 5
+STRONG_CORRELATION = 0.7
+
+
+def pairwise_corr(values):
+    """
+    Pearson correlation of every column pair of a 2-D float array, each pair
+    over the rows where both columns have a value (NaN marks a missing one),
+    like ``DataFrame.corr``. Returns ``(corr, pair_counts)``; pairs with
+    fewer than two shared rows or no variance are NaN.
+    """
+    present = ~np.isnan(values)
+    if present.all():
+        # no gaps: every pair shares every row, which one corrcoef call covers
+        n = len(values)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = np.corrcoef(values, rowvar=False) if n >= 2 else np.full((values.shape[1],) * 2, np.nan)
+        return np.clip(np.atleast_2d(corr), -1.0, 1.0), np.full((values.shape[1],) * 2, n, dtype=np.int64)
+    weights = present.astype(np.float64)
+    # centre on the column means first so the sums below do not cancel
+    filled = np.where(present, values - np.nanmean(values, axis=0), 0.0)
+
+    counts = weights.T @ weights
+    sums = filled.T @ weights  # [i, j]: sum of column i over rows shared with j
+    squares = (filled * filled).T @ weights
+    products = filled.T @ filled
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = products - sums * sums.T / counts
+        var_i = squares - sums * sums / counts
+        corr = cov / np.sqrt(var_i * var_i.T)
+    corr[counts < 2] = np.nan
+    return np.clip(corr, -1.0, 1.0), counts.astype(np.int64)
+
+
+class Analytics:
+    """
+    Numeric statistics of one (filtered) frame, computed once and shared by
+    the summary cards, charts, insights panel and PDF report.
+    """
+
+    def __init__(self, columns, values, row_count):
+        self.columns = columns
+        self.values = values
+        self.row_count = row_count
+        self.counts = (~np.isnan(values)).sum(axis=0)
+        self.means = np.nanmean(values, axis=0)
+        self.variances = np.nanvar(values, axis=0)
+        self.corr, self.pair_counts = pairwise_corr(values)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Coerce each non-datetime column to numbers once; columns with no numeric value are left out."""
+        columns, arrays = [], []
+        for c in df.columns:
+            series = df[c]
+            if pd.api.types.is_datetime64_any_dtype(series) or pd.api.types.is_bool_dtype(series):
+                continue
+            if pd.api.types.is_numeric_dtype(series):
+                arr = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            elif isinstance(series.dtype, pd.CategoricalDtype):
+                # coerce the labels, not every row
+                cats = pd.to_numeric(pd.Series(series.cat.categories, dtype=object), errors="coerce").to_numpy(np.float64)
+                if np.isnan(cats).all():
+                    continue
+                codes = series.cat.codes.to_numpy()
+                arr = np.where(codes >= 0, cats[codes], np.nan)
+            else:
+                arr = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            if not np.isnan(arr).all():
+                columns.append(c)
+                arrays.append(arr)
+        values = np.column_stack(arrays) if arrays else np.empty((len(df), 0))
+        return cls(columns, values, len(df))
+
+    def subset(self, rows):
+        """Analytics of the given rows, reusing the coerced values; columns left without readings drop out."""
+        values = self.values[rows]
+        keep = ~np.isnan(values).all(axis=0)
+        return Analytics([c for c, k in zip(self.columns, keep) if k], values[:, keep], len(values))
+
+    def mean(self, column):
+        return float(self.means[self.columns.index(column)]) if column in self.columns else None
+
+    def first_column(self, *candidates):
+        for c in candidates:
+            if c in self.columns:
+                return c
+        return None
+
+    @property
+    def flow_column(self):
+        return next((c for c in self.columns if "flow" in c.lower()), None)
+
+    def top_means(self, n=6):
+        return sorted(zip(self.columns, map(float, self.means)), key=lambda x: abs(x[1]), reverse=True)[:n]
+
+    def heatmap(self):
+        """``(labels, matrix)`` over the columns with enough readings; undefined correlations read as 0."""
+        keep = np.flatnonzero(self.counts > HEATMAP_MIN_COUNT)
+        if len(keep) < 2:
+            return [], []
+        matrix = np.nan_to_num(self.corr[np.ix_(keep, keep)], nan=0.0)
+        return [self.columns[i] for i in keep], matrix.tolist()
+
+    def trend(self, column):
+        """Least-squares slope of ``column`` against row position, or None with too few readings."""
+        y = self.values[:, self.columns.index(column)]
+        x = np.flatnonzero(~np.isnan(y)).astype(np.float64)
+        if len(x) <= 6:
+            return None
+        y = y[~np.isnan(y)]
+        dx = x - x.mean()
+        return float(dx @ (y - y.mean()) / (dx @ dx))
+
+    def insights(self):
+        if self.row_count == 0:
+            return ["No data available for insights."]
+        out = []
+        for c, var, mean in zip(self.columns, self.variances, self.means):
+            if var > (abs(mean) + 1) * 10:
+                out.append(f"High variance in {c} (var={var:.2f}).")
+
+        flow = self.flow_column
+        if flow is not None:
+            i = self.columns.index(flow)
+            for j, c in enumerate(self.columns):
+                corr = self.corr[i, j]
+                if j == i or self.pair_counts[i, j] <= INSIGHT_MIN_PAIRS or np.isnan(corr):
+                    continue
+                out.append(f"Corr Flow ↔ {c}: {corr:.2f}")
+                if abs(corr) > STRONG_CORRELATION:
+                    out.append(f"Strong correlation between Flow and {c} ({corr:.2f}).")
+            slope = self.trend(flow)
+            if slope:
+                out.append("Flow shows upward trend." if slope > 0 else "Flow shows downward trend.")
+        return out or ["No significant insights detected."]
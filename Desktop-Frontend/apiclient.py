@@ -0,0 +1,141 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_BASE = "http://127.0.0.1:8000/api/"
+# Seconds to connect, and to wait for each read of the response.
+TIMEOUT = (5, 60)
+# Kept-alive connections per host; at least the worker pool's thread count.
+POOL_SIZE = 8
+# Retries of failed connections and of 502/503/504 answers to idempotent requests.
+RETRIES = 3
+BACKOFF = 0.3
+
+
+class LoginRequired(Exception):
+    pass
+
+
+def _file_positions(kwargs):
+    """``[(file, offset)]`` for the file objects in ``files``/``data``, or None if one cannot be rewound."""
+    files = kwargs.get("files") or {}
+    values = list(files.values() if isinstance(files, dict) else (v for _, v in files))
+    values.append(kwargs.get("data"))
+    marks = []
+    for value in values:
+        f = value[1] if isinstance(value, (tuple, list)) and len(value) > 1 else value
+        if hasattr(f, "__next__") and not hasattr(f, "seek"):
+            return None  # a generator body is gone once sent
+        if not hasattr(f, "read"):
+            continue
+        try:
+            marks.append((f, f.tell()))
+        except (AttributeError, OSError):
+            return None
+        if hasattr(f, "seekable") and not f.seekable():
+            return None
+    return marks
+
+
+class APIClient:
+    """
+    Client for the equipment API shared by the window and its worker
+    threads. Requests go through one ``requests.Session``, so connections
+    are kept alive and reused instead of reopened per call; responses are
+    gzip-encoded when the server offers it. A request answered with 401 is
+    retried once with a refreshed access token, with any uploaded files
+    rewound first, and concurrent 401s share a single ``token/refresh/``
+    call. Bodies that cannot be rewound are not retried.
+    """
+
+    def __init__(self, base_url=API_BASE, timeout=TIMEOUT, pool_size=POOL_SIZE, retries=RETRIES):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.access_token = None
+        self.refresh_token = None
+        self._refresh_lock = threading.Lock()
+
+        retry = Retry(total=retries, backoff_factor=BACKOFF, status_forcelist=(502, 503, 504),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+
+    def url(self, path):
+        return path if "://" in path else self.base_url + path.lstrip("/")
+
+    @property
+    def logged_in(self):
+        return self.access_token is not None
+
+    def login(self, username, password):
+        resp = self.session.post(self.url("token/"), json={"username": username, "password": password},
+                                 timeout=self.timeout)
+        resp.raise_for_status()
+        data = resp.json()
+        with self._refresh_lock:
+            self.access_token = data.get("access")
+            self.refresh_token = data.get("refresh")
+
+    def logout(self):
+        with self._refresh_lock:
+            self.access_token = None
+            self.refresh_token = None
+
+    def close(self):
+        self.session.close()
+
+    def request(self, method, path, **kwargs):
+        """Send a request, refreshing the access token once on 401. Raises ``HTTPError`` for error statuses."""
+        kwargs.setdefault("timeout", self.timeout)
+        token = self.access_token
+        # the first attempt reads uploaded files to EOF; remember where they started to send them again
+        marks = _file_positions(kwargs)
+        resp = self._send(method, path, token, kwargs)
+        if resp.status_code == 401 and self.refresh_token and marks is not None:
+            resp.close()
+            token = self._refresh(token)
+            for f, position in marks:
+                f.seek(position)
+            resp = self._send(method, path, token, kwargs)
+        if not resp.ok:
+            resp.close()
+        resp.raise_for_status()
+        return resp
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def _send(self, method, path, token, kwargs):
+        headers = dict(kwargs.pop("headers", None) or {})
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        kwargs["headers"] = headers
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def _refresh(self, stale):
+        """A new access token for callers whose ``stale`` token was rejected; one refresh serves them all."""
+        with self._refresh_lock:
+            if self.access_token is not None and self.access_token != stale:
+                # another thread refreshed while this one waited for the lock
+                return self.access_token
+            if not self.refresh_token:
+                raise LoginRequired("Session expired - login required")
+            resp = self.session.post(self.url("token/refresh/"), json={"refresh": self.refresh_token},
+                                     timeout=self.timeout)
+            if resp.status_code != 200:
+                self.access_token = None
+                self.refresh_token = None
+                raise LoginRequired("Token refresh failed - login required")
+            data = resp.json()
+            self.access_token = data.get("access")
+            # servers that rotate refresh tokens send the next one along
+            self.refresh_token = data.get("refresh", self.refresh_token)
+            return self.access_token
@@ -0,0 +1,146 @@
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Columns with these (lower-cased) names are held as datetime64, as in the backend columnar store.
+DATE_COLUMN_NAMES = ("timestamp", "time", "date", "datetime")
+
+
+class StringPool:
+    """
+    Interns category labels so every column and dataset that uses a label
+    (the same tag name in a hundred uploads, say) holds a single copy of it.
+    """
+
+    def __init__(self):
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def intern(self, values):
+        return [self._strings.setdefault(v, v) for v in values]
+
+
+SHARED_POOL = StringPool()
+
+
+def code_dtype(size):
+    """Smallest signed integer dtype that holds codes for ``size`` labels plus -1 for missing."""
+    for dtype in ("int8", "int16", "int32"):
+        if size <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype("int64")
+
+
+class CompactDataset:
+    """
+    Column container for large equipment datasets. Text columns are held as
+    the narrowest integer codes into a pooled dictionary, floats as float32,
+    integers downcast and date columns as datetime64; pandas objects are
+    only built, and cached, when a view asks for them.
+    """
+
+    def __init__(self, num_rows, pool=SHARED_POOL):
+        self.num_rows = num_rows
+        self.pool = pool
+        self.columns = []
+        self._kinds = {}
+        self._values = {}
+        self._categories = {}
+        self._loaders = {}
+        self._series = {}
+
+    def __len__(self):
+        return self.num_rows
+
+    def _add(self, name, kind, values=None, categories=None, loader=None):
+        self.columns.append(name)
+        self._kinds[name] = kind
+        if loader is not None:
+            self._loaders[name] = loader
+        else:
+            self._set(name, values, categories)
+
+    def _set(self, name, values, categories=None):
+        self._values[name] = values
+        if categories is not None:
+            self._categories[name] = self.pool.intern(categories)
+
+    def _encode_labels(self, name, series):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        uniques = [str(v) for v in uniques]
+        self._add(name, "category", codes.astype(code_dtype(len(uniques))), uniques)
+
+    @classmethod
+    def from_frame(cls, df, date_columns=DATE_COLUMN_NAMES, pool=SHARED_POOL):
+        data = cls(len(df), pool)
+        for name in df.columns:
+            series = df[name]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy()
+                data._add(name, "category", codes.astype(code_dtype(len(series.cat.categories))),
+                          [str(v) for v in series.cat.categories])
+            elif pd.api.types.is_bool_dtype(series):
+                data._add(name, "bool", series.to_numpy())
+            elif pd.api.types.is_datetime64_any_dtype(series):
+                data._add(name, "datetime64[ns]", _datetimes(series))
+            elif pd.api.types.is_integer_dtype(series):
+                data._add(name, "int", pd.to_numeric(series, downcast="integer").to_numpy())
+            elif pd.api.types.is_numeric_dtype(series):
+                data._add(name, "float32", series.to_numpy(dtype="float32", na_value=np.nan))
+            elif str(name).lower() in date_columns and _parses_as_dates(series):
+                data._add(name, "datetime64[ns]", _datetimes(pd.to_datetime(series, errors="coerce", format="mixed", utc=True)))
+            else:
+                data._encode_labels(name, series)
+        return data
+
+    def kind(self, name):
+        return self._kinds[name]
+
+    def values(self, name):
+        """Storage array: codes for category columns, the values themselves otherwise."""
+        if name not in self._values:
+            self._set(name, *self._loaders.pop(name)())
+        return self._values[name]
+
+    def categories(self, name):
+        self.values(name)
+        return self._categories.get(name, [])
+
+    def series(self, name):
+        cached = self._series.get(name)
+        if cached is None:
+            values = self.values(name)
+            if self._kinds[name] == "category":
+                categories = pd.Index(self.categories(name), dtype="object")
+                values = pd.Categorical.from_codes(values, categories=categories, validate=False)
+            cached = self._series[name] = pd.Series(values, name=name, copy=False)
+        return cached
+
+    def to_pandas(self, columns=None, rows=None):
+        """DataFrame over ``columns`` (default all), optionally restricted to a row mask or index."""
+        names = self.columns if columns is None else [c for c in columns if c in self._kinds]
+        df = pd.DataFrame({name: self.series(name) for name in names}, columns=names, copy=False)
+        if rows is None:
+            return df
+        return df[rows] if getattr(rows, "dtype", None) == bool else df.iloc[rows]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the loaded columns; pooled labels are counted once per dataset."""
+        total = sum(values.nbytes for values in self._values.values())
+        labels = {id(s): s for cats in self._categories.values() for s in cats}
+        return total + sum(sys.getsizeof(s) for s in labels.values())
+
+
+def _parses_as_dates(series):
+    sample = series.dropna().head(100)
+    return len(sample) and pd.to_datetime(sample, errors="coerce", format="mixed", utc=True).notna().all()
+
+
+def _datetimes(series):
+    if getattr(series.dt, "tz", None) is not None:
+        series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+    return series.to_numpy(dtype="datetime64[ns]")
@@ -1,8 +1,9 @@
 # app_desktop_visualizer.py
 import sys
 import os
+import time
 import traceback
-from io import StringIO, BytesIO
+from io import BytesIO
 from datetime import datetime
 
 import requests
@@ -11,14 +12,15 @@ import numpy as np
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
-    QTableWidget, QTableWidgetItem, QFileDialog, QListWidget, QListWidgetItem,
+    QTableView, QHeaderView, QFileDialog, QListWidget, QListWidgetItem,
     QLineEdit, QMessageBox, QComboBox, QDateEdit, QGroupBox, QTextEdit
 )
-from PyQt5.QtGui import QPixmap, QIcon
-from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import Qt, QDate, QSize, QTimer
 
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
+import matplotlib.dates as mdates
 
 # Report generation
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Image as RLImage, Spacer
@@ -26,134 +28,256 @@ from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet
 
+from analytics import Analytics
+from apiclient import API_BASE, APIClient
+from compact import CompactDataset
+from filters import FilterEngine, FilterState
+from tablemodel import DatasetTableModel, WIDTH_SAMPLE_ROWS
+from thumbnails import THUMBNAIL_SIZE, ThumbnailCache
+from workers import TaskRunner
+# modules shared with the server, imported from backend/
+import shared  # noqa: F401
+from equipment.downsample import downsample
+from equipment.parsing import read_equipment_csv
+
 # ---------- CONFIG ----------
-API_BASE = "http://127.0.0.1:8000/api/"
-ACCESS_TOKEN = None
-REFRESH_TOKEN = None
+FILTER_DEBOUNCE_MS = 250  # quiet time after the last filter edit before re-filtering
+LINE_MIN_POINTS = 200  # line charts keep about one point per pixel of width, and at least this many
 
 # Path to sample asset uploaded in this session (developer provided)
 SAMPLE_ASSET = "/mnt/data/2aa20a9f-c54e-46ae-b81c-2c19379963c8.png"
 # ----------------------------
 
-# ---------------- Auth Helpers ----------------
-def auth_headers():
-    return {"Authorization": f"Bearer {ACCESS_TOKEN}"} if ACCESS_TOKEN else {}
-
-def request_with_refresh(method, url, **kwargs):
-    """
-    Performs an HTTP request with automatic token refresh on 401.
-    Raises exceptions on failure.
-    """
-    global ACCESS_TOKEN, REFRESH_TOKEN
+# ---------------- Background jobs ----------------
+# These run on TaskRunner threads: no widget access, only the client, token and progress callback.
+DOWNLOAD_CHUNK = 1 << 16
+
+def fetch_datasets(client, token, progress):
+    # newest 10, without the (potentially large) preview rows
+    resp = client.get("datasets/", params={
+        "limit": 10,
+        "summary_fields": "total_rows,columns,type_distribution,averages,sparkline",
+    })
+    payload = resp.json()
+    return payload.get("datasets", []) if isinstance(payload, dict) else payload[:10]
+
+def upload_file(client, path, token, progress):
+    with open(path, "rb") as f:
+        resp = client.post("upload/", files={"file": f}, params={"async": 1})
+    if resp.status_code == 202:
+        return wait_for_job(client, resp.json()["job_id"], token, progress)
+    return resp.json()
+
+def wait_for_job(client, job_id, token, progress, timeout=600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        token.check()
+        job = client.get(f"jobs/{job_id}/").json()
+        if job.get("status") == "done":
+            return job
+        if job.get("status") == "failed":
+            raise Exception(job.get("error") or "Ingest failed")
+        progress(f"Processing upload... {job.get('progress', 0) * 100:.0f}%")
+        token.wait(0.5)
+    raise Exception("Timed out waiting for the upload to be processed")
+
+def load_dataset_file(client, ds, token, progress):
+    """Download, parse and analyse one dataset: ``(CompactDataset, DataFrame, Analytics)``."""
+    resp = client.get(f"download/{ds['id']}/", stream=True)
     try:
-        headers = kwargs.pop("headers", {}) or {}
-        headers.update(auth_headers())
-        resp = requests.request(method, url, headers=headers, **kwargs)
-        if resp.status_code != 401:
-            resp.raise_for_status()
-            return resp
-
-        # 401 -> try refresh
-        if REFRESH_TOKEN:
-            refresh_resp = requests.post(f"{API_BASE}token/refresh/", json={"refresh": REFRESH_TOKEN})
-            if refresh_resp.status_code == 200:
-                ACCESS_TOKEN = refresh_resp.json().get("access")
-                headers.update(auth_headers())
-                resp = requests.request(method, url, headers=headers, **kwargs)
-                resp.raise_for_status()
-                return resp
-            else:
-                ACCESS_TOKEN = None
-                REFRESH_TOKEN = None
-                raise Exception("Token refresh failed - login required")
+        # The server streams the CSV bytes as text/csv (gzip is decoded by requests);
+        # older servers JSON-encoded the CSV as a single string.
+        if resp.headers.get("Content-Type", "").startswith("application/json"):
+            csv_bytes = str(resp.json()).encode()
         else:
-            resp.raise_for_status()
-    except Exception as e:
-        print("API request failed:", e)
-        traceback.print_exc()
-        raise
+            csv_bytes = _read_body(resp, token, progress)
+    finally:
+        resp.close()
+    if not csv_bytes:
+        raise Exception("Empty response for dataset")
+
+    progress("Parsing...")
+    df = read_equipment_csv(csv_bytes)
+    if df is None:
+        raise Exception("Failed to parse CSV into a DataFrame")
+    token.check()
+    # keep the compact columns; the DataFrame view over them shares their memory
+    dataset = CompactDataset.from_frame(df)
+    df = dataset.to_pandas()
+    token.check()
+    return dataset, df, Analytics.from_frame(df)
+
+def _read_body(resp, token, progress):
+    total = int(resp.headers.get("Content-Length") or 0)
+    chunks = []
+    for chunk in resp.iter_content(DOWNLOAD_CHUNK):
+        token.check()
+        chunks.append(chunk)
+        if total:
+            # Content-Length counts the bytes on the wire, which may be gzipped
+            received = getattr(resp.raw, "tell", lambda: 0)()
+            progress(f"Downloading... {min(received / total, 1) * 100:.0f}%")
+    return b"".join(chunks)
 
 # ---------------- Chart canvas helper ----------------
-class SmallCanvas(FigureCanvas):
-    def __init__(self, width=2.0, height=0.6, dpi=90):
-        fig = Figure(figsize=(width, height), dpi=dpi)
-        self.ax = fig.add_subplot(111)
-        super().__init__(fig)
-        fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
-
-    def render_to_qpixmap(self):
-        buf = BytesIO()
-        try:
-            self.figure.savefig(buf, format="png", bbox_inches='tight', dpi=120, transparent=False)
-            buf.seek(0)
-            pix = QPixmap()
-            pix.loadFromData(buf.read(), "PNG")
-            buf.close()
-            return pix
-        except Exception:
-            buf.close()
-            return QPixmap()
-
 class ChartCanvas(FigureCanvas):
+    """
+    Chart whose artists outlive a single plot: a new plot of the same kind
+    and layout (same bar labels, same heatmap columns...) only updates the
+    existing bars, line or image. Data artists are drawn with blitting over a
+    cached background, so an update that keeps the axes limits repaints just
+    the plot area; otherwise a draw_idle is queued. Hidden canvases defer
+    drawing until they are shown.
+    """
+
     def __init__(self, figsize=(5,3)):
         fig = Figure(figsize=figsize)
         self.fig = fig
         self.ax = fig.add_subplot(111)
         super().__init__(fig)
         fig.tight_layout(pad=2.0)
+        self._kind = None  # chart on the axes: "bar", "line", "pie" or "heatmap"
+        self._layout = None  # what must match for an in-place update
+        self._artists = []  # animated artists, drawn over the background
+        self._background = None
+        self._colorbar = None
+        self._pending = False
+        self._exporting = False
+        self.mpl_connect("draw_event", self._on_draw)
 
     def clear(self):
-        # preserve figure object, recreate axes
+        # keep the figure and axes; drop the chart's artists (and colorbar)
+        if self._colorbar is not None:
+            try:
+                self._colorbar.remove()
+            except Exception:
+                pass
+            self._colorbar = None
+        self.ax.cla()
+        self._kind = self._layout = self._background = None
+        self._artists = []
+
+    def _reuse(self, kind, layout):
+        """True when the axes already hold a ``kind`` chart laid out as ``layout``; otherwise start afresh."""
+        if self._kind == kind and self._layout == layout:
+            return True
+        self.clear()
+        self._kind, self._layout = kind, layout
+        return False
+
+    def _animate(self, *artists):
+        for a in artists:
+            a.set_animated(True)
+        self._artists = list(artists)
+
+    def _show_empty(self, title):
+        if not self._reuse("empty", title):
+            self.ax.set_title(title)
+            self._refresh()
+
+    def _set_title(self, title):
+        changed = self.ax.get_title() != title
+        self.ax.set_title(title)
+        return changed
+
+    def _set_limits(self, xlim=None, ylim=None):
+        """Apply axes limits; True if they moved (ticks must be redrawn)."""
+        before = (self.ax.get_xlim(), self.ax.get_ylim())
+        if xlim is not None:
+            self.ax.set_xlim(*xlim)
+        if ylim is not None:
+            self.ax.set_ylim(*ylim)
+        return before != (self.ax.get_xlim(), self.ax.get_ylim())
+
+    def _refresh(self, full=True):
+        # drawing a hidden or not yet laid out canvas is wasted (and trips Matplotlib's aspect checks)
+        if not self.isVisible() or self.width() < 10 or self.height() < 10:
+            self._pending = True
+            return
+        if full or self._background is None:
+            # the cached background is stale until that draw lands
+            self._background = None
+            self._safe_draw()
+            return
         try:
-            self.fig.clf()
-            self.ax = self.fig.add_subplot(111)
+            self.restore_region(self._background)
+            for a in self._artists:
+                self.ax.draw_artist(a)
+            self.blit(self.ax.bbox)
         except Exception:
-            # fallback: re-initialize
-            self.fig = Figure(figsize=(5,3))
-            self.ax = self.fig.add_subplot(111)
+            self._safe_draw()
+
+    def _on_draw(self, event):
+        if self._exporting:
+            return
+        self._background = self.copy_from_bbox(self.ax.bbox)
+        for a in self._artists:
+            self.ax.draw_artist(a)
 
     def _safe_draw(self):
+        self._pending = False
         try:
             # drawing can sometimes raise inside Qt if widget not visible; guard it
-            self.draw()
+            self.draw_idle()
         except Exception:
             traceback.print_exc()
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._pending:
+            self._safe_draw()
+
     def plot_bar(self, labels, values, title="", color=None):
-        self.clear()
-        if labels and values:
+        if not (labels and values):
+            self._show_empty(title)
+            return
+        full = False
+        if self._reuse("bar", (tuple(labels), color)):
+            for rect, v in zip(self._artists, values):
+                rect.set_height(v)
+        else:
+            full = True
             x = np.arange(len(labels))
-            try:
-                self.ax.bar(x, values, color=color)
-                self.ax.set_xticks(x)
-                self.ax.set_xticklabels(labels, rotation=35, ha="right", fontsize=9)
-            except Exception:
-                # fallback simple bar without labels
-                try:
-                    self.ax.bar(range(len(values)), values)
-                except Exception:
-                    pass
-        self.ax.set_title(title)
-        self._safe_draw()
-
-    def plot_line(self, xs, ys, title="", color=None):
-        self.clear()
-        if xs and ys:
-            try:
-                self.ax.plot(xs, ys, marker="o", markersize=3, color=color)
-                for label in self.ax.get_xticklabels():
-                    label.set_rotation(35)
-            except Exception:
-                # fallback: plot numeric indices
-                try:
-                    self.ax.plot(ys, marker="o", markersize=3)
-                except Exception:
-                    pass
-        self.ax.set_title(title)
-        self._safe_draw()
+            bars = self.ax.bar(x, values, color=color)
+            self.ax.set_xticks(x)
+            self.ax.set_xticklabels(labels, rotation=35, ha="right", fontsize=9)
+            self._animate(*bars.patches)
+        full |= self._set_limits(ylim=_nice_range(min(0, min(values)), max(0, max(values))))
+        full |= self._set_title(title)
+        self._refresh(full)
+
+    def plot_line(self, xs, ys, title="", color=None, method="lttb"):
+        """Plot ``ys`` against ``xs`` (numbers or datetime64, sorted), downsampled to the canvas width."""
+        if not (len(xs) and len(ys)):
+            self._show_empty(title)
+            return
+        xs, ys = downsample(xs, ys, max(LINE_MIN_POINTS, self.width()), method)
+        marker = "o" if len(xs) <= LINE_MIN_POINTS else ""
+        dates = np.asarray(xs).dtype.kind == "M"
+        full = False
+        if self._reuse("line", (dates, color)):
+            line = self._artists[0]
+            line.set_data(xs, ys)
+            line.set_marker(marker)
+        else:
+            full = True
+            line, = self.ax.plot(xs, ys, marker=marker, markersize=3, color=color)
+            if dates:
+                locator = mdates.AutoDateLocator()
+                self.ax.xaxis.set_major_locator(locator)
+                self.ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+            for label in self.ax.get_xticklabels():
+                label.set_rotation(35)
+            self._animate(line)
+        xlim = (xs[0], xs[-1]) if len(xs) > 1 else None
+        full |= self._set_limits(xlim=xlim, ylim=_nice_range(float(np.min(ys)), float(np.max(ys))))
+        full |= self._set_title(title)
+        self._refresh(full)
 
     def plot_pie(self, labels, values, title=""):
-        self.clear()
+        # wedges and their labels move with every value, so a pie is only rebuilt when its data changes
+        if self._reuse("pie", (tuple(labels), tuple(values), title)):
+            return
         if labels and values:
             try:
                 self.ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90, textprops={'fontsize':8})
@@ -161,54 +285,47 @@ class ChartCanvas(FigureCanvas):
             except Exception:
                 pass
         self.ax.set_title(title)
-        self._safe_draw()
+        self._refresh()
 
     def plot_heatmap(self, matrix, xlabels=None, ylabels=None, title=""):
-        # Avoid rendering when widget has no size yet (prevents Matplotlib aspect errors)
-        try:
-            # Use metrics from the figure canvas widget
-            w = max(1, self.width())
-            h = max(1, self.height())
-            if w < 10 or h < 10:
-                # skip plotting until visible/resized
-                return
-        except Exception:
-            pass
-
-        self.clear()
-        if matrix and len(matrix):
+        if not (matrix and len(matrix)):
+            self._show_empty(title)
+            return
+        arr = np.array(matrix)
+        xlabels = list(xlabels) if xlabels is not None else None
+        ylabels = list(ylabels) if ylabels is not None else None
+        full = False
+        if self._reuse("heatmap", (arr.shape, xlabels, ylabels)):
+            # fixed -1..1 colour scale: the colorbar and ticks stay as they are
+            self._artists[0].set_data(arr)
+        else:
+            full = True
             try:
-                arr = np.array(matrix)
                 im = self.ax.imshow(arr, cmap='RdBu', vmin=-1, vmax=1)
                 # ensure automatic aspect to avoid box_aspect/fig_aspect issues
+                self.ax.set_aspect("auto")
                 try:
-                    self.ax.set_aspect("auto")
-                except Exception:
-                    pass
-                # colorbar
-                try:
-                    self.fig.colorbar(im, ax=self.ax, fraction=0.046, pad=0.04)
+                    self._colorbar = self.fig.colorbar(im, ax=self.ax, fraction=0.046, pad=0.04)
                 except Exception:
                     pass
                 if xlabels is not None:
-                    try:
-                        self.ax.set_xticks(np.arange(len(xlabels)))
-                        self.ax.set_xticklabels(xlabels, rotation=45, ha='right', fontsize=8)
-                    except Exception:
-                        pass
+                    self.ax.set_xticks(np.arange(len(xlabels)))
+                    self.ax.set_xticklabels(xlabels, rotation=45, ha='right', fontsize=8)
                 if ylabels is not None:
-                    try:
-                        self.ax.set_yticks(np.arange(len(ylabels)))
-                        self.ax.set_yticklabels(ylabels, fontsize=8)
-                    except Exception:
-                        pass
+                    self.ax.set_yticks(np.arange(len(ylabels)))
+                    self.ax.set_yticklabels(ylabels, fontsize=8)
+                self._animate(im)
             except Exception:
                 traceback.print_exc()
-        self.ax.set_title(title)
-        self._safe_draw()
+        full |= self._set_title(title)
+        self._refresh(full)
 
     def save_png_bytes(self):
         buf = BytesIO()
+        # savefig leaves out animated artists, so render the data artists normally for the export
+        for a in self._artists:
+            a.set_animated(False)
+        self._exporting = True
         try:
             self.fig.savefig(buf, format="png", bbox_inches="tight", dpi=150)
             buf.seek(0)
@@ -216,11 +333,16 @@ class ChartCanvas(FigureCanvas):
         except Exception:
             buf.close()
             return BytesIO()
+        finally:
+            self._exporting = False
+            for a in self._artists:
+                a.set_animated(True)
 
 # ---------------- Login Window ----------------
 class LoginWindow(QWidget):
-    def __init__(self, on_login):
+    def __init__(self, client, on_login):
         super().__init__()
+        self.client = client
         self.on_login = on_login
         self.setWindowTitle("Login")
         self.resize(360,180)
@@ -236,30 +358,28 @@ class LoginWindow(QWidget):
         self.login_btn.clicked.connect(self.handle_login)
 
     def handle_login(self):
-        global ACCESS_TOKEN, REFRESH_TOKEN
         username = self.user_input.text().strip()
         password = self.pass_input.text().strip()
         if not username or not password:
             self.info_label.setText("Enter username/password")
             return
         try:
-            resp = requests.post(f"{API_BASE}token/", json={"username":username,"password":password})
-            if resp.status_code == 200:
-                data = resp.json()
-                ACCESS_TOKEN = data.get("access")
-                REFRESH_TOKEN = data.get("refresh")
-                self.on_login()
-                self.close()
-            else:
-                self.info_label.setText("Login failed")
+            self.client.login(username, password)
+        except requests.HTTPError:
+            self.info_label.setText("Login failed")
+            return
         except Exception as e:
             self.info_label.setText(f"Login error: {str(e)}")
             traceback.print_exc()
+            return
+        self.on_login()
+        self.close()
 
 # ---------------- Main Window ----------------
 class MainWindow(QWidget):
-    def __init__(self):
+    def __init__(self, client=None):
         super().__init__()
+        self.client = client or APIClient(API_BASE)
         self.setWindowTitle("Chemical Equipment Visualizer")
         self.resize(1200,820)
 
@@ -311,7 +431,13 @@ class MainWindow(QWidget):
         left_col.addWidget(filters_box)
 
         # Table
-        self.table = QTableWidget()
+        self.table_model = DatasetTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.horizontalHeader().setResizeContentsPrecision(WIDTH_SAMPLE_ROWS)
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.setSortingEnabled(True)
         left_col.addWidget(self.table)
 
         mid_layout.addLayout(left_col, 2)
@@ -355,6 +481,7 @@ class MainWindow(QWidget):
         right_col.addWidget(QLabel("History (Last 10)"))
         self.history_list = QListWidget()
         self.history_list.setMaximumHeight(220)
+        self.history_list.setIconSize(QSize(*THUMBNAIL_SIZE))
         right_col.addWidget(self.history_list)
 
         mid_layout.addLayout(right_col, 3)
@@ -378,13 +505,24 @@ class MainWindow(QWidget):
         self.start_date.dateChanged.connect(self.on_filter_change)
         self.end_date.dateChanged.connect(self.on_filter_change)
         self.type_combo.currentIndexChanged.connect(self.on_filter_change)
-        self.min_flow.editingFinished.connect(self.on_filter_change)
+        self.min_flow.textChanged.connect(self.on_filter_change)
+        # a burst of edits (typing a number, stepping a date) runs the filters once
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self._filter_timer.timeout.connect(self._apply_pending_filters)
 
         # internal state
         self.datasets = []
+        self.dataset = None
         self.current_df = None
         self.current_summary = None
-        self.filtered_df = None
+        self.filtered_view = None
+        self.analytics = None
+        self.filters = None
+        self.filter_state = None
+        self.workers = TaskRunner(self)
+        self.thumbnails = ThumbnailCache()
 
     # ---------------- UI helpers ----------------
     def _make_card(self, title, value):
@@ -412,7 +550,7 @@ class MainWindow(QWidget):
 
     # ---------------- Login flow ----------------
     def show_login(self):
-        self.login_win = LoginWindow(self.after_login)
+        self.login_win = LoginWindow(self.client, self.after_login)
         self.login_win.show()
 
     def after_login(self):
@@ -423,77 +561,50 @@ class MainWindow(QWidget):
     def upload_csv(self):
         fname, _ = QFileDialog.getOpenFileName(self,"Open CSV","","CSV Files (*.csv)")
         if not fname: return
-        try:
-            with open(fname,"rb") as f:
-                files = {"file": f}
-                request_with_refresh("POST", f"{API_BASE}upload/", files=files)
-            self.info_label.setText("Uploaded successfully")
-            self.load_latest()
-        except Exception as e:
-            QMessageBox.warning(self,"Upload Failed", str(e))
-            traceback.print_exc()
+        self.upload_btn.setEnabled(False)
+        self.info_label.setText("Uploading...")
+        self.workers.submit(lambda token, progress: upload_file(self.client, fname, token, progress),
+                            on_done=self._on_uploaded, on_error=self._on_upload_failed,
+                            on_progress=self.info_label.setText, key="upload")
+
+    def _on_uploaded(self, _):
+        self.upload_btn.setEnabled(True)
+        self.info_label.setText("Uploaded successfully")
+        self.load_latest()
+
+    def _on_upload_failed(self, e):
+        self.upload_btn.setEnabled(True)
+        self.info_label.setText("Upload failed")
+        QMessageBox.warning(self,"Upload Failed", str(e))
 
     # ---------------- Load latest / list datasets ----------------
     def load_latest(self):
-        try:
-            resp = request_with_refresh("GET", f"{API_BASE}datasets/")
-            datasets = resp.json()
-            if not datasets:
-                self.info_label.setText("No datasets available")
-                return
-            # keep last 10
-            self.datasets = datasets[:10]
-            self._update_history()
-            # load first dataset (most recent)
-            self.load_dataset(self.datasets[0])
-        except Exception as e:
-            self.info_label.setText("Failed to load datasets")
-            traceback.print_exc()
+        self.info_label.setText("Loading datasets...")
+        self.workers.submit(lambda token, progress: fetch_datasets(self.client, token, progress),
+                            on_done=self._on_datasets,
+                            on_error=lambda e: self.info_label.setText("Failed to load datasets"),
+                            key="datasets")
+
+    def _on_datasets(self, datasets):
+        if not datasets:
+            self.info_label.setText("No datasets available")
+            return
+        self.datasets = datasets
+        self._update_history()
+        # load first dataset (most recent)
+        self.load_dataset(self.datasets[0])
 
     def _update_history(self):
         self.history_list.clear()
         for ds in self.datasets:
-            icon = QIcon()
             try:
-                # attempt to build a small sparkline icon
-                pv = ds.get("summary", {}).get("preview", [])
-                series = []
-                if pv and isinstance(pv, list) and len(pv):
-                    row = pv[0]
-                    if isinstance(row, dict):
-                        for v in row.values():
-                            try:
-                                series.append(float(v))
-                            except Exception:
-                                continue
-                    elif isinstance(row, (list, tuple)):
-                        for v in row:
-                            try:
-                                series.append(float(v))
-                            except Exception:
-                                continue
-                if not series:
-                    td = ds.get("summary", {}).get("type_distribution", {})
-                    if isinstance(td, dict) and td:
-                        for v in td.values():
-                            try:
-                                series.append(float(v))
-                            except Exception:
-                                continue
-                if not series:
-                    series = list(np.random.rand(6) * 10)
-
-                sc = SmallCanvas(width=2.2, height=0.6)
-                sc.ax.plot(series, linewidth=1.2)
-                sc.ax.axis('off')
-                pix = sc.render_to_qpixmap()
-                icon.addPixmap(pix)
+                pix = self.thumbnails.thumbnail(ds)
             except Exception:
                 traceback.print_exc()
-
+                pix = None
+            icon = QIcon(pix) if pix is not None else QIcon()
             item_text = f"{ds.get('file_name','(unknown)')} — {ds.get('uploaded_at','')}"
-            it = QListWidgetItem(icon, item_text)
-            self.history_list.addItem(it)
+            self.history_list.addItem(QListWidgetItem(icon, item_text))
 
     def on_history_click(self, item):
         i = self.history_list.row(item)
@@ -503,59 +614,24 @@ class MainWindow(QWidget):
 
     # ---------------- Load a dataset ----------------
     def load_dataset(self, ds):
+        # keyed, so a newer history click cancels a load still in flight
+        self.info_label.setText(f"Loading {ds.get('file_name','dataset')}...")
+        # a filter pass still running belongs to the dataset being replaced
+        self.workers.cancel("filters")
+        self.workers.submit(lambda token, progress: load_dataset_file(self.client, ds, token, progress),
+                            on_done=lambda loaded: self._show_dataset(ds, *loaded),
+                            on_error=lambda e: self.info_label.setText(f"Failed to load dataset: {e}"),
+                            on_progress=self.info_label.setText, key="dataset")
+
+    def _show_dataset(self, ds, dataset, df, analytics):
         try:
-            resp = request_with_refresh("GET", f"{API_BASE}download/{ds['id']}/")
-            csv_text = resp.text
-
-            # Robust CSV parsing:
-            # - API may return CSV text with escaped newlines like "\\n"
-            # - Try to normalize escaped newlines and common issues
-            if csv_text is None:
-                raise Exception("Empty response for dataset")
-
-            # If the server returned a JSON-like string or the CSV was double-encoded,
-            # normalize typical escape sequences.
-            # Replace literal "\r\n" or "\n" escapes with real newlines if required.
-            if "\\r\\n" in csv_text or "\\n" in csv_text:
-                csv_text_fixed = csv_text.replace("\\r\\n", "\r\n").replace("\\n", "\n")
-            else:
-                csv_text_fixed = csv_text
-
-            # Remove possible leading/trailing quoting
-            if csv_text_fixed.startswith('"') and csv_text_fixed.endswith('"'):
-                # strip outer quotes added by some endpoints
-                csv_text_fixed = csv_text_fixed[1:-1]
-
-            # attempt to read CSV
-            df = None
-            try:
-                df = pd.read_csv(StringIO(csv_text_fixed), on_bad_lines='skip')
-            except Exception:
-                # fallback: try raw text split
-                try:
-                    lines = csv_text_fixed.splitlines()
-                    df = pd.read_csv(StringIO("\n".join(lines)), on_bad_lines='skip')
-                except Exception as e2:
-                    raise e2
-
-            # final check: if DataFrame looks wrong (single column with commas inside),
-            # try a second pass splitting values
-            if df is not None and df.shape[1] == 1:
-                first = df.iloc[0,0] if len(df) else ""
-                if isinstance(first, str) and "," in first:
-                    try:
-                        df = pd.read_csv(StringIO(csv_text_fixed.replace('\r\n', '\n')), on_bad_lines='skip')
-                    except Exception:
-                        pass
-
-            if df is None:
-                raise Exception("Failed to parse CSV into a DataFrame")
-
+            self.dataset = dataset
             self.current_df = df
+            self.filters = FilterEngine(dataset, df, analytics)
             self.current_summary = ds.get("summary", {}) or {}
 
             # fill table
-            self.populate_table(df)
+            self.populate_table(self.dataset)
 
             # populate type combo
             types = set()
@@ -584,88 +660,78 @@ class MainWindow(QWidget):
                     if pd.notna(min_d) and pd.notna(max_d):
                         qmin = QDate(min_d.year, min_d.month, min_d.day)
                         qmax = QDate(max_d.year, max_d.month, max_d.day)
-                        self.start_date.setMinimumDate(qmin)
-                        self.start_date.setMaximumDate(qmax)
-                        self.end_date.setMinimumDate(qmin)
-                        self.end_date.setMaximumDate(qmax)
+                        # one filter pass below instead of one per date change
+                        for edit in (self.start_date, self.end_date):
+                            edit.blockSignals(True)
+                            edit.setMinimumDate(qmin)
+                            edit.setMaximumDate(qmax)
                         # set default to full range
                         self.start_date.setDate(qmin)
                         self.end_date.setDate(qmax)
+                        for edit in (self.start_date, self.end_date):
+                            edit.blockSignals(False)
                 except Exception:
                     pass
 
-            # compute initial visuals
-            # ensure widget is shown/resized before heavy plotting — call apply after a short safe guard
-            self.apply_filters_and_update()
+            # initial visuals straight from the analytics computed with the load;
+            # the filter pass below only refines them if the inputs exclude rows
+            self.filter_state = FilterState(None, None, None, None)
+            self._show_view(self.filters.view(self.filter_state))
+            self._apply_pending_filters()
             self.info_label.setText(f"Loaded: {ds.get('file_name','(unknown)')}")
         except Exception as e:
             self.info_label.setText(f"Failed to load dataset: {e}")
             traceback.print_exc()
 
-    def populate_table(self, df):
-        self.table.clear()
-        self.table.setColumnCount(len(df.columns))
-        self.table.setRowCount(len(df))
-        self.table.setHorizontalHeaderLabels(df.columns.tolist())
-        for i,row in df.iterrows():
-            for j,col in enumerate(df.columns):
-                v = row[col]
-                item = QTableWidgetItem("" if pd.isna(v) else str(v))
-                self.table.setItem(i, j, item)
+    def populate_table(self, dataset):
+        self.table.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table_model.sort(-1)
+        self.table_model.set_dataset(dataset)
         self.table.resizeColumnsToContents()
 
     # ---------------- Filters and update pipeline ----------------
     def on_filter_change(self, *_):
-        self.apply_filters_and_update()
+        self._filter_timer.start()
 
-    def apply_filters_and_update(self):
-        if self.current_df is None:
-            return
-        df = self.current_df.copy()
-
-        # apply date range filter (attempt to find timestamp-like column)
-        date_col = None
-        for c in df.columns:
-            if c.lower() in ('timestamp','time','date','datetime'):
-                date_col = c; break
-        if date_col:
-            try:
-                df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-                sd = self.start_date.date().toPyDate() if self.start_date.date().isValid() else None
-                ed = self.end_date.date().toPyDate() if self.end_date.date().isValid() else None
-                if sd:
-                    df = df[df[date_col].dt.date >= sd]
-                if ed:
-                    df = df[df[date_col].dt.date <= ed]
-            except Exception:
-                pass
+    def _apply_pending_filters(self):
+        if self.current_df is not None and self._filter_state() != self.filter_state:
+            self.apply_filters_and_update()
 
-        # type filter
+    def _filter_state(self):
+        # QDateEdit always holds a valid date, so the range filter is always on when there is a date column
+        start = self.start_date.date().toPyDate() if self.start_date.date().isValid() else None
+        end = self.end_date.date().toPyDate() if self.end_date.date().isValid() else None
         sel_type = self.type_combo.currentText() if self.type_combo.currentIndex() >= 0 else "All"
-        if sel_type and sel_type != "All":
-            for c in df.columns:
-                if c.lower() == 'type' or 'type' in c.lower():
-                    df = df[df[c].astype(str) == sel_type]
-                    break
-
-        # min flow filter
         try:
             mf_text = self.min_flow.text().strip()
-            mf = float(mf_text) if mf_text else None
-            if mf is not None:
-                for c in df.columns:
-                    if 'flow' in c.lower():
-                        df = df[pd.to_numeric(df[c], errors='coerce') >= mf]
-                        break
-        except Exception:
-            pass
+            min_flow = float(mf_text) if mf_text else None
+        except ValueError:
+            min_flow = None
+        return FilterState(start, end, sel_type if sel_type and sel_type != "All" else None, min_flow)
 
-        self.filtered_df = df
-        self._update_visuals_from_df(df)
-        self._update_insights(df)
+    def apply_filters_and_update(self):
+        if self.current_df is None:
+            return
+        if self.filters is None or self.filters.dataset is not self.dataset:
+            self.filters = FilterEngine(self.dataset, self.current_df)
+        self.filter_state = state = self._filter_state()
+        filters = self.filters
+        # keyed like loads: a newer filter change cancels the pass still running
+        self.workers.submit(lambda token, progress: filters.view(state),
+                            on_done=lambda view: self._show_view(view) if filters is self.filters else None,
+                            on_error=lambda e: self.info_label.setText(f"Failed to apply filters: {e}"),
+                            key="filters")
+
+    def _show_view(self, view):
+        self.filtered_view = view
+        self.table_model.set_rows(view.rows)
+        self.analytics = view.analytics
+        # the view reads columns of the loaded frame through its rows instead of a filtered copy
+        self._update_visuals_from_df(view, view.analytics, view.derive)
+        self._update_insights(view, view.analytics)
 
     # ---------------- Visuals & insights ----------------
-    def _update_visuals_from_df(self, df):
+    def _update_visuals_from_df(self, df, analytics=None, derive=None):
         # if empty, clear charts
         if df is None or len(df) == 0:
             self._update_cards({}, 0)
@@ -676,41 +742,27 @@ class MainWindow(QWidget):
             self.heatmap.plot_heatmap([], [], [], title="Not enough numeric columns")
             return
 
+        if analytics is None:
+            analytics = Analytics.from_frame(df)
+        if derive is None:
+            derive = lambda name, build: build()  # noqa: E731
+
         # Summary cards
         avg = {}
         for label, candidates in [('flowrate_avg', ['Flowrate','flowrate','flow_rate','flowRate']),
                                   ('pressure_avg', ['Pressure','pressure']),
                                   ('temperature_avg', ['Temperature','temperature','Temp'])]:
-            vals = []
-            for c in candidates:
-                if c in df.columns:
-                    vals = pd.to_numeric(df[c], errors='coerce').dropna().tolist()
-                    if vals:
-                        break
-            avg[label] = float(np.mean(vals)) if len(vals) else None
+            avg[label] = analytics.mean(analytics.first_column(*candidates))
 
         total_rows = len(df)
         self._update_cards(avg, total_rows)
 
         # BAR 1: type distribution
-        type_counts = {}
-        for c in df.columns:
-            if c.lower() == 'type' or 'type' in c.lower():
-                s = df[c].fillna("Unknown").astype(str)
-                type_counts = s.value_counts().to_dict()
-                break
+        type_counts = derive("type_counts", lambda: _type_counts(df))
         self.bar1.plot_bar(list(type_counts.keys()), list(type_counts.values()), title="Equipment Type Distribution", color="#2563eb")
 
         # BAR 2: numeric means (top 6)
-        numeric = {}
-        for c in df.columns:
-            try:
-                arr = pd.to_numeric(df[c], errors='coerce').dropna()
-                if len(arr) > 0:
-                    numeric[c] = float(arr.mean())
-            except:
-                pass
-        top_numeric = sorted(numeric.items(), key=lambda x: abs(x[1]), reverse=True)[:6]
+        top_numeric = analytics.top_means(6)
         if top_numeric:
             labels = [k for k,_ in top_numeric]
             vals = [v for _,v in top_numeric]
@@ -719,30 +771,8 @@ class MainWindow(QWidget):
             self.bar2.plot_bar([], [], title="Top numeric means")
 
         # LINE: flow over time
-        flow_col = None
-        for c in df.columns:
-            if 'flow' in c.lower():
-                flow_col = c; break
-        time_col = None
-        for c in df.columns:
-            if c.lower() in ('timestamp','time','date','datetime'):
-                time_col = c; break
-        if flow_col and time_col:
-            tmp = df[[time_col, flow_col]].dropna()
-            try:
-                tmp[time_col] = pd.to_datetime(tmp[time_col], errors='coerce')
-                tmp = tmp.sort_values(time_col)
-                xs = tmp[time_col].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
-                ys = pd.to_numeric(tmp[flow_col], errors='coerce').fillna(0).tolist()
-                if len(xs) > 200:
-                    step = max(1, len(xs)//200)
-                    xs = xs[::step]
-                    ys = ys[::step]
-                self.line.plot_line(xs, ys, title="Flowrate Over Time")
-            except Exception:
-                self.line.plot_line([], [], title="Flowrate Over Time")
-        else:
-            self.line.plot_line([], [], title="Flowrate Over Time")
+        xs, ys = derive("flow_line", lambda: _flow_line(df))
+        self.line.plot_line(xs, ys, title="Flowrate Over Time")
 
         # PIE: reuse type_counts or numeric top
         if type_counts:
@@ -752,86 +782,21 @@ class MainWindow(QWidget):
         else:
             self.pie.plot_pie([], [], title="Distribution")
 
-        # HEATMAP: correlation between numeric columns
-        numeric_cols = []
-        numeric_data = {}
-        for c in df.columns:
-            arr = pd.to_numeric(df[c], errors='coerce').dropna()
-            if len(arr) > 3:
-                numeric_cols.append(c)
-                numeric_data[c] = arr.values
-        if len(numeric_cols) >= 2:
-            keys = numeric_cols
-            matrix = []
-            for i in range(len(keys)):
-                row = []
-                for j in range(len(keys)):
-                    a = numeric_data[keys[i]]
-                    b = numeric_data[keys[j]]
-                    n = min(len(a), len(b))
-                    if n == 0:
-                        row.append(0.0)
-                        continue
-                    a2 = a[:n]; b2 = b[:n]
-                    try:
-                        corr = float(np.corrcoef(a2, b2)[0,1])
-                    except:
-                        corr = 0.0
-                    if np.isnan(corr): corr = 0.0
-                    row.append(corr)
-                matrix.append(row)
+        # HEATMAP: pairwise-complete correlation between numeric columns
+        keys, matrix = analytics.heatmap()
+        if keys:
             # plot heatmap with safe plotting (handles invisible widget / aspect issues)
             self.heatmap.plot_heatmap(matrix, xlabels=keys, ylabels=keys, title="Correlation (Pearson)")
         else:
             self.heatmap.plot_heatmap([], [], [], title="Not enough numeric columns")
 
-    def _update_insights(self, df):
-        out = []
+    def _update_insights(self, df, analytics=None):
         if df is None or len(df) == 0:
-            out = ["No data available for insights."]
-            self.insights.setPlainText("\n".join(out))
+            self.insights.setPlainText("No data available for insights.")
             return
-
-        # detect numeric columns
-        numeric_cols = {}
-        for c in df.columns:
-            arr = pd.to_numeric(df[c], errors='coerce').dropna()
-            if len(arr) > 0:
-                numeric_cols[c] = arr.values
-
-        # high variance detection
-        for k,arr in numeric_cols.items():
-            var = float(np.var(arr))
-            mean = float(np.mean(arr))
-            if var > (abs(mean) + 1) * 10:
-                out.append(f"High variance in {k} (var={var:.2f}).")
-
-        # correlations with flow (if available)
-        flow_keys = [c for c in numeric_cols.keys() if 'flow' in c.lower()]
-        if flow_keys:
-            flow = numeric_cols[flow_keys[0]]
-            for k,arr in numeric_cols.items():
-                if k == flow_keys[0]: continue
-                n = min(len(flow), len(arr))
-                if n > 5:
-                    corr = np.corrcoef(flow[:n], arr[:n])[0,1]
-                    if not np.isnan(corr):
-                        out.append(f"Corr Flow ↔ {k}: {corr:.2f}")
-                        if abs(corr) > 0.7:
-                            out.append(f"Strong correlation between Flow and {k} ({corr:.2f}).")
-
-        # trend detection on flow
-        if flow_keys:
-            arr = numeric_cols[flow_keys[0]]
-            if len(arr) > 6:
-                x = np.arange(len(arr))
-                m, b = np.polyfit(x, arr, 1)
-                if m > 0:
-                    out.append("Flow shows upward trend.")
-                elif m < 0:
-                    out.append("Flow shows downward trend.")
-        if not out: out = ["No significant insights detected."]
-        self.insights.setPlainText("\n".join(out))
+        if analytics is None:
+            analytics = Analytics.from_frame(df)
+        self.insights.setPlainText("\n".join(analytics.insights()))
 
     # ---------------- Export charts as PNG ----------------
     def export_charts_png(self):
@@ -896,9 +861,15 @@ class MainWindow(QWidget):
             elements.append(Paragraph(summary_text, styles['Normal']))
             elements.append(Spacer(1, 8))
 
+            if self.analytics is not None:
+                elements.append(Paragraph("Insights", styles['Heading3']))
+                for line in self.analytics.insights():
+                    elements.append(Paragraph(line, styles['Normal']))
+                elements.append(Spacer(1, 8))
+
             # Add table (first N rows to keep PDF reasonable)
             max_rows = 200
-            df = self.filtered_df if self.filtered_df is not None else self.current_df
+            df = self.filtered_view if self.filtered_view is not None else self.current_df
             df_small = df.head(max_rows)
             data = [list(df_small.columns)]
             for row in df_small.itertuples(index=False):
@@ -921,23 +892,65 @@ class MainWindow(QWidget):
 
     # ---------------- Logout ----------------
     def logout(self):
-        global ACCESS_TOKEN, REFRESH_TOKEN
-        ACCESS_TOKEN = None
-        REFRESH_TOKEN = None
+        self.workers.cancel_all()
+        self.upload_btn.setEnabled(True)
+        self.client.logout()
         self.info_label.setText("Logged out")
-        self.table.clear()
+        self.table_model.set_dataset(None)
         self.bar1.plot_bar([], [], "")
         self.bar2.plot_bar([], [], "")
         self.line.plot_line([], [], "")
         self.pie.plot_pie([], [], "")
         self.heatmap.plot_heatmap([], [], [], "")
         self.history_list.clear()
+        self.dataset = None
         self.current_df = None
         self.current_summary = None
-        self.filtered_df = None
+        self.filtered_view = None
+        self.analytics = None
+        self.filters = None
+        self.filter_state = None
         self.show_login()
 
 # ---------------- Utility helpers ----------------
+def _nice_range(lo, hi):
+    """Axis limits around [lo, hi] rounded out to 1/2/2.5/5 steps, so small data changes keep the same limits."""
+    if not np.isfinite(lo) or not np.isfinite(hi):
+        return None
+    span = hi - lo or abs(hi) or 1.0
+    step = 10 ** np.floor(np.log10(span / 5))
+    step *= next(m for m in (1, 2, 2.5, 5, 10) if span / (step * m) <= 5)
+    lo, hi = float(np.floor(lo / step) * step), float(np.ceil(hi / step) * step)
+    return lo, hi if hi > lo else lo + step
+
+def _type_counts(df):
+    for c in df.columns:
+        if c.lower() == 'type' or 'type' in c.lower():
+            counts = {}
+            # counted on the categorical codes; missing types are reported as "Unknown"
+            for label, n in df[c].value_counts(dropna=False).items():
+                if n:
+                    key = "Unknown" if pd.isna(label) else str(label)
+                    counts[key] = counts.get(key, 0) + int(n)
+            return dict(sorted(counts.items(), key=lambda kv: kv[1], reverse=True))
+    return {}
+
+def _flow_line(df):
+    """Flow readings with their timestamps (datetime64), sorted by time, for ChartCanvas.plot_line."""
+    flow_col = next((c for c in df.columns if 'flow' in c.lower()), None)
+    time_col = next((c for c in df.columns if c.lower() in ('timestamp','time','date','datetime')), None)
+    if not (flow_col and time_col):
+        return [], []
+    try:
+        times = pd.to_datetime(df[time_col], errors='coerce').to_numpy(dtype="datetime64[ns]")
+        flows = pd.to_numeric(df[flow_col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        keep = ~np.isnat(times) & ~np.isnan(flows)
+        times, flows = times[keep], flows[keep]
+        order = np.argsort(times, kind="stable")
+        return times[order], flows[order]
+    except Exception:
+        return [], []
+
 def _is_number(x):
     try:
         float(x)
@@ -0,0 +1,186 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from analytics import Analytics
+from compact import DATE_COLUMN_NAMES
+
+# Filter inputs from the window; None means the filter is off.
+FilterState = namedtuple("FilterState", "start end type min_flow")
+
+MASK_CACHE_SIZE = 32
+VIEW_CACHE_SIZE = 8
+
+
+class FilterEngine:
+    """
+    Filters over one loaded dataset. Each filter column is parsed and coerced
+    once; every predicate (``start >= 2024-01-02``, ``type == Pump``...) keeps
+    its boolean mask, so changing one input recomputes one mask and ANDs it
+    with the cached others. Predicates that keep every row (such as the
+    window's default full date range) are skipped, and results are
+    memoized per ``FilterState``. ``view`` runs on worker threads, one
+    call at a time.
+    """
+
+    def __init__(self, dataset, frame, analytics=None):
+        self.dataset = dataset
+        self.frame = frame
+        self._analytics = analytics
+        names = dataset.columns
+        self.date_column = next((c for c in names if c.lower() in DATE_COLUMN_NAMES), None)
+        self.type_column = next((c for c in names if "type" in c.lower()), None)
+        self.flow_column = next((c for c in names if "flow" in c.lower()), None)
+        self._columns = {}
+        self._masks = OrderedDict()
+        self._views = OrderedDict()
+        # a cancelled pass can still be running when the next one starts
+        self._lock = threading.Lock()
+
+    @property
+    def analytics(self):
+        """Analytics of the unfiltered dataset; filtered views are row subsets of it."""
+        if self._analytics is None:
+            self._analytics = Analytics.from_frame(self.frame)
+        return self._analytics
+
+    def mask(self, state):
+        """Rows passing every active filter in ``state``, or None when no filter applies."""
+        masks = [self._mask(name, value) for name, value in state._asdict().items() if value is not None]
+        masks = [m for m in masks if m is not None]
+        if not masks:
+            return None
+        return masks[0] if len(masks) == 1 else np.logical_and.reduce(masks)
+
+    def view(self, state):
+        with self._lock:
+            return self._view(state)
+
+    def _view(self, state):
+        view = self._views.get(state)
+        if view is not None:
+            self._views.move_to_end(state)
+            return view
+        mask = self.mask(state)
+        if mask is None or mask.all():
+            view = FilteredView(None, self.frame, self.analytics)
+        else:
+            rows = np.flatnonzero(mask)
+            view = FilteredView(rows, self.frame, self.analytics.subset(rows))
+        _put(self._views, state, view, VIEW_CACHE_SIZE)
+        return view
+
+    # -- predicates --
+    def _mask(self, name, value):
+        key = (name, value)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = self._compute(name, value)
+            if mask is None:
+                return None
+            _put(self._masks, key, mask, MASK_CACHE_SIZE)
+        else:
+            self._masks.move_to_end(key)
+        return mask
+
+    def _compute(self, name, value):
+        if name in ("start", "end"):
+            days = self._column("days")
+            if days is None:
+                return None
+            day = np.datetime64(value, "D")
+            bounds = self._column("day_bounds")
+            if bounds is not None and (day <= bounds[0] if name == "start" else day >= bounds[1]):
+                return None
+            # NaT compares False, so rows without a date drop out as before
+            return days >= day if name == "start" else days <= day
+        if name == "type":
+            types = self._column("types")
+            if types is None:
+                return None
+            codes, labels = types
+            try:
+                return codes == labels.index(value)
+            except ValueError:
+                return np.zeros(len(codes), dtype=bool)
+        if name == "min_flow":
+            flows = self._column("flows")
+            return None if flows is None else flows >= value
+        raise ValueError(f"Unknown filter: {name}")
+
+    def _column(self, kind):
+        if kind not in self._columns:
+            self._columns[kind] = self._prepare(kind)
+        return self._columns[kind]
+
+    def _prepare(self, kind):
+        data = self.dataset
+        if kind == "day_bounds":
+            # first and last day, or None when some rows have no date (a range filter drops those)
+            days = self._column("days")
+            if days is None or not len(days) or np.isnat(days).any():
+                return None
+            return days.min(), days.max()
+        if kind == "days" and self.date_column is not None:
+            if data.kind(self.date_column) == "datetime64[ns]":
+                return data.values(self.date_column).astype("datetime64[D]")
+            parsed = pd.to_datetime(data.series(self.date_column).astype(object), errors="coerce", format="mixed")
+            return parsed.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+        if kind == "types" and self.type_column is not None:
+            if data.kind(self.type_column) == "category":
+                return data.values(self.type_column), list(data.categories(self.type_column))
+            codes, labels = pd.factorize(data.series(self.type_column).astype(str))
+            return codes, list(labels)
+        if kind == "flows" and self.flow_column is not None:
+            if self.flow_column in self.analytics.columns:
+                return self.analytics.values[:, self.analytics.columns.index(self.flow_column)]
+            return np.full(len(data), np.nan)
+        return None
+
+
+class FilteredView:
+    """
+    One filter state's rows (None for all) of the loaded frame and their
+    analytics, plus whatever charts derive from them. Columns are taken
+    from the loaded frame on demand, so a view never copies the whole frame.
+    """
+
+    def __init__(self, rows, source, analytics):
+        self.rows = rows
+        self.source = source
+        self.analytics = analytics
+        self.derived = {}
+        self._frame = None
+
+    def __len__(self):
+        return len(self.source) if self.rows is None else len(self.rows)
+
+    @property
+    def columns(self):
+        return self.source.columns
+
+    def __getitem__(self, column):
+        series = self.source[column]
+        return series if self.rows is None else series.take(self.rows)
+
+    def head(self, n):
+        return self.source.take(self.rows[:n]) if self.rows is not None else self.source.head(n)
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = self.source if self.rows is None else self.source.take(self.rows)
+        return self._frame
+
+    def derive(self, name, build):
+        if name not in self.derived:
+            self.derived[name] = build()
+        return self.derived[name]
+
+
+def _put(cache, key, value, size):
+    cache[key] = value
+    if len(cache) > size:
+        cache.popitem(last=False)
@@ -0,0 +1,12 @@
+"""
+Puts ``backend/`` on the import path so the desktop app uses the server's
+own Django-free modules (``equipment.parsing``, ``equipment.downsample``)
+instead of copies of them.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "backend"))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
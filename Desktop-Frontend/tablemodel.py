@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+# Rows looked at when sizing columns to their contents (Qt's default is 1000).
+WIDTH_SAMPLE_ROWS = 200
+
+_NUMERIC_ALIGNMENT = int(Qt.AlignRight | Qt.AlignVCenter)
+
+
+class DatasetTableModel(QAbstractTableModel):
+    """
+    Table model over a ``CompactDataset``. Nothing is formatted up front:
+    cells are turned into text when the view asks for them, so only the
+    visible rows cost anything. Filtering and sorting permute an index of
+    dataset rows with numpy instead of moving cells around.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._dataset = None
+        self._columns = []
+        self._filtered = np.arange(0)  # dataset rows passing the filter, in dataset order
+        self._rows = self._filtered  # the same rows in display order
+        self._sort = (-1, Qt.AscendingOrder)
+        self._keys = {}
+
+    def set_dataset(self, dataset):
+        self.beginResetModel()
+        self._dataset = dataset
+        self._keys = {}
+        self._columns = list(dataset.columns) if dataset is not None else []
+        self._filtered = np.arange(len(dataset) if dataset is not None else 0)
+        self._rows = self._ordered(self._filtered)
+        self.endResetModel()
+
+    def set_rows(self, rows):
+        """Show only these dataset rows (a boolean mask, positions or None for all), keeping the current sort."""
+        if rows is None:
+            rows = np.arange(len(self._dataset) if self._dataset is not None else 0)
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        self.beginResetModel()
+        self._filtered = rows.astype(np.intp, copy=False)
+        self._rows = self._ordered(self._filtered)
+        self.endResetModel()
+
+    def dataset_row(self, row):
+        return int(self._rows[row])
+
+    # -- QAbstractTableModel --
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        name = self._columns[index.column()]
+        if role == Qt.DisplayRole:
+            return self._format(name, self._rows[index.row()])
+        if role == Qt.TextAlignmentRole and self._dataset.kind(name) in ("float32", "int"):
+            return _NUMERIC_ALIGNMENT
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return str(self._columns[section])
+        return str(self._rows[section] + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self._sort = (column, order)
+        self._rows = self._ordered(self._filtered)
+        self.layoutChanged.emit()
+
+    # -- helpers --
+    def _format(self, name, row):
+        values = self._dataset.values(name)
+        value = values[row]
+        kind = self._dataset.kind(name)
+        if kind == "category":
+            return self._dataset.categories(name)[value] if value >= 0 else ""
+        if kind == "float32":
+            return "" if np.isnan(value) else str(value)
+        if kind == "datetime64[ns]":
+            return "" if np.isnat(value) else str(pd.Timestamp(value))
+        return str(value)
+
+    def _ordered(self, rows):
+        column, order = self._sort
+        if column < 0 or column >= len(self._columns) or not len(rows):
+            return rows
+        name = self._columns[column]
+        if name not in self._keys:
+            self._keys[name] = self._sort_keys(name)
+        keys, missing = self._keys[name]
+        keys, missing = keys[rows], missing[rows]
+        if order == Qt.DescendingOrder:
+            keys = -keys
+        present = rows[~missing]
+        # stable, so equal keys keep dataset order; blanks always go last
+        return np.concatenate([present[np.argsort(keys[~missing], kind="stable")], rows[missing]])
+
+    def _sort_keys(self, name):
+        values = self._dataset.values(name)
+        kind = self._dataset.kind(name)
+        if kind == "category":
+            labels = self._dataset.categories(name)
+            rank = np.empty(len(labels), dtype=np.int64)
+            rank[np.argsort(np.array(labels, dtype=object), kind="stable")] = np.arange(len(labels))
+            missing = values < 0
+            return np.where(missing, 0, rank[np.where(missing, 0, values)] if len(labels) else 0), missing
+        if kind == "datetime64[ns]":
+            missing = np.isnat(values)
+            return np.where(missing, 0, values.view(np.int64)), missing
+        if kind == "float32":
+            missing = np.isnan(values)
+            return np.where(missing, 0, values), missing
+        return values.astype(np.int64), np.zeros(len(values), dtype=bool)
@@ -0,0 +1,569 @@
+"""
+Tests for the desktop helper modules. Run from this folder:
+
+    QT_QPA_PLATFORM=offscreen python -m unittest tests
+"""
+import importlib.util
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import requests
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication
+
+import shared
+from analytics import Analytics, pairwise_corr
+from apiclient import APIClient, LoginRequired
+from compact import SHARED_POOL, CompactDataset, StringPool
+from filters import FilterEngine, FilterState
+from tablemodel import DatasetTableModel
+from thumbnails import THUMBNAIL_SIZE, ThumbnailCache, thumbnail_for
+from workers import Cancelled, TaskRunner
+
+app = QApplication.instance() or QApplication([])
+
+
+def load_desk_app():
+    # the window module's file name is not importable as is
+    spec = importlib.util.spec_from_file_location("desk_app", os.path.join(os.path.dirname(__file__), "desk-app.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def equipment_frame(rows=200, start="2024-01-01", freq="17min", seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Equipment Name": [f"P-{i % 7}" for i in range(rows)],
+        "Type": rng.choice(["Pump", "Valve", "Compressor"], rows),
+        "Flowrate": rng.normal(120, 25, rows).round(3),
+        "Pressure": rng.normal(6, 1.5, rows).round(3),
+        "Temperature": rng.normal(110, 12, rows).round(3),
+        "Timestamp": pd.date_range(start, periods=rows, freq=freq),
+    })
+    # a few gaps, as in real exports
+    df.loc[6::13, "Flowrate"] = np.nan
+    df.loc[8::29, "Type"] = None
+    return df
+
+
+class AnalyticsTests(unittest.TestCase):
+    def test_pairwise_corr_matches_pandas(self):
+        df = equipment_frame(rows=300)[["Flowrate", "Pressure", "Temperature"]]
+        df.loc[::5, "Pressure"] = np.nan
+        corr, counts = pairwise_corr(df.to_numpy())
+        np.testing.assert_allclose(corr, df.corr().to_numpy(), atol=1e-12)
+        self.assertEqual(counts[0, 1], (df["Flowrate"].notna() & df["Pressure"].notna()).sum())
+
+    def test_from_frame(self):
+        df = equipment_frame(rows=120).assign(Code=lambda d: pd.Categorical(["1", "2", "x"] * 40))
+        analytics = Analytics.from_frame(df)
+        # text, dates and all-text categories are left out; numeric labels are coerced
+        self.assertEqual(analytics.columns, ["Flowrate", "Pressure", "Temperature", "Code"])
+        self.assertEqual(analytics.row_count, 120)
+        self.assertAlmostEqual(analytics.mean("Flowrate"), df["Flowrate"].mean(), places=9)
+        self.assertAlmostEqual(analytics.mean("Code"), 1.5)
+        self.assertIsNone(analytics.mean("Type"))
+        self.assertEqual(analytics.flow_column, "Flowrate")
+
+    def test_heatmap_and_insights(self):
+        df = equipment_frame(rows=200)
+        df["Sparse"] = np.nan
+        df.loc[:2, "Sparse"] = 1.0
+        labels, matrix = Analytics.from_frame(df).heatmap()
+        self.assertEqual(labels, ["Flowrate", "Pressure", "Temperature"])
+        self.assertEqual(np.diag(matrix).tolist(), [1.0, 1.0, 1.0])
+
+        trending = pd.DataFrame({"Flowrate": np.arange(50.0), "Pressure": np.arange(50.0) * 2})
+        insights = Analytics.from_frame(trending).insights()
+        self.assertIn("Strong correlation between Flow and Pressure (1.00).", insights)
+        self.assertIn("Flow shows upward trend.", insights)
+        self.assertEqual(Analytics.from_frame(trending.iloc[:0]).insights(), ["No data available for insights."])
+
+
+class CompactDatasetTests(unittest.TestCase):
+    def test_from_frame(self):
+        df = equipment_frame(rows=120).assign(Timestamp=lambda d: d["Timestamp"].astype(str), Batch=7)
+        data = CompactDataset.from_frame(df)
+        self.assertEqual([data.kind(c) for c in data.columns],
+                         ["category", "category", "float32", "float32", "float32", "datetime64[ns]", "int"])
+        self.assertEqual(data.values("Type").dtype, np.int8)
+        self.assertEqual(data.values("Batch").dtype, np.int8)
+        self.assertEqual(data.values("Type")[8], -1)
+        back = data.to_pandas()
+        np.testing.assert_allclose(back["Pressure"], df["Pressure"], rtol=1e-6)
+        self.assertEqual(back["Timestamp"].tolist(), pd.to_datetime(df["Timestamp"]).tolist())
+        self.assertEqual(back["Equipment Name"].astype(str).tolist(), df["Equipment Name"].tolist())
+        self.assertLess(data.nbytes, df.memory_usage(deep=True).sum() / 4)
+
+    def test_mixed_offsets(self):
+        data = CompactDataset.from_frame(pd.DataFrame({"Timestamp": ["2024-03-01T10:00:00+02:00",
+                                                                     "2024-03-01T09:30:00Z"]}))
+        self.assertEqual(data.series("Timestamp").dt.strftime("%H:%M").tolist(), ["08:00", "09:30"])
+
+    def test_pools(self):
+        # loaded datasets share one label pool unless another is passed in
+        df = equipment_frame(rows=20)
+        first, second = CompactDataset.from_frame(df), CompactDataset.from_frame(df.copy())
+        self.assertIs(first.pool, SHARED_POOL)
+        self.assertIs(first.categories("Equipment Name")[0], second.categories("Equipment Name")[0])
+        pool = StringPool()
+        own = CompactDataset.from_frame(df, pool=pool)
+        self.assertIs(own.pool, pool)
+        self.assertEqual(len(pool), len(set(df["Equipment Name"]) | set(df["Type"].dropna())))
+
+
+class SharedModuleTests(unittest.TestCase):
+    def test_server_modules_are_used_directly(self):
+        # one implementation each: the desktop imports them from backend/ rather than keeping copies
+        import equipment.downsample
+        import equipment.parsing
+        desk_app = load_desk_app()
+        for module, name in ((equipment.parsing, "read_equipment_csv"), (equipment.downsample, "downsample")):
+            with self.subTest(module=module.__name__):
+                self.assertEqual(os.path.dirname(module.__file__), os.path.join(shared.BACKEND_DIR, "equipment"))
+                self.assertIs(getattr(desk_app, name), getattr(module, name))
+                local = os.path.join(os.path.dirname(__file__), module.__name__.rsplit(".", 1)[1] + ".py")
+                self.assertFalse(os.path.exists(local))
+
+
+class FilterEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.frame = equipment_frame(rows=400, freq="41min")
+        self.frame.loc[3, "Timestamp"] = pd.NaT
+        dataset = CompactDataset.from_frame(self.frame)
+        self.engine = FilterEngine(dataset, dataset.to_pandas())
+
+    def expected(self, state):
+        df = self.frame
+        keep = pd.Series(True, index=df.index)
+        if state.start is not None:
+            keep &= df["Timestamp"].dt.normalize() >= state.start
+        if state.end is not None:
+            keep &= df["Timestamp"].dt.normalize() <= state.end
+        if state.type is not None:
+            keep &= df["Type"] == state.type
+        if state.min_flow is not None:
+            keep &= df["Flowrate"].astype(np.float32) >= state.min_flow
+        return keep.to_numpy()
+
+    def test_masks_match_pandas(self):
+        for state in (FilterState("2024-01-02", None, None, None),
+                      FilterState(None, "2024-01-03", "Pump", None),
+                      FilterState("2024-01-02", "2024-01-05", "Valve", 110.0),
+                      FilterState(None, None, "Turbine", None),
+                      FilterState(None, None, None, 130.5)):
+            with self.subTest(state=state):
+                mask = self.engine.mask(state)
+                np.testing.assert_array_equal(mask, self.expected(state))
+        self.assertIsNone(self.engine.mask(FilterState(None, None, None, None)))
+
+    def test_views(self):
+        state = FilterState("2024-01-02", None, "Pump", None)
+        view = self.engine.view(state)
+        self.assertIs(self.engine.view(state), view)
+        expected = self.frame[self.expected(state)]
+        self.assertEqual(view.rows.tolist(), expected.index.tolist())
+        self.assertEqual(len(view), len(expected))
+        self.assertEqual(view["Type"].tolist(), expected["Type"].astype(object).tolist())
+        self.assertEqual(len(view.frame), len(expected))
+        self.assertEqual(view.analytics.row_count, len(expected))
+        self.assertAlmostEqual(view.analytics.mean("Pressure"), expected["Pressure"].mean(), places=5)
+
+        unfiltered = self.engine.view(FilterState(None, None, None, None))
+        self.assertIsNone(unfiltered.rows)
+        self.assertIs(unfiltered.analytics, self.engine.analytics)
+        self.assertEqual(unfiltered.derive("count", lambda: 1), 1)
+        self.assertEqual(unfiltered.derive("count", lambda: 2), 1)
+
+    def test_full_range_is_unfiltered(self):
+        rows = 1_000_000
+        frame = pd.DataFrame({"Type": np.where(np.arange(rows) % 3, "Pump", "Valve"),
+                              "Flowrate": np.linspace(80, 160, rows),
+                              "Timestamp": pd.date_range("2024-01-01", periods=rows, freq="min")})
+        dataset = CompactDataset.from_frame(frame)
+        engine = FilterEngine(dataset, dataset.to_pandas())
+        engine.analytics
+        # the window's default: the date range spans the whole dataset
+        state = FilterState(frame["Timestamp"].iloc[0].date(), frame["Timestamp"].iloc[-1].date(), None, None)
+        started = time.perf_counter()
+        view = engine.view(state)
+        elapsed = time.perf_counter() - started
+        self.assertIsNone(view.rows)
+        self.assertIs(view.analytics, engine.analytics)
+        self.assertLess(elapsed, 0.05)
+        # a filter every row passes is unfiltered as well
+        self.assertIsNone(engine.view(state._replace(min_flow=50.0)).rows)
+        # rows without a date still drop out of a full range (setUp's frame has one)
+        full = FilterState(self.frame["Timestamp"].min().date(), self.frame["Timestamp"].max().date(), None, None)
+        self.assertEqual(len(self.engine.view(full)), len(self.frame) - 1)
+
+
+class TableModelTests(unittest.TestCase):
+    def setUp(self):
+        self.frame = equipment_frame(rows=60)
+        self.model = DatasetTableModel()
+        self.model.set_dataset(CompactDataset.from_frame(self.frame))
+
+    def cell(self, row, column):
+        return self.model.data(self.model.index(row, column))
+
+    def test_counts_and_cells(self):
+        self.assertEqual((self.model.rowCount(), self.model.columnCount()), (60, 6))
+        self.assertEqual(self.model.headerData(2, Qt.Horizontal), "Flowrate")
+        self.assertEqual(self.cell(1, 0), "P-1")
+        # gaps show as blank cells
+        self.assertEqual(self.cell(6, 2), "")
+        self.assertEqual(self.cell(8, 1), "")
+        self.assertEqual(self.cell(0, 5), "2024-01-01 00:00:00")
+
+        self.model.set_dataset(None)
+        self.assertEqual((self.model.rowCount(), self.model.columnCount()), (0, 0))
+
+    def test_filter_and_sort(self):
+        mask = (self.frame["Type"] == "Pump").to_numpy()
+        self.model.set_rows(mask)
+        self.assertEqual(self.model.rowCount(), mask.sum())
+
+        self.model.sort(4, Qt.DescendingOrder)
+        expected = self.frame[mask].sort_values("Temperature", ascending=False, kind="stable").index
+        self.assertEqual([self.model.dataset_row(r) for r in range(self.model.rowCount())], expected.tolist())
+        # a new filter keeps the sort
+        self.model.set_rows(np.arange(10))
+        rows = [self.model.dataset_row(r) for r in range(10)]
+        self.assertEqual(rows, self.frame.iloc[:10].sort_values("Temperature", ascending=False).index.tolist())
+        self.assertEqual(self.model.headerData(0, Qt.Vertical), str(rows[0] + 1))
+
+    def test_blanks_sort_last(self):
+        self.model.sort(2, Qt.AscendingOrder)
+        rows = [self.model.dataset_row(r) for r in range(60)]
+        flow = self.frame["Flowrate"]
+        self.assertEqual(rows[-flow.isna().sum():], flow[flow.isna()].index.tolist())
+        self.assertEqual(flow[rows[:-flow.isna().sum()]].tolist(), sorted(flow.dropna()))
+
+
+class TaskRunnerTests(unittest.TestCase):
+    def setUp(self):
+        self.runner = TaskRunner()
+        self.addCleanup(self.runner.pool.waitForDone)
+        self.results, self.errors = [], []
+
+    def wait_for(self, condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, "timed out")
+            app.processEvents()
+            time.sleep(0.005)
+
+    def submit(self, fn, key="load"):
+        return self.runner.submit(fn, on_done=self.results.append, on_error=self.errors.append, key=key)
+
+    def test_result_is_delivered(self):
+        progress = []
+        self.runner.submit(lambda token, report: report(0.5) or 42, on_done=self.results.append,
+                           on_progress=progress.append, key="load")
+        self.assertTrue(self.runner.busy("load"))
+        self.wait_for(lambda: not self.runner.busy("load"))
+        self.assertEqual((self.results, progress), ([42], [0.5]))
+
+    def test_newer_task_cancels_older_one(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow(token, report):
+            started.set()
+            release.wait(5)
+            return "stale"
+
+        first = self.submit(slow)
+        self.assertTrue(started.wait(5))
+        second = self.submit(lambda token, report: "fresh")
+        self.assertTrue(first.token.cancelled)
+        self.wait_for(lambda: self.results)
+        release.set()
+        self.runner.pool.waitForDone()
+        app.processEvents()
+        # the older task finished its work, but its result is dropped
+        self.assertEqual(self.results, ["fresh"])
+        self.assertFalse(second.token.cancelled)
+        self.assertFalse(self.runner.busy("load"))
+
+    def test_cancel_stops_a_checking_task(self):
+        checked = threading.Event()
+
+        def loop(token, report):
+            while True:
+                token.check()
+                checked.set()
+                token.wait(0.01)
+
+        task = self.submit(loop)
+        self.assertTrue(checked.wait(5))
+        self.runner.cancel("load")
+        self.assertTrue(task.token.cancelled)
+        self.runner.pool.waitForDone()
+        app.processEvents()
+        self.assertEqual((self.results, self.errors), ([], []))
+        with self.assertRaises(Cancelled):
+            task.token.check()
+
+    def test_errors_are_reported(self):
+        def broken(token, report):
+            raise ValueError("bad file")
+
+        with mock.patch("workers.traceback.print_exc"):
+            self.submit(broken)
+            self.wait_for(lambda: self.errors)
+        self.assertEqual(str(self.errors[0]), "bad file")
+        self.assertEqual(self.results, [])
+
+
+class ChartCanvasTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.desk_app = load_desk_app()
+
+    def setUp(self):
+        self.canvas = self.desk_app.ChartCanvas()
+        self.canvas.resize(400, 300)
+        self.canvas.show()
+        self.addCleanup(self.canvas.close)
+
+    def test_bars_are_updated_in_place(self):
+        self.canvas.plot_bar(["Pump", "Valve"], [3, 5], "Types")
+        bars = list(self.canvas._artists)
+        self.canvas.plot_bar(["Pump", "Valve"], [4, 2], "Types")
+        self.assertEqual(self.canvas._artists, bars)
+        self.assertEqual([b.get_height() for b in bars], [4, 2])
+        self.canvas.plot_bar(["Pump", "Valve", "Compressor"], [1, 2, 3], "Types")
+        self.assertEqual(len(self.canvas._artists), 3)
+
+    def test_heatmap_keeps_one_colorbar(self):
+        for shift in (0.0, 0.1, 0.2):
+            self.canvas.plot_heatmap([[1.0, shift], [shift, 1.0]], ["a", "b"], ["a", "b"], "Correlation")
+        self.assertEqual(len(self.canvas.fig.axes), 2)
+        self.assertEqual(self.canvas._artists[0].get_array()[0, 1], 0.2)
+
+    def test_hidden_canvas_defers_drawing(self):
+        self.canvas.hide()
+        self.canvas.plot_line(np.arange(500.0), np.sin(np.arange(500.0)), "Flow")
+        self.assertTrue(self.canvas._pending)
+        # exports still contain the animated data artists
+        self.assertGreater(len(self.canvas.save_png_bytes().getvalue()), 1000)
+        self.assertTrue(self.canvas._artists[0].get_animated())
+        self.canvas.show()
+        self.assertFalse(self.canvas._pending)
+
+
+class MainWindowTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.desk_app = load_desk_app()
+
+    def setUp(self):
+        self.window = self.desk_app.MainWindow(client=mock.Mock())
+        self.addCleanup(self.window.close)
+        self.addCleanup(self.window.workers.pool.waitForDone)
+        self.frame = equipment_frame(rows=300)
+        self.dataset = CompactDataset.from_frame(self.frame)
+        self.df = self.dataset.to_pandas()
+
+    def wait_for_filters(self, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while self.window.workers.busy("filters"):
+            self.assertLess(time.monotonic(), deadline, "timed out")
+            app.processEvents()
+            time.sleep(0.005)
+
+    def test_filters_run_off_the_gui_thread(self):
+        loaded = Analytics.from_frame(self.df)
+        gui = threading.current_thread()
+        threads = []
+        subset = Analytics.subset
+
+        def record(analytics, rows):
+            threads.append(threading.current_thread())
+            return subset(analytics, rows)
+
+        with mock.patch.object(Analytics, "subset", record), \
+                mock.patch.object(Analytics, "from_frame", side_effect=AssertionError("recomputed")):
+            self.window._show_dataset({"file_name": "plant.csv"}, self.dataset, self.df, loaded)
+            # the loaded analytics are shown at once; the window's date range keeps every row
+            self.assertIs(self.window.analytics, loaded)
+            self.wait_for_filters()
+            self.assertIs(self.window.analytics, loaded)
+
+            self.window.type_combo.setCurrentText("Pump")
+            self.window.apply_filters_and_update()
+            self.wait_for_filters()
+        self.assertEqual(self.window.analytics.row_count, int((self.frame["Type"] == "Pump").sum()))
+        self.assertEqual(self.window.table_model.rowCount(), self.window.analytics.row_count)
+        self.assertTrue(threads)
+        self.assertNotIn(gui, threads)
+
+
+class ThumbnailTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="thumbnails-")
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_kind_follows_summary(self):
+        kind, pix = thumbnail_for({"sparkline": [1.0, 3.0, 2.0], "type_distribution": {"Pump": 2}})
+        self.assertEqual(kind, "line")
+        self.assertEqual((pix.width(), pix.height()), THUMBNAIL_SIZE)
+        self.assertEqual(thumbnail_for({"type_distribution": {"Pump": 2, "Valve": 1}})[0], "bars")
+        self.assertIsNone(thumbnail_for({"sparkline": [1.0]}))
+        self.assertIsNone(thumbnail_for(None))
+
+    def test_cache_hits_and_misses(self):
+        cache = ThumbnailCache(self.directory)
+        ds = {"id": 7, "summary": {"sparkline": [1.0, 2.0, 4.0]}}
+        self.assertIsNotNone(cache.thumbnail(ds))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        with mock.patch("thumbnails.thumbnail_for", side_effect=AssertionError("redrawn")):
+            self.assertIsNotNone(cache.thumbnail(ds))
+        self.assertIsNone(cache.thumbnail({"id": 8, "summary": {}}))
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = ThumbnailCache(self.directory)
+        summary = {"sparkline": [1.0, 2.0, 0.5]}  # same picture, so every file has the same size
+        for i in range(3):
+            cache.thumbnail({"id": i, "summary": summary})
+            path = cache.path(f"{i}-line-{THUMBNAIL_SIZE[0]}x{THUMBNAIL_SIZE[1]}")
+            os.utime(path, (1000 + i, 1000 + i))
+        size = os.path.getsize(path)
+        cache.get(f"0-line-{THUMBNAIL_SIZE[0]}x{THUMBNAIL_SIZE[1]}")  # now the most recent
+        cache.max_bytes = size * 3
+        cache.thumbnail({"id": 3, "summary": summary})
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         sorted(os.path.basename(cache.path(f"{i}-line-{THUMBNAIL_SIZE[0]}x{THUMBNAIL_SIZE[1]}"))
+                                for i in (0, 2, 3)))
+
+
+def api_response(status, body=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp._content = json.dumps(body or {}).encode()
+    resp.raw = io.BytesIO()
+    return resp
+
+
+class FakeSession:
+    """Stands in for requests.Session: "fresh" is the only access token the API accepts."""
+
+    def __init__(self, refresh_delay=0.0, refresh_status=200):
+        self.refresh_delay = refresh_delay
+        self.refresh_status = refresh_status
+        self.refreshes = 0
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None):
+        if url.endswith("token/"):
+            return api_response(200, {"access": "stale", "refresh": "r1"})
+        with self.lock:
+            self.refreshes += 1
+        time.sleep(self.refresh_delay)
+        return api_response(self.refresh_status, {"access": "fresh"})
+
+    def request(self, method, url, headers=None, **kwargs):
+        files = kwargs.get("files") or {}
+        with self.lock:
+            self.sent.append((headers.get("Authorization"), {k: f.read() for k, f in files.items()}))
+        return api_response(200 if headers.get("Authorization") == "Bearer fresh" else 401, {"ok": True})
+
+
+class APIClientTests(unittest.TestCase):
+    def client(self, **session):
+        client = APIClient(base_url="http://api.test/api/")
+        client.session = FakeSession(**session)
+        client.login("tester", "secret")
+        return client
+
+    def test_expired_token_is_refreshed_once(self):
+        client = self.client()
+        self.assertEqual(client.get("datasets/").json(), {"ok": True})
+        self.assertEqual(client.access_token, "fresh")
+        self.assertEqual([auth for auth, _ in client.session.sent], ["Bearer stale", "Bearer fresh"])
+
+    def test_concurrent_401s_share_one_refresh(self):
+        client = self.client(refresh_delay=0.05)
+        start = threading.Barrier(6)
+        statuses = []
+
+        def call():
+            start.wait()
+            statuses.append(client.get("datasets/").status_code)
+
+        threads = [threading.Thread(target=call) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(statuses, [200] * 6)
+        self.assertEqual(client.session.refreshes, 1)
+
+    def test_uploads_are_rewound_for_the_retry(self):
+        client = self.client()
+        client.post("upload/", files={"file": io.BytesIO(b"Type,Flowrate\nPump,1\n")})
+        self.assertEqual([files["file"] for _, files in client.session.sent], [b"Type,Flowrate\nPump,1\n"] * 2)
+
+        # a generator body is gone once sent, so the 401 is surfaced instead
+        client = self.client()
+        with self.assertRaises(requests.HTTPError):
+            client.post("upload/", data=(chunk for chunk in [b"a", b"b"]))
+        self.assertEqual(len(client.session.sent), 1)
+
+    def test_failed_refresh_requires_login(self):
+        client = self.client(refresh_status=401)
+        with self.assertRaises(LoginRequired):
+            client.get("datasets/")
+        self.assertFalse(client.logged_in)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class AuthenticateTests(unittest.TestCase):
+    def setUp(self):
+        # the login window lives at the repository root and imports MainWindow from desktop_app
+        main_window = mock.Mock()
+        self.addCleanup(sys.modules.pop, "authentication", None)
+        with mock.patch.dict(sys.modules, {"desktop_app": mock.Mock(MainWindow=main_window)}):
+            spec = importlib.util.spec_from_file_location(
+                "authentication", os.path.join(os.path.dirname(__file__), os.pardir, "authentication.py"))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        self.module, self.main_window = module, main_window
+        self.window = module.Authenticate()
+        self.addCleanup(self.window.close)
+        self.window.api_client = mock.Mock(spec=APIClient)
+
+    def test_only_calls_the_client_has(self):
+        # the API has no registration endpoint, so the window offers none
+        self.assertFalse(hasattr(self.window, "handle_register"))
+        self.window.login_username.setText("operator")
+        self.window.login_password.setText("secret")
+        with mock.patch.object(self.module.QMessageBox, "information"):
+            self.window.handle_login()
+        self.window.api_client.login.assert_called_once_with("operator", "secret")
+        self.main_window.assert_called_once_with(self.window.api_client)
+
+    def test_failed_login_is_reported(self):
+        self.window.api_client.login.side_effect = requests.HTTPError("401 Client Error")
+        self.window.login_username.setText("operator")
+        self.window.login_password.setText("wrong")
+        with mock.patch.object(self.module.QMessageBox, "critical") as critical:
+            self.window.handle_login()
+        self.assertIn("Login failed: 401 Client Error", critical.call_args[0][2])
+        self.main_window.assert_not_called()
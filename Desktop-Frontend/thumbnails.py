@@ -0,0 +1,129 @@
+import os
+import re
+
+from PyQt5.QtCore import QPointF, QRectF, QStandardPaths, Qt
+from PyQt5.QtGui import QColor, QPainter, QPen, QPixmap, QPolygonF
+
+THUMBNAIL_SIZE = (132, 36)
+# Upper bound on the on-disk cache; the least recently shown thumbnails go first.
+THUMBNAIL_CACHE_BYTES = 4 * 1024 * 1024
+
+LINE_COLOR = QColor("#2563EB")
+BAR_COLOR = QColor("#9CA3AF")
+
+
+def render_sparkline(values, size=THUMBNAIL_SIZE):
+    """Polyline of ``values`` spread evenly across a ``size`` pixmap."""
+    width, height = size
+    pix = _blank(size)
+    if len(values) < 2:
+        return pix
+    lo, hi = min(values), max(values)
+    span = (hi - lo) or 1.0
+    step = (width - 3) / (len(values) - 1)
+    line = QPolygonF([QPointF(1 + i * step, height - 2 - (v - lo) / span * (height - 4)) for i, v in enumerate(values)])
+    painter = QPainter(pix)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setPen(QPen(LINE_COLOR, 1.3))
+    painter.drawPolyline(line)
+    painter.end()
+    return pix
+
+
+def render_bars(values, size=THUMBNAIL_SIZE):
+    """Column chart of ``values``, for datasets without a sparkline."""
+    width, height = size
+    pix = _blank(size)
+    top = max(values, default=0)
+    if top <= 0:
+        return pix
+    slot = width / len(values)
+    painter = QPainter(pix)
+    for i, v in enumerate(values):
+        h = max(v, 0) / top * (height - 2)
+        painter.fillRect(QRectF(i * slot + 1, height - 1 - h, max(slot - 2, 1), h), BAR_COLOR)
+    painter.end()
+    return pix
+
+
+def _blank(size):
+    pix = QPixmap(*size)
+    pix.fill(Qt.transparent)
+    return pix
+
+
+def thumbnail_for(summary):
+    """``(kind, pixmap)`` from a dataset summary: the flow sparkline, else the type counts, else None."""
+    summary = summary if isinstance(summary, dict) else {}
+    line = [v for v in summary.get("sparkline") or [] if isinstance(v, (int, float))]
+    if len(line) >= 2:
+        return "line", render_sparkline(line)
+    counts = summary.get("type_distribution")
+    bars = [v for v in counts.values() if isinstance(v, (int, float))] if isinstance(counts, dict) else []
+    if bars:
+        return "bars", render_bars(bars)
+    return None
+
+
+class ThumbnailCache:
+    """
+    History thumbnails as PNG files, one per dataset. A file's mtime is its
+    last use, and writes evict the least recently used files once the
+    directory grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory=None, max_bytes=THUMBNAIL_CACHE_BYTES):
+        if directory is None:
+            directory = os.path.join(QStandardPaths.writableLocation(QStandardPaths.CacheLocation), "thumbnails")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, re.sub(r"[^\w.-]", "_", str(key)) + ".png")
+
+    def get(self, key):
+        path = self.path(key)
+        pix = QPixmap()
+        if not os.path.exists(path) or not pix.load(path, "PNG"):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return pix
+
+    def put(self, key, pixmap):
+        if pixmap.save(self.path(key), "PNG"):
+            self._evict()
+
+    def thumbnail(self, ds):
+        """Cached thumbnail of a dataset listing, drawing and storing it on a miss; None without data."""
+        summary = ds.get("summary")
+        # a dataset's rows never change, but its summary can gain a sparkline, so the kind is part of the key
+        kind = "line" if isinstance(summary, dict) and summary.get("sparkline") else "bars"
+        key = f"{ds.get('id')}-{kind}-{THUMBNAIL_SIZE[0]}x{THUMBNAIL_SIZE[1]}"
+        pix = self.get(key)
+        if pix is None:
+            drawn = thumbnail_for(summary)
+            if drawn is None:
+                return None
+            pix = drawn[1]
+            self.put(key, pix)
+        return pix
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(".png"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
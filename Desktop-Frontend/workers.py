@@ -0,0 +1,124 @@
+import threading
+import traceback
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class Cancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, seconds):
+        """Sleep up to ``seconds``, waking early on cancellation; True if cancelled."""
+        return self._event.wait(seconds)
+
+    def check(self):
+        """Raise ``Cancelled`` once the task has been cancelled; long tasks call this between steps."""
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class TaskSignals(QObject):
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    done = pyqtSignal()
+
+
+class Task(QRunnable):
+    """
+    Runs ``fn(token, progress)`` on a pool thread. Its signals are delivered
+    on the GUI thread, and nothing is delivered after the task is cancelled.
+    """
+
+    def __init__(self, fn):
+        super().__init__()
+        # TaskRunner holds the reference, so Qt must not delete the runnable behind it
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.token = CancelToken()
+        self.signals = TaskSignals()
+
+    def cancel(self):
+        self.token.cancel()
+
+    def _progress(self, value):
+        if not self.token.cancelled:
+            self.signals.progress.emit(value)
+
+    def run(self):
+        try:
+            result = self.fn(self.token, self._progress)
+            self.token.check()
+            self.signals.finished.emit(result)
+        except Cancelled:
+            pass
+        except Exception as e:
+            if not self.token.cancelled:
+                traceback.print_exc()
+                self.signals.failed.emit(e)
+        finally:
+            self.signals.done.emit()
+
+
+class TaskRunner(QObject):
+    """
+    Background work for the main window. Tasks submitted under the same
+    ``key`` replace each other: starting a new one cancels the one before,
+    so only the latest request's result is ever applied.
+    """
+
+    def __init__(self, parent=None, max_threads=4):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._latest = {}
+        self._running = set()
+
+    def submit(self, fn, on_done=None, on_error=None, on_progress=None, key=None):
+        task = Task(fn)
+        # checked again here: a result can already be queued when the task is cancelled
+        if on_done is not None:
+            task.signals.finished.connect(lambda result: None if task.token.cancelled else on_done(result))
+        if on_error is not None:
+            task.signals.failed.connect(lambda error: None if task.token.cancelled else on_error(error))
+        if on_progress is not None:
+            task.signals.progress.connect(lambda value: None if task.token.cancelled else on_progress(value))
+        task.signals.done.connect(lambda: self._forget(task, key))
+        if key is not None:
+            previous = self._latest.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._latest[key] = task
+        self._running.add(task)
+        self.pool.start(task)
+        return task
+
+    def cancel(self, key):
+        task = self._latest.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self):
+        for task in self._running:
+            task.cancel()
+        self._latest.clear()
+
+    def busy(self, key):
+        return key in self._latest
+
+    def _forget(self, task, key):
+        self._running.discard(task)
+        if key is not None and self._latest.get(key) is task:
+            del self._latest[key]
@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QLineEdit, QPushButton, QMessageBox, QTabWidget
+    QLineEdit, QPushButton, QMessageBox
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
@@ -31,11 +31,8 @@ class Authenticate(QWidget):
         header_layout.addStretch()
         layout.addLayout(header_layout)
         
-        # Tabs for Login/Register
-        tabs = QTabWidget()
-        tabs.addTab(self.create_login_tab(), 'Login')
-        tabs.addTab(self.create_register_tab(), 'Register')
-        layout.addWidget(tabs)
+        # Login only: the API has no registration endpoint, accounts are created on the server
+        layout.addWidget(self.create_login_tab())
         
         self.setLayout(layout)
     
@@ -60,31 +57,6 @@ class Authenticate(QWidget):
         widget.setLayout(layout)
         return widget
     
-    def create_register_tab(self) -> QWidget:
-        widget = QWidget()
-        layout = QVBoxLayout()
-        
-        layout.addWidget(QLabel('Username:'))
-        self.register_username = QLineEdit()
-        layout.addWidget(self.register_username)
-        
-        layout.addWidget(QLabel('Email:'))
-        self.register_email = QLineEdit()
-        layout.addWidget(self.register_email)
-        
-        layout.addWidget(QLabel('Password:'))
-        self.register_password = QLineEdit()
-        self.register_password.setEchoMode(QLineEdit.Password)
-        layout.addWidget(self.register_password)
-        
-        register_btn = QPushButton('Register')
-        register_btn.clicked.connect(self.handle_register)
-        layout.addWidget(register_btn)
-        
-        layout.addStretch()
-        widget.setLayout(layout)
-        return widget
-    
     def handle_login(self) -> None:
         username = self.login_username.text()
         password = self.login_password.text()
@@ -102,24 +74,6 @@ class Authenticate(QWidget):
         except Exception as e:
             QMessageBox.critical(self, 'Error', f'Login failed: {str(e)}')
     
-    def handle_register(self) -> None:
-        username = self.register_username.text()
-        email = self.register_email.text()
-        password = self.register_password.text()
-        
-        if not username or not email or not password:
-            QMessageBox.warning(self, 'Error', 'Please fill in all fields')
-            return
-        
-        try:
-            self.api_client.register(username, email, password)
-            QMessageBox.information(self, 'Success', 'Account created successfully. Please login.')
-            self.register_username.clear()
-            self.register_email.clear()
-            self.register_password.clear()
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'Registration failed: {str(e)}')
-    
     def open_main_window(self) -> None:
         self.main_window = MainWindow(self.api_client)
         self.main_window.show()
@@ -45,6 +45,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "equipment.instrumentation.InstrumentationMiddleware",
 ]
 
 # -----------------------------
@@ -86,6 +87,24 @@ DATABASES = {
     }
 }
 
+# -----------------------------
+# Cache
+# -----------------------------
+# Local memory is per process; with several workers point "equipment" at a
+# shared backend, e.g. {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+# "LOCATION": BASE_DIR / "cache"} or Redis.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "equipment": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "equipment-responses",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+}
+
 # -----------------------------
 # Static & Media Files
 # -----------------------------
@@ -95,6 +114,27 @@ MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 os.makedirs(MEDIA_ROOT, exist_ok=True)  # Ensure folder exists
 
+# -----------------------------
+# Equipment ingest
+# -----------------------------
+EQUIPMENT_ARCHIVE_RAW_CSV = False  # also copy each upload into Dataset.raw_csv
+EQUIPMENT_INGEST_ASYNC = False  # default for upload/?async=; True queues parsing on the worker pool
+EQUIPMENT_INGEST_WORKERS = 2  # in-process ingest threads (see also `manage.py process_ingest_jobs`)
+EQUIPMENT_INDEX_ASYNC = True  # build readings/rollups on a background thread after the upload commits
+EQUIPMENT_INGEST_JOB_TIMEOUT = 3600  # seconds after which a job still marked running is failed as abandoned
+EQUIPMENT_BULK_WORKERS = None  # processes used by upload/bulk/; None = one per CPU
+EQUIPMENT_BULK_MAX_FILES = 500
+EQUIPMENT_CSV_BAD_LINES = "skip"  # malformed CSV lines: "skip", "warn" or "error"
+
+# Instrumentation (see equipment/instrumentation.py and /api/metrics/)
+EQUIPMENT_METRICS_TOKEN = None  # bearer token for scraping /api/metrics/ without a login; None allows logged-in users only
+EQUIPMENT_TRACE_MEMORY = False  # per-phase peak memory via tracemalloc (slows allocation-heavy code)
+EQUIPMENT_PROFILE_REQUESTS = False  # allow ?profile=1 to write a cProfile dump per request
+EQUIPMENT_PROFILE_DIR = BASE_DIR / "profiles"
+
+# Read endpoints answer 304 from ETag/Last-Modified and keep built bodies in this cache alias
+EQUIPMENT_RESPONSE_CACHE = "equipment"
+
 # -----------------------------
 # REST Framework
 # -----------------------------
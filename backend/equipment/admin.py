@@ -1,6 +1,11 @@
 from django.contrib import admin
-from .models import Dataset
+from .models import Dataset, IngestJob
 
 @admin.register(Dataset)
 class DatasetAdmin(admin.ModelAdmin):
     list_display = ('file_name', 'uploaded_at')
+
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ('file_name', 'status', 'rows_done', 'created_at', 'finished_at')
+    list_filter = ('status',)
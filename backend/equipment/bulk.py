@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import transaction
+
+from .columnar import store_path
+from .ingest import build_dataset, find_duplicate, new_storage_key, reuse_dataset, store_content
+from .jobs import enqueue_index
+from .models import Dataset
+
+BULK_WORKERS = getattr(settings, "EQUIPMENT_BULK_WORKERS", None) or os.cpu_count() or 1
+BULK_MAX_FILES = getattr(settings, "EQUIPMENT_BULK_MAX_FILES", 500)
+COPY_BLOCK_SIZE = 1024 * 1024
+
+
+def _parse_worker(file_path, store_file):
+    # runs in a child process, set up by the pool's django.setup initializer
+    from .columnar import ColumnarWriter
+    from .ingest import ingest_csv, iter_file_chunks
+
+    return ingest_csv(iter_file_chunks(file_path), consumers=[ColumnarWriter(store_file)])
+
+
+def _stage(name, chunks):
+    digest, file_path = store_content(chunks)
+    return {"file_name": os.path.basename(name), "file_path": file_path, "digest": digest}
+
+
+def _zip_members(upload):
+    with zipfile.ZipFile(upload) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if info.is_dir() or not name.lower().endswith(".csv") or "__MACOSX" in name.split("/"):
+                continue
+            with archive.open(info) as member:
+                yield name, iter(lambda: member.read(COPY_BLOCK_SIZE), b"")
+
+
+def stage_uploads(files):
+    """Write every uploaded CSV (zip archives are expanded) to the datasets folder."""
+    staged = []
+    for upload in files:
+        if upload.name.lower().endswith(".zip"):
+            members = _zip_members(upload)
+        else:
+            members = [(upload.name, upload.chunks())]
+        for name, chunks in members:
+            if len(staged) >= BULK_MAX_FILES:
+                raise ValueError(f"Too many files in one bulk upload (max {BULK_MAX_FILES})")
+            staged.append(_stage(name, chunks))
+    return staged
+
+
+def ingest_bulk(staged):
+    """
+    Parse staged files in parallel on a process pool, then insert one
+    Dataset per successfully parsed file in a single bulk_create. Content
+    seen before (or repeated inside the batch) is parsed at most once.
+    Returns ``(datasets, errors)``.
+    """
+    existing, pending = {}, {}
+    for item in staged:
+        digest = item["digest"]
+        if digest in existing or digest in pending:
+            continue
+        duplicate = find_duplicate(digest)
+        if duplicate is not None:
+            existing[digest] = duplicate
+        else:
+            pending[digest] = (item["file_path"], new_storage_key())
+
+    parsed, failed = {}, {}
+    if len(pending) > 1 and BULK_WORKERS > 1:
+        # spawned, not forked: a fork of the threaded server could inherit held locks and open DB connections.
+        # Unpickling _parse_worker imports the models, so Django is set up before any task runs.
+        spawn = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(BULK_WORKERS, len(pending)), mp_context=spawn,
+                                 initializer=django.setup) as pool:
+            futures = {digest: pool.submit(_parse_worker, path, store_path(key))
+                       for digest, (path, key) in pending.items()}
+            for digest, future in futures.items():
+                try:
+                    parsed[digest] = future.result()
+                except Exception as e:
+                    failed[digest] = e
+    else:
+        for digest, (path, key) in pending.items():
+            try:
+                parsed[digest] = _parse_worker(path, store_path(key))
+            except Exception as e:
+                failed[digest] = e
+
+    datasets, errors, indexed = [], [], set()
+    for item in staged:
+        digest = item["digest"]
+        if digest in existing:
+            datasets.append(reuse_dataset(existing[digest], item["file_name"], save=False))
+        elif digest in parsed:
+            storage_key = pending[digest][1]
+            ds = build_dataset(item["file_name"], item["file_path"], storage_key, parsed[digest], digest)
+            # readings belong to the first upload of each content, as with create_dataset
+            ds.index_pending = storage_key not in indexed
+            indexed.add(storage_key)
+            datasets.append(ds)
+        else:
+            errors.append({"file_name": item["file_name"], "error": str(failed[digest])})
+    for digest in failed:
+        if os.path.exists(pending[digest][0]):
+            os.remove(pending[digest][0])
+
+    with transaction.atomic():
+        datasets = Dataset.objects.bulk_create(datasets)
+        enqueue_index()
+    return datasets, errors
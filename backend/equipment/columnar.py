@@ -0,0 +1,191 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+COLUMNAR_DIR = os.path.join(settings.MEDIA_ROOT, "columnar")
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+# Columns with these (lower-cased) names are stored as datetime64[ns].
+DATE_COLUMN_NAMES = ("timestamp", "time", "date", "datetime")
+
+NAT = np.iinfo("int64").min
+KIND_DTYPES = {
+    "float64": np.dtype("<f8"),
+    "datetime64[ns]": np.dtype("<i8"),
+    "category": np.dtype("<i4"),
+}
+
+
+def store_path(storage_key):
+    return os.path.join(COLUMNAR_DIR, storage_key)
+
+
+def _column_kind(name, series):
+    if str(name).lower() in DATE_COLUMN_NAMES:
+        return "datetime64[ns]"
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return "float64"
+    return "category"
+
+
+def _number_labels(series):
+    # 7.0 -> "7", as the number would read in the CSV
+    return series.map(lambda v: np.format_float_positional(v, trim="-"), na_action="ignore")
+
+
+class ColumnarWriter:
+    """
+    Appends parsed DataFrame chunks to one flat binary file per column:
+    numerics as float64, date columns as int64 epoch nanoseconds and
+    everything else dictionary-encoded as int32 codes (-1 for missing).
+    A column is typed by the first chunk; if a later chunk brings text into
+    a numeric column, the column is widened to a dictionary-encoded one and
+    the values already written are rewritten as their text (``1.5``, ``7``).
+    The manifest is written last, so a store without one is incomplete.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.columns = None
+        self.num_rows = 0
+        self._files = []
+        self._dictionaries = []
+        self._lookups = []
+        os.makedirs(directory, exist_ok=True)
+
+    def _start(self, df):
+        self.columns = []
+        for i, name in enumerate(df.columns):
+            kind = _column_kind(name, df[name])
+            self.columns.append({"name": str(name), "kind": kind, "file": f"{i}.bin"})
+            self._files.append(open(os.path.join(self.directory, f"{i}.bin"), "wb"))
+            self._dictionaries.append([])
+            self._lookups.append({})
+
+    def _encode(self, i, series):
+        kind = self.columns[i]["kind"]
+        if kind == "float64":
+            values = pd.to_numeric(series, errors="coerce")
+            if not (series.notna() & values.isna()).any():
+                return values.to_numpy(dtype="<f8", na_value=np.nan)
+            self._widen(i)
+            kind = "category"
+        if kind == "datetime64[ns]":
+            # offsets may differ row to row; naive values are taken as UTC already
+            values = pd.to_datetime(series, errors="coerce", format="mixed", utc=True).dt.tz_localize(None)
+            ints = values.astype("datetime64[ns]").to_numpy().view("<i8")
+            return ints
+
+        # dictionary-encode against the store-wide dictionary
+        lookup, dictionary = self._lookups[i], self._dictionaries[i]
+        if pd.api.types.is_float_dtype(series):
+            series = _number_labels(series)
+        codes, uniques = pd.factorize(series.astype("string"), use_na_sentinel=True)
+        remap = np.empty(len(uniques) + 1, dtype="<i4")
+        remap[-1] = -1
+        for j, value in enumerate(uniques):
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(dictionary)
+                dictionary.append(value)
+            remap[j] = code
+        return remap[codes]
+
+    def _widen(self, i):
+        # only blanks and numbers so far: rewrite them as dictionary codes of their text
+        col = self.columns[i]
+        path = os.path.join(self.directory, col["file"])
+        self._files[i].close()
+        written = np.fromfile(path, dtype=KIND_DTYPES[col["kind"]], count=self.num_rows)
+        col["kind"] = "category"
+        self._files[i] = open(path, "wb")
+        self._files[i].write(np.ascontiguousarray(self._encode(i, pd.Series(written))).tobytes())
+
+    def update(self, df):
+        if self.columns is None:
+            self._start(df)
+        for i, col in enumerate(self.columns):
+            if col["name"] in df.columns:
+                values = self._encode(i, df[col["name"]])
+            else:
+                values = np.full(len(df), -1 if col["kind"] == "category" else np.nan, dtype=KIND_DTYPES[col["kind"]])
+            self._files[i].write(np.ascontiguousarray(values).tobytes())
+        self.num_rows += len(df)
+        return self
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        for col, dictionary in zip(self.columns or [], self._dictionaries):
+            if col["kind"] == "category":
+                col["dictionary"] = dictionary
+        manifest = {"format": FORMAT_VERSION, "num_rows": self.num_rows, "columns": self.columns or []}
+        with open(os.path.join(self.directory, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+    def abort(self):
+        for f in self._files:
+            f.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ColumnarDataset:
+    """
+    Read side of the columnar store. Columns are memory-mapped on demand,
+    so reading two columns of a wide dataset only touches those two files.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.num_rows = manifest["num_rows"]
+        self._columns = {col["name"]: col for col in manifest["columns"]}
+        self.columns = [col["name"] for col in manifest["columns"]]
+
+    def __len__(self):
+        return self.num_rows
+
+    def kind(self, name):
+        return self._columns[name]["kind"]
+
+    def dictionary(self, name):
+        return self._columns[name].get("dictionary", [])
+
+    def raw(self, name):
+        """Memory-mapped storage array: float64 values, int64 epoch ns or int32 codes."""
+        col = self._columns[name]
+        dtype = KIND_DTYPES[col["kind"]]
+        if not self.num_rows:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, col["file"]), dtype=dtype, mode="r", shape=(self.num_rows,))
+
+    def series(self, name):
+        col = self._columns[name]
+        raw = self.raw(name)
+        if col["kind"] == "float64":
+            return pd.Series(raw, name=name, copy=False)
+        if col["kind"] == "datetime64[ns]":
+            values = np.asarray(raw).view("datetime64[ns]")
+            return pd.Series(values, name=name)
+        categories = pd.Index(col.get("dictionary", []), dtype="object")
+        return pd.Series(pd.Categorical.from_codes(np.asarray(raw), categories=categories), name=name)
+
+    def to_pandas(self, columns=None):
+        names = self.columns if columns is None else [c for c in columns if c in self._columns]
+        return pd.DataFrame({name: self.series(name) for name in names}, columns=names)
+
+
+def open_store(storage_key):
+    """Return the ColumnarDataset for ``storage_key`` or None if it is missing or incomplete."""
+    if not storage_key:
+        return None
+    directory = store_path(storage_key)
+    if not os.path.exists(os.path.join(directory, MANIFEST)):
+        return None
+    return ColumnarDataset(directory)
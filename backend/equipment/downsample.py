@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def _as_float(values):
+    values = np.asarray(values)
+    if values.dtype.kind in "mM":
+        values = values.view("int64")
+    return values.astype(np.float64, copy=False)
+
+
+def lttb(x, y, points):
+    """
+    Indices of the ``points`` samples Largest-Triangle-Three-Buckets keeps
+    from a series sorted by ``x`` (numbers or datetime64, no NaN). First and
+    last points are always kept; each bucket in between contributes the point
+    spanning the largest triangle with the previous pick and the next
+    bucket's mean, so spikes survive where striding would skip them.
+    """
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        return np.array([0, n - 1])[:max(points, 0)]
+    x, y = _as_float(x), _as_float(y)
+
+    # points - 2 buckets over the interior; none is empty since points < n
+    edges = np.linspace(1, n - 1, points - 1).astype(np.intp)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    # each bucket is weighed against the following one; the last against the final point
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    keep = np.empty(points, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    # each pick depends on the previous one, so only the buckets are walked in Python
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def minmax(x, y, points):
+    """
+    Indices of the minimum and maximum of each of ``(points - 2) // 2``
+    equal-count buckets, plus the first and last point, in ``x`` order. The
+    envelope keeps every excursion at the cost of the line's shape between
+    them.
+    """
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    if points < 4:
+        return lttb(x, y, points)
+    y = _as_float(y)
+    buckets = max(1, (points - 2) // 2)
+    edges = np.linspace(0, n, buckets + 1).astype(np.intp)
+    bucket = np.repeat(np.arange(buckets), np.diff(edges))
+    lows = np.minimum.reduceat(y, edges[:-1])[bucket]
+    highs = np.maximum.reduceat(y, edges[:-1])[bucket]
+    picks = [_first_in_bucket(y == lows, bucket), _first_in_bucket(y == highs, bucket), [0, n - 1]]
+    return np.unique(np.concatenate(picks)).astype(np.intp)
+
+
+def _first_in_bucket(hits, bucket):
+    hits = np.flatnonzero(hits)
+    _, first = np.unique(bucket[hits], return_index=True)
+    return hits[first]
+
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample(x, y, points, method="lttb"):
+    """``(x, y)`` reduced to at most ``points`` samples with ``method`` ("lttb" or "minmax")."""
+    x, y = np.asarray(x), np.asarray(y)
+    if len(x) <= points:
+        return x, y
+    keep = METHODS[method](x, y, points)
+    return x[keep], y[keep]
@@ -0,0 +1,60 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .models import Dataset
+
+# Alias in settings.CACHES holding rendered read responses (LRU local memory by default).
+RESPONSE_CACHE = getattr(settings, "EQUIPMENT_RESPONSE_CACHE", "default")
+
+
+def datasets_state():
+    """
+    ``(count, newest id, latest modification)`` of the Dataset table. Every
+    upload, deletion or saved change (a recomputed summary bumps
+    ``updated_at``) moves it, so keys built from it go stale exactly when
+    the data does and no explicit invalidation is needed.
+    """
+    state = Dataset.objects.aggregate(count=Count("id"), last_id=Max("id"), last_modified=Max("updated_at"))
+    return state["count"], state["last_id"], state["last_modified"]
+
+
+def strong_etag(*parts):
+    return quote_etag(hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()[:32])
+
+
+def query_key(request):
+    return "&".join(f"{k}={v}" for k in sorted(request.query_params) for v in request.query_params.getlist(k))
+
+
+def conditional_response(request, etag, last_modified, build):
+    """
+    Serve a read endpoint through its validators: 304 when the client's copy
+    (If-None-Match / If-Modified-Since) is current, the server-side cached
+    body when another request already built it, and ``build()`` otherwise.
+    Only 200 responses are cached.
+    """
+    modified = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        cache = caches[RESPONSE_CACHE]
+        key = "equipment:response:" + etag.strip('"')
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = build()
+            if response.status_code != 200:
+                return response
+            cache.set(key, response.data)
+    response["ETag"] = etag
+    if modified is not None:
+        response["Last-Modified"] = http_date(modified)
+    # authenticated data: clients may keep it but must revalidate, shared caches must not
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
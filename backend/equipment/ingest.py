@@ -0,0 +1,310 @@
+import hashlib
+import io
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .columnar import ColumnarWriter, open_store, store_path
+from .instrumentation import span
+from .models import Dataset
+from .parsing import DEFAULT_BAD_LINES, read_equipment_csv
+from .readings import populate_readings
+from .rollups import update_rollups
+from .summary import SUMMARY_VERSION, SummaryBuilder
+
+UPLOAD_DIR = os.path.join(settings.MEDIA_ROOT, "datasets")
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+# Keep a full copy of each upload in Dataset.raw_csv (off by default: the
+# stored file under MEDIA_ROOT is the source of truth).
+ARCHIVE_RAW_CSV = getattr(settings, "EQUIPMENT_ARCHIVE_RAW_CSV", False)
+
+# Size of the blocks read from a stored file when it is re-ingested.
+READ_BLOCK_SIZE = 1024 * 1024
+
+# Rows handed to the summary per parsed chunk; bounds ingest memory.
+PARSE_CHUNK_ROWS = 50_000
+
+# What the parser does with malformed lines: "skip", "warn" or "error".
+BAD_LINES = getattr(settings, "EQUIPMENT_CSV_BAD_LINES", DEFAULT_BAD_LINES)
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkTee(io.RawIOBase):
+    """
+    Read-only stream over an iterable of byte chunks (e.g. ``UploadedFile.chunks()``).
+    Every chunk is copied to ``sink`` the moment it is consumed, so the parser
+    and the on-disk copy share a single pass over the upload.
+    """
+
+    def __init__(self, chunks, sink=None, hasher=None):
+        self._chunks = iter(chunks)
+        self._sink = sink
+        self._hasher = hasher
+        self._buf = memoryview(b"")
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not len(self._buf):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._consume(chunk)
+            self._buf = memoryview(chunk)
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def drain(self):
+        # consume whatever the parser left behind so the sink is complete
+        self._buf = memoryview(b"")
+        for chunk in self._chunks:
+            self._consume(chunk)
+
+    def _consume(self, chunk):
+        self.bytes_read += len(chunk)
+        if self._sink is not None:
+            with span("ingest.write", len(chunk)):
+                self._sink.write(chunk)
+        if self._hasher is not None:
+            self._hasher.update(chunk)
+
+
+def ingest_csv(chunks, dest_path=None, chunksize=PARSE_CHUNK_ROWS, consumers=(), progress=None, hasher=None):
+    """
+    Parse a CSV from an iterable of byte chunks in one pass, optionally
+    writing the bytes to ``dest_path`` and feeding them to ``hasher``
+    (a hashlib object) along the way. Each parsed DataFrame
+    chunk is also handed to every consumer's ``update``; consumers are
+    ``close``d on success and ``abort``ed on failure. ``progress`` is called
+    with ``(bytes_read, rows_parsed)`` after every chunk. Returns the summary.
+    """
+    builder = SummaryBuilder()
+    tmp_path = f"{dest_path}.{uuid.uuid4().hex}.part" if dest_path else None
+    sink = open(tmp_path, "wb") if tmp_path else None
+    try:
+        tee = ChunkTee(chunks, sink, hasher)
+        stream = io.BufferedReader(tee, buffer_size=1024 * 1024)
+        # measurements are left to inference: a chunked stream cannot be re-read if a hint fails
+        reader = read_equipment_csv(stream, on_bad_lines=BAD_LINES, chunksize=chunksize, float_dtype=None)
+        with reader:
+            chunks = iter(reader)
+            consumed = 0
+            while True:
+                # parse time includes reading (and writing) the bytes it pulls in
+                with span("ingest.parse") as parsed:
+                    df = next(chunks, None)
+                    parsed.bytes, consumed = tee.bytes_read - consumed, tee.bytes_read
+                if df is None:
+                    break
+                with span("ingest.summary"):
+                    builder.update(df)
+                with span("ingest.store"):
+                    for consumer in consumers:
+                        consumer.update(df)
+                if progress is not None:
+                    progress(tee.bytes_read, builder.total_rows)
+        tee.drain()
+        for consumer in consumers:
+            consumer.close()
+    except Exception:
+        if sink is not None:
+            sink.close()
+            os.remove(tmp_path)
+        for consumer in consumers:
+            consumer.abort()
+        raise
+
+    if sink is not None:
+        sink.close()
+        os.replace(tmp_path, dest_path)
+    return builder.result()
+
+
+def content_path(digest):
+    """Stored files are content-addressed, so equal uploads share one file and names never collide."""
+    return os.path.join(UPLOAD_DIR, f"{digest}.csv")
+
+
+def store_content(chunks):
+    """Copy byte chunks into the content-addressed store, hashing on the way. Returns ``(digest, path)``."""
+    hasher = hashlib.sha256()
+    tmp_path = os.path.join(UPLOAD_DIR, f".{uuid.uuid4().hex}.part")
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                hasher.update(chunk)
+                f.write(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    digest = hasher.hexdigest()
+    path = content_path(digest)
+    os.replace(tmp_path, path)
+    return digest, path
+
+
+def find_duplicate(digest):
+    """An already ingested Dataset with the same content whose stored file, store and summary can be reused."""
+    if not digest:
+        return None
+    candidates = (Dataset.objects.filter(content_hash=digest, summary_version=SUMMARY_VERSION)
+                  .exclude(stored_file="").exclude(storage_key="")
+                  .only("id", "content_hash", "stored_file", "storage_key", "summary", "summary_version")
+                  .order_by("-id"))
+    for ds in candidates[:5]:
+        if os.path.exists(os.path.join(settings.MEDIA_ROOT, ds.stored_file)) and open_store(ds.storage_key):
+            return ds
+    return None
+
+
+def reuse_dataset(existing, file_name, save=True):
+    """
+    New per-upload Dataset row that shares the stored bytes, store and summary
+    of ``existing``. Readings are not copied: they stay with the first upload
+    so cross-dataset queries do not count the same content twice.
+    """
+    ds = Dataset(
+        file_name=file_name,
+        content_hash=existing.content_hash,
+        stored_file=existing.stored_file,
+        storage_key=existing.storage_key,
+        summary=existing.summary,
+        summary_version=existing.summary_version
+    )
+    if save:
+        ds.save()
+    return ds
+
+
+def build_dataset(file_name, file_path, storage_key, summary, content_hash=""):
+    """Unsaved Dataset for an ingested file (see ``create_dataset`` and bulk upload)."""
+    raw_csv = ""
+    if ARCHIVE_RAW_CSV:
+        with open(file_path, encoding='utf-8', errors='ignore') as f:
+            raw_csv = f.read()
+    return Dataset(
+        file_name=file_name,
+        content_hash=content_hash,
+        stored_file=os.path.relpath(file_path, settings.MEDIA_ROOT),
+        storage_key=storage_key,
+        raw_csv=raw_csv,
+        summary=summary,
+        summary_version=SUMMARY_VERSION
+    )
+
+
+def create_dataset(file_name, file_path, storage_key, summary, content_hash=""):
+    """
+    Save the Dataset for an ingested file. Its readings and rollups are left
+    to ``index_pending_datasets`` (see ``jobs.enqueue_index``), so the upload
+    does not wait for them.
+    """
+    ds = build_dataset(file_name, file_path, storage_key, summary, content_hash)
+    ds.index_pending = True
+    with span("ingest.db_insert"):
+        ds.save()
+    return ds
+
+
+def index_dataset(ds, store):
+    """Derived cross-dataset tables for newly ingested content: per-row readings and time rollups."""
+    with span("ingest.readings"):
+        populate_readings(ds, store)
+    with span("ingest.rollups"):
+        update_rollups(store)
+
+
+def index_pending_datasets():
+    """
+    Build readings and rollups for every dataset saved with ``index_pending``,
+    oldest first. Each dataset is claimed with a conditional UPDATE in the
+    same transaction as its index, so a failure leaves it pending for the
+    next run (and is skipped for the rest of this one). Returns the number
+    of datasets indexed.
+    """
+    indexed, failed = 0, []
+    while True:
+        ds = (Dataset.objects.filter(index_pending=True).exclude(id__in=failed)
+              .only("id", "storage_key").order_by("id").first())
+        if ds is None:
+            return indexed
+        try:
+            with transaction.atomic():
+                # updated_at moves so the dataset validators change once the index is there
+                if Dataset.objects.filter(id=ds.id, index_pending=True).update(index_pending=False,
+                                                                                updated_at=timezone.now()):
+                    index_dataset(ds, open_store(ds.storage_key))
+                    indexed += 1
+        except Exception:
+            logger.exception("Indexing dataset %s failed", ds.id)
+            failed.append(ds.id)
+
+
+def ingest_stored_file(file_name, file_path, progress=None):
+    """Ingest a CSV that is already on disk (e.g. staged by an async upload) into a new Dataset."""
+    hasher = hashlib.sha256()
+    storage_key = new_storage_key()
+    summary = ingest_csv(iter_file_chunks(file_path), consumers=[ColumnarWriter(store_path(storage_key))],
+                         progress=progress, hasher=hasher)
+    return create_dataset(file_name, file_path, storage_key, summary, hasher.hexdigest())
+
+
+def new_storage_key():
+    return uuid.uuid4().hex
+
+
+def iter_file_chunks(path, block_size=READ_BLOCK_SIZE):
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def dataset_chunks(ds):
+    """
+    Byte chunks of a dataset's CSV: the stored file when there is one,
+    otherwise the archived ``raw_csv`` (or the legacy ``datasets/<file_name>``).
+    """
+    if ds.stored_file:
+        return iter_file_chunks(os.path.join(settings.MEDIA_ROOT, ds.stored_file))
+    if ds.raw_csv:
+        return [ds.raw_csv.encode()]
+    return iter_file_chunks(os.path.join(settings.MEDIA_ROOT, "datasets", ds.file_name))
+
+
+def refresh_summary(ds):
+    """Return ``ds.summary``, recomputing and saving it if it predates SUMMARY_VERSION."""
+    if ds.summary is not None and ds.summary_version == SUMMARY_VERSION:
+        return ds.summary
+    ds.summary = ingest_csv(dataset_chunks(ds))
+    ds.summary_version = SUMMARY_VERSION
+    ds.save(update_fields=["summary", "summary_version", "updated_at"])
+    return ds.summary
+
+
+def ensure_store(ds):
+    """
+    Columnar store of ``ds``, building it from the CSV first for datasets
+    that were ingested before the store existed.
+    """
+    store = open_store(ds.storage_key)
+    if store is not None:
+        return store
+    key = ds.storage_key or new_storage_key()
+    ingest_csv(dataset_chunks(ds), consumers=[ColumnarWriter(store_path(key))])
+    if ds.storage_key != key:
+        ds.storage_key = key
+        ds.save(update_fields=["storage_key"])
+    return open_store(key)
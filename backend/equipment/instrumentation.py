@@ -0,0 +1,267 @@
+import cProfile
+import contextvars
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+
+# Peak memory needs tracemalloc, which slows every allocation; off unless asked for.
+TRACE_MEMORY = getattr(settings, "EQUIPMENT_TRACE_MEMORY", False)
+
+# With this on, ``?profile=1`` on any API request writes a cProfile dump here.
+PROFILE_REQUESTS = getattr(settings, "EQUIPMENT_PROFILE_REQUESTS", False)
+PROFILE_DIR = getattr(settings, "EQUIPMENT_PROFILE_DIR", os.path.join(settings.BASE_DIR, "profiles"))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_trace = contextvars.ContextVar("equipment_trace", default=None)
+_open = contextvars.ContextVar("equipment_open_spans", default=())
+
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """
+    In-process counters, gauges and histograms rendered in the Prometheus
+    text format. Each worker process keeps its own registry, so scrape every
+    process (or run a single one) when serving with several workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+
+    def describe(self, name, kind, text):
+        self._help[name] = (kind, text)
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_max(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = max(self._gauges.get(key, value), value)
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            series = {}
+            for (name, labels), value in list(self._counters.items()) + list(self._gauges.items()):
+                series.setdefault(name, []).append((labels, value))
+            for (name, labels), histogram in self._histograms.items():
+                rows = series.setdefault(name, [])
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    rows.append((labels + (("le", _format(bound)),), count, "_bucket"))
+                rows.append((labels + (("le", "+Inf"),), histogram.count, "_bucket"))
+                rows.append((labels, histogram.total, "_sum"))
+                rows.append((labels, histogram.count, "_count"))
+        for name in sorted(series):
+            kind, text = self._help.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value, *suffix in series[name]:
+                lines.append(f"{name}{suffix[0] if suffix else ''}{_labels(labels)} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("equipment_http_requests_total", "counter", "API requests by view, method and status.")
+REGISTRY.describe("equipment_http_request_duration_seconds", "histogram", "API request wall time until the response is returned.")
+REGISTRY.describe("equipment_span_duration_seconds", "histogram", "Wall time of each instrumented phase.")
+REGISTRY.describe("equipment_span_cpu_seconds_total", "counter", "CPU time (of the running thread) spent in each phase.")
+REGISTRY.describe("equipment_span_bytes_total", "counter", "Bytes processed by each phase.")
+REGISTRY.describe("equipment_span_db_queries_total", "counter", "Database queries issued by each phase.")
+REGISTRY.describe("equipment_span_peak_memory_bytes", "gauge", "Largest Python heap growth seen in each phase (EQUIPMENT_TRACE_MEMORY).")
+
+
+class Span:
+    def __init__(self, name, bytes=0):
+        self.name = name
+        self.bytes = bytes
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.queries = 0
+        self.peak_memory = None
+        self._memory_base = 0
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class Trace:
+    """Spans finished while serving one request."""
+
+    def __init__(self):
+        self.spans = []
+
+    def server_timing(self):
+        # repeated phases (one per parsed chunk, say) are summed into one entry
+        totals = {}
+        for s in self.spans:
+            totals[s.name] = totals.get(s.name, 0.0) + s.wall
+        return ", ".join(f"{name.replace('.', '-')};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+@contextmanager
+def span(name, bytes=0):
+    """
+    Time a phase of work: wall and CPU time, DB queries, bytes processed
+    (pass ``bytes`` or set ``.bytes`` on the yielded span) and, with
+    EQUIPMENT_TRACE_MEMORY, peak heap growth. Spans nest, feed the metrics
+    registry and, inside a request, its Server-Timing header.
+    """
+    s = Span(name, bytes)
+    parents = _open.get()
+    tracing = TRACE_MEMORY and tracemalloc.is_tracing()
+    if tracing:
+        _start_memory(s, parents)
+    token = _open.set(parents + (s,))
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        with connection.execute_wrapper(s.count_query):
+            yield s
+    finally:
+        s.wall = time.perf_counter() - wall
+        s.cpu = time.thread_time() - cpu
+        _open.reset(token)
+        if tracing:
+            _stop_memory(s, parents)
+        trace = _trace.get()
+        if trace is not None:
+            trace.spans.append(s)
+        _record(s)
+
+
+def _start_memory(s, parents):
+    current, peak = tracemalloc.get_traced_memory()
+    # resetting the peak would hide it from enclosing spans, so hand it up first
+    for parent in parents:
+        parent.peak_memory = max(parent.peak_memory or 0, peak - parent._memory_base)
+    tracemalloc.reset_peak()
+    s._memory_base = current
+    s.peak_memory = 0
+
+
+def _stop_memory(s, parents):
+    _, peak = tracemalloc.get_traced_memory()
+    s.peak_memory = max(s.peak_memory, peak - s._memory_base)
+    for parent in parents:
+        parent.peak_memory = max(parent.peak_memory or 0, peak - parent._memory_base)
+
+
+def _record(s):
+    labels = {"span": s.name}
+    REGISTRY.observe("equipment_span_duration_seconds", labels, s.wall)
+    REGISTRY.inc("equipment_span_cpu_seconds_total", labels, s.cpu)
+    REGISTRY.inc("equipment_span_db_queries_total", labels, s.queries)
+    if s.bytes:
+        REGISTRY.inc("equipment_span_bytes_total", labels, s.bytes)
+    if s.peak_memory is not None:
+        REGISTRY.set_max("equipment_span_peak_memory_bytes", labels, s.peak_memory)
+
+
+def _counted(blocks, name):
+    # streamed bodies are produced after the view returns, possibly in another
+    # context, so they are timed by hand rather than with span()
+    s = Span(name)
+    started = time.perf_counter()
+    try:
+        for block in blocks:
+            s.bytes += len(block)
+            yield block
+    finally:
+        s.wall = time.perf_counter() - started
+        _record(s)
+
+
+class InstrumentationMiddleware:
+    """
+    Times every API request, adds a Server-Timing header listing its spans
+    and, when EQUIPMENT_PROFILE_REQUESTS is on, writes a cProfile dump for
+    requests made with ``?profile=1``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if TRACE_MEMORY and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __call__(self, request):
+        if not request.path.startswith("/api/"):
+            return self.get_response(request)
+
+        trace = Trace()
+        token = _trace.set(trace)
+        profiler = cProfile.Profile() if PROFILE_REQUESTS and request.GET.get("profile") else None
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            _trace.reset(token)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, "resolver_match", None)
+        view = match.url_name if match is not None and match.url_name else "unmatched"
+        REGISTRY.inc("equipment_http_requests_total", {"view": view, "method": request.method, "status": response.status_code})
+        REGISTRY.observe("equipment_http_request_duration_seconds", {"view": view, "method": request.method}, elapsed)
+
+        timing = trace.server_timing()
+        response["Server-Timing"] = f"total;dur={elapsed * 1000:.1f}" + (f", {timing}" if timing else "")
+        if profiler is not None:
+            response["X-Profile-File"] = _dump(profiler, view)
+        if response.streaming:
+            response.streaming_content = _counted(response.streaming_content, f"{view}.stream")
+        return response
+
+
+def _dump(profiler, view):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{view}.prof"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+    return name
@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .ingest import index_pending_datasets, ingest_stored_file
+from .models import IngestJob
+
+ASYNC_INGEST = getattr(settings, "EQUIPMENT_INGEST_ASYNC", False)
+INGEST_WORKERS = getattr(settings, "EQUIPMENT_INGEST_WORKERS", 2)
+# Build readings and rollups on a background thread after the upload commits (False: before responding).
+ASYNC_INDEX = getattr(settings, "EQUIPMENT_INDEX_ASYNC", True)
+# A job still running this long after it was claimed is taken to have lost its worker.
+JOB_TIMEOUT = timedelta(seconds=getattr(settings, "EQUIPMENT_INGEST_JOB_TIMEOUT", 3600))
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_index_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+        return _executor
+
+
+def _get_index_executor():
+    # one thread: rollup buckets shared by two datasets are read, merged and written back by one indexer at a time
+    global _index_executor
+    with _executor_lock:
+        if _index_executor is None:
+            _index_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index")
+        return _index_executor
+
+
+def fail_stale_jobs():
+    """
+    Mark jobs that have been running for longer than JOB_TIMEOUT as failed,
+    since the process that claimed them is gone. They are failed rather than
+    requeued so that a file that kills its worker is not retried forever.
+    Returns the number of jobs failed.
+    """
+    now = timezone.now()
+    stale = IngestJob.objects.filter(status=IngestJob.RUNNING, started_at__lt=now - JOB_TIMEOUT)
+    failed = stale.update(status=IngestJob.FAILED, error="Ingest worker stopped before the job finished",
+                          finished_at=now)
+    if failed:
+        logger.warning("Failed %d ingest job(s) abandoned by their worker", failed)
+    return failed
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to ``running``. The conditional
+    UPDATE makes this safe with several threads or worker processes polling
+    the same table: only one of them sees a row count of 1.
+    """
+    fail_stale_jobs()
+    while True:
+        job = IngestJob.objects.filter(status=IngestJob.QUEUED).order_by("created_at", "id").first()
+        if job is None:
+            return None
+        claimed = IngestJob.objects.filter(id=job.id, status=IngestJob.QUEUED).update(
+            status=IngestJob.RUNNING, started_at=timezone.now())
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job):
+    def progress(bytes_done, rows_done):
+        IngestJob.objects.filter(id=job.id).update(bytes_done=bytes_done, rows_done=rows_done)
+
+    try:
+        dataset = ingest_stored_file(job.file_name, os.path.join(settings.MEDIA_ROOT, job.stored_file),
+                                     progress=progress)
+    except Exception as e:
+        logger.exception("Ingest job %s (%s) failed", job.id, job.file_name)
+        IngestJob.objects.filter(id=job.id).update(
+            status=IngestJob.FAILED, error=str(e), finished_at=timezone.now())
+        return None
+    IngestJob.objects.filter(id=job.id).update(
+        status=IngestJob.DONE, dataset=dataset, bytes_done=job.bytes_total, finished_at=timezone.now())
+    enqueue_index()
+    return dataset
+
+
+def process_queue():
+    """Run queued jobs until the queue is empty. Returns the number of jobs processed."""
+    processed = 0
+    try:
+        while True:
+            job = claim_next_job()
+            if job is None:
+                return processed
+            run_job(job)
+            processed += 1
+    finally:
+        close_old_connections()
+
+
+def index_in_background():
+    try:
+        return index_pending_datasets()
+    finally:
+        close_old_connections()
+
+
+def enqueue(job):
+    # the job row must be visible to the worker thread before it starts polling
+    transaction.on_commit(lambda: _get_executor().submit(process_queue))
+
+
+def enqueue_index():
+    """Index the datasets left pending by an upload once its transaction commits."""
+    if ASYNC_INDEX:
+        transaction.on_commit(lambda: _get_index_executor().submit(index_in_background))
+    else:
+        transaction.on_commit(index_pending_datasets)
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from equipment.ingest import index_pending_datasets
+from equipment.jobs import process_queue
+
+
+class Command(BaseCommand):
+    help = ("Process queued CSV ingest jobs and build pending dataset indexes outside the web server "
+            "(no external broker needed).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls of the job table.")
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_queue()
+            if processed:
+                self.stdout.write(f"Processed {processed} job(s)")
+            indexed = index_pending_datasets()
+            if indexed:
+                self.stdout.write(f"Indexed {indexed} dataset(s)")
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='stored_file',
+            field=models.CharField(blank=True, max_length=512),
+        ),
+        migrations.AlterField(
+            model_name='dataset',
+            name='raw_csv',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_dataset_stored_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='summary_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_dataset_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_name', models.CharField(blank=True, max_length=255)),
+                ('equipment_type', models.CharField(blank=True, max_length=100)),
+                ('flowrate', models.FloatField(blank=True, null=True)),
+                ('pressure', models.FloatField(blank=True, null=True)),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField(blank=True, null=True)),
+                ('dataset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='equipment.dataset')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['equipment_type', 'timestamp'], name='reading_type_ts_idx'), models.Index(fields=['equipment_name', 'timestamp'], name='reading_name_ts_idx')],
+            },
+        ),
+    ]
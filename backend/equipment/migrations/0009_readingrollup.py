@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_equipmentreading'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_name', models.CharField(max_length=255)),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=8)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.BigIntegerField(default=0)),
+                ('flowrate_count', models.BigIntegerField(default=0)),
+                ('flowrate_sum', models.FloatField(default=0.0)),
+                ('flowrate_min', models.FloatField(blank=True, null=True)),
+                ('flowrate_max', models.FloatField(blank=True, null=True)),
+                ('pressure_count', models.BigIntegerField(default=0)),
+                ('pressure_sum', models.FloatField(default=0.0)),
+                ('pressure_min', models.FloatField(blank=True, null=True)),
+                ('pressure_max', models.FloatField(blank=True, null=True)),
+                ('temperature_count', models.BigIntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0.0)),
+                ('temperature_min', models.FloatField(blank=True, null=True)),
+                ('temperature_max', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='rollup_res_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('resolution', 'equipment_name', 'bucket_start'), name='rollup_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_dataset_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='index_pending',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -2,9 +2,107 @@ from django.db import models
 
 class Dataset(models.Model):
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # moves on every save, e.g. a recomputed summary
     file_name = models.CharField(max_length=255)
-    raw_csv = models.TextField()
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)  # sha256 of the uploaded bytes
+    stored_file = models.CharField(max_length=512, blank=True)  # relative to MEDIA_ROOT
+    storage_key = models.CharField(max_length=64, blank=True)  # columnar store under MEDIA_ROOT/columnar
+    raw_csv = models.TextField(blank=True, default="")  # optional archival copy
     summary = models.JSONField(null=True, blank=True)
+    summary_version = models.PositiveIntegerField(default=0)
+    index_pending = models.BooleanField(default=False)  # readings and rollups not built yet
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the history list walks (uploaded_at, id) backwards
+            models.Index(fields=["uploaded_at", "id"], name="dataset_uploaded_at_idx"),
+        ]
 
     def __str__(self):
         return f"{self.file_name} @ {self.uploaded_at}"
+
+
+class EquipmentReading(models.Model):
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name="readings")
+    equipment_name = models.CharField(max_length=255, blank=True)
+    equipment_type = models.CharField(max_length=100, blank=True)
+    flowrate = models.FloatField(null=True, blank=True)
+    pressure = models.FloatField(null=True, blank=True)
+    temperature = models.FloatField(null=True, blank=True)
+    timestamp = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["equipment_type", "timestamp"], name="reading_type_ts_idx"),
+            models.Index(fields=["equipment_name", "timestamp"], name="reading_name_ts_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_name} ({self.equipment_type}) @ {self.timestamp}"
+
+
+class ReadingRollup(models.Model):
+    """Per-equipment min/max/sum/count of each metric for one minute, hour or day bucket."""
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+    RESOLUTION_CHOICES = [(MINUTE, "Minute"), (HOUR, "Hour"), (DAY, "Day")]
+
+    equipment_name = models.CharField(max_length=255)
+    resolution = models.CharField(max_length=8, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.BigIntegerField(default=0)
+    flowrate_count = models.BigIntegerField(default=0)
+    flowrate_sum = models.FloatField(default=0.0)
+    flowrate_min = models.FloatField(null=True, blank=True)
+    flowrate_max = models.FloatField(null=True, blank=True)
+    pressure_count = models.BigIntegerField(default=0)
+    pressure_sum = models.FloatField(default=0.0)
+    pressure_min = models.FloatField(null=True, blank=True)
+    pressure_max = models.FloatField(null=True, blank=True)
+    temperature_count = models.BigIntegerField(default=0)
+    temperature_sum = models.FloatField(default=0.0)
+    temperature_min = models.FloatField(null=True, blank=True)
+    temperature_max = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["resolution", "equipment_name", "bucket_start"], name="rollup_bucket_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["resolution", "bucket_start"], name="rollup_res_start_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.equipment_name} {self.resolution} @ {self.bucket_start}"
+
+
+class IngestJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    file_name = models.CharField(max_length=255)
+    stored_file = models.CharField(max_length=512)  # staged upload, relative to MEDIA_ROOT
+    bytes_total = models.BigIntegerField(default=0)
+    bytes_done = models.BigIntegerField(default=0)
+    rows_done = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    dataset = models.ForeignKey(Dataset, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+
+    @property
+    def progress(self):
+        if self.status == self.DONE:
+            return 1.0
+        if not self.bytes_total:
+            return 0.0
+        return min(1.0, self.bytes_done / self.bytes_total)
+
+    def __str__(self):
+        return f"{self.file_name} [{self.status}]"
@@ -0,0 +1,64 @@
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PYARROW = True
+except ImportError:  # optional: the C engine is used instead
+    HAVE_PYARROW = False
+
+# Known columns of the equipment schema and the dtypes they are parsed as.
+CATEGORY_COLUMNS = ("Type",)
+FLOAT_COLUMNS = ("Flowrate", "Pressure", "Temperature")
+
+BAD_LINE_POLICIES = ("error", "warn", "skip")
+DEFAULT_BAD_LINES = "skip"
+
+
+def pick_engine(chunksize=None):
+    """pyarrow when installed; the C engine for chunked reads, which pyarrow does not support."""
+    return "pyarrow" if HAVE_PYARROW and chunksize is None else "c"
+
+
+def equipment_dtypes(columns=None, float_dtype="float32"):
+    """
+    dtype hints for the known equipment columns, restricted to ``columns``
+    when given. ``float_dtype=None`` leaves the numeric columns to inference.
+    """
+    dtypes = {name: "category" for name in CATEGORY_COLUMNS}
+    if float_dtype is not None:
+        dtypes.update({name: float_dtype for name in FLOAT_COLUMNS})
+    if columns is not None:
+        dtypes = {name: dtype for name, dtype in dtypes.items() if name in columns}
+    return dtypes
+
+
+def read_equipment_csv(source, usecols=None, on_bad_lines=DEFAULT_BAD_LINES, chunksize=None,
+                       float_dtype="float32", engine=None):
+    """
+    ``pd.read_csv`` for equipment CSVs: picks the fastest available engine,
+    parses Type as a category and the measurements as ``float_dtype``, and
+    only materialises ``usecols`` when given. If a measurement column turns
+    out to hold text the whole-file read is retried with inferred dtypes
+    (a chunked read cannot rewind, so pass ``float_dtype=None`` there).
+    """
+    if on_bad_lines not in BAD_LINE_POLICIES:
+        raise ValueError(f"on_bad_lines must be one of {', '.join(BAD_LINE_POLICIES)}")
+    engine = engine or pick_engine(chunksize)
+    columns = set(usecols) if usecols is not None else None
+    kwargs = {"encoding": "utf-8", "on_bad_lines": on_bad_lines, "usecols": usecols, "engine": engine}
+    if chunksize is not None:
+        kwargs["chunksize"] = chunksize
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    start = source.tell() if hasattr(source, "seekable") and source.seekable() else None
+    try:
+        return pd.read_csv(source, dtype=equipment_dtypes(columns, float_dtype), **kwargs)
+    except ValueError:
+        if float_dtype is None or chunksize is not None or (start is None and not isinstance(source, str)):
+            raise
+    if start is not None:
+        source.seek(start)
+    return pd.read_csv(source, dtype=equipment_dtypes(columns, None), **kwargs)
@@ -0,0 +1,208 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .columnar import DATE_COLUMN_NAMES, NAT
+from .downsample import METHODS as SERIES_METHODS, downsample
+from .summary import NumericAccumulator
+
+AGGREGATIONS = ("type_counts", "means", "correlation", "series")
+DEFAULT_SERIES_POINTS = 200
+MAX_SERIES_POINTS = 5000
+
+
+class QueryError(ValueError):
+    pass
+
+
+def _json_float(value):
+    return None if value is None or math.isnan(value) else float(value)
+
+
+def _listify(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return list(value)
+
+
+def _to_ns(value, end_of_day=False):
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise QueryError(f"Invalid date: {value}")
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    if end_of_day and len(str(value)) <= 10:
+        # a bare date includes the whole day, like the desktop date filter
+        ts = ts + pd.Timedelta(days=1) - pd.Timedelta(1, "ns")
+    return ts.as_unit("ns").value
+
+
+def parse_query(params):
+    """
+    Normalise query parameters from a JSON body or a query string into
+    ``{"start", "end", "types", "ranges", "aggregations", "series_column", "series_points",
+    "series_method"}``.
+    Query strings spell numeric ranges as ``min_<Column>=`` / ``max_<Column>=``.
+    """
+    ranges = {}
+    raw_ranges = params.get("ranges") or {}
+    if not isinstance(raw_ranges, dict):
+        raise QueryError("ranges must be an object of {column: {min, max}}")
+    for col, bounds in raw_ranges.items():
+        ranges[col] = dict(bounds)
+    for key in params.keys():
+        for bound in ("min", "max"):
+            if key.startswith(f"{bound}_"):
+                ranges.setdefault(key[len(bound) + 1:], {})[bound] = params.get(key)
+    for col, bounds in ranges.items():
+        for bound, value in list(bounds.items()):
+            if value is None or value == "":
+                del bounds[bound]
+                continue
+            try:
+                bounds[bound] = float(value)
+            except (TypeError, ValueError):
+                raise QueryError(f"{bound} for {col} must be a number")
+
+    aggregations = _listify(params.get("aggregations") or params.get("agg")) or ["type_counts", "means"]
+    unknown = [a for a in aggregations if a not in AGGREGATIONS]
+    if unknown:
+        raise QueryError(f"Unknown aggregations: {', '.join(unknown)}")
+
+    try:
+        points = int(params.get("series_points") or DEFAULT_SERIES_POINTS)
+    except (TypeError, ValueError):
+        raise QueryError("series_points must be an integer")
+    method = params.get("series_method") or "lttb"
+    if method not in SERIES_METHODS:
+        raise QueryError(f"series_method must be one of: {', '.join(SERIES_METHODS)}")
+
+    return {
+        "start": params.get("start") or None,
+        "end": params.get("end") or None,
+        "types": [str(t) for t in _listify(params.get("type") or params.get("types"))],
+        "ranges": ranges,
+        "aggregations": aggregations,
+        "series_column": params.get("series_column") or None,
+        "series_points": max(2, min(points, MAX_SERIES_POINTS)),
+        "series_method": method,
+    }
+
+
+def find_date_column(store):
+    for name in store.columns:
+        if name.lower() in DATE_COLUMN_NAMES and store.kind(name) == "datetime64[ns]":
+            return name
+    return None
+
+
+def find_type_column(store):
+    for name in store.columns:
+        if "type" in name.lower() and store.kind(name) == "category":
+            return name
+    return None
+
+
+def numeric_columns(store):
+    return [name for name in store.columns if store.kind(name) == "float64"]
+
+
+def build_mask(store, query):
+    mask = np.ones(len(store), dtype=bool)
+
+    if query["start"] or query["end"]:
+        date_col = find_date_column(store)
+        if date_col is None:
+            raise QueryError("Dataset has no date column to filter on")
+        stamps = store.raw(date_col)
+        mask &= stamps != NAT
+        if query["start"]:
+            mask &= stamps >= _to_ns(query["start"])
+        if query["end"]:
+            mask &= stamps <= _to_ns(query["end"], end_of_day=True)
+
+    if query["types"]:
+        type_col = find_type_column(store)
+        if type_col is None:
+            raise QueryError("Dataset has no type column to filter on")
+        dictionary = store.dictionary(type_col)
+        wanted = [i for i, value in enumerate(dictionary) if value in query["types"]]
+        mask &= np.isin(store.raw(type_col), wanted)
+
+    for col, bounds in query["ranges"].items():
+        if col not in store.columns or store.kind(col) != "float64":
+            raise QueryError(f"{col} is not a numeric column")
+        values = store.raw(col)
+        if "min" in bounds:
+            mask &= values >= bounds["min"]
+        if "max" in bounds:
+            mask &= values <= bounds["max"]
+    return mask
+
+
+def _series(store, mask, column, points, method="lttb"):
+    rows = np.flatnonzero(mask)
+    values = np.asarray(store.raw(column))[rows]
+    keep = ~np.isnan(values)
+    date_col = find_date_column(store)
+    if date_col is not None:
+        xs = np.asarray(store.raw(date_col))[rows]
+        keep &= xs != NAT
+    else:
+        xs = rows
+    xs, values = xs[keep], values[keep]
+    if date_col is not None:
+        order = np.argsort(xs, kind="stable")
+        xs, values = xs[order], values[order]
+    xs, values = downsample(xs, values, points, method)
+    if date_col is not None:
+        xs = pd.to_datetime(xs).strftime("%Y-%m-%dT%H:%M:%S")
+    return {"column": column, "x": xs.tolist(), "y": values.tolist()}
+
+
+def run_query(store, query):
+    mask = build_mask(store, query)
+    result = {"total_rows": len(store), "matched_rows": int(mask.sum())}
+    numerics = numeric_columns(store)
+
+    if "type_counts" in query["aggregations"]:
+        type_col = find_type_column(store)
+        counts = {}
+        if type_col is not None:
+            codes = np.asarray(store.raw(type_col))[mask]
+            codes = codes[codes >= 0]
+            tally = np.bincount(codes, minlength=len(store.dictionary(type_col)))
+            dictionary = store.dictionary(type_col)
+            order = np.argsort(-tally, kind="stable")
+            counts = {dictionary[i]: int(tally[i]) for i in order if tally[i]}
+        result["type_counts"] = counts
+
+    if "means" in query["aggregations"]:
+        stats = {}
+        for col in numerics:
+            acc = NumericAccumulator().update(np.asarray(store.raw(col))[mask])
+            stats[col] = {k: _json_float(v) if isinstance(v, float) else v for k, v in acc.as_dict().items()}
+        result["means"] = {col: s.get("mean") for col, s in stats.items()}
+        result["stats"] = stats
+
+    if "correlation" in query["aggregations"]:
+        frame = pd.DataFrame({col: np.asarray(store.raw(col))[mask] for col in numerics})
+        corr = frame.corr(min_periods=2) if len(numerics) >= 2 else pd.DataFrame()
+        result["correlation"] = {
+            "columns": list(corr.columns),
+            "matrix": [[_json_float(v) for v in row] for row in corr.to_numpy().tolist()],
+        }
+
+    if "series" in query["aggregations"]:
+        column = query["series_column"] or next((c for c in numerics if "flow" in c.lower()), None)
+        if column is None and numerics:
+            column = numerics[0]
+        if column is not None and column not in numerics:
+            raise QueryError(f"{column} is not a numeric column")
+        result["series"] = _series(store, mask, column, query["series_points"], query["series_method"]) if column else None
+
+    return result
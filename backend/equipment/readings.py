@@ -0,0 +1,85 @@
+import math
+from datetime import timezone as dt_timezone
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+
+from .columnar import NAT
+from .models import EquipmentReading
+from .query import find_date_column, find_type_column
+
+STORE_READINGS = getattr(settings, "EQUIPMENT_STORE_READINGS", True)
+READING_BATCH_SIZE = 5000
+
+NAME_COLUMNS = ("equipment name", "equipment_name", "equipment", "name")
+VALUE_COLUMNS = {"flowrate": "flowrate", "pressure": "pressure", "temperature": "temperature"}
+
+
+def find_column(store, candidates):
+    lowered = {name.lower(): name for name in store.columns}
+    return next((lowered[c] for c in candidates if c in lowered), None)
+
+
+def column_labels(store, name, rows):
+    if name is None:
+        return [""] * len(rows)
+    if store.kind(name) != "category":
+        return [("" if np.isnan(v) else f"{v:g}") for v in np.asarray(store.raw(name))[rows]]
+    dictionary = np.array(store.dictionary(name) + [""], dtype=object)
+    return dictionary[np.asarray(store.raw(name))[rows]].tolist()  # code -1 picks the trailing ""
+
+
+def _floats(store, name, rows):
+    if name is None or store.kind(name) != "float64":
+        return [None] * len(rows)
+    values = np.asarray(store.raw(name))[rows]
+    return [None if math.isnan(v) else v for v in values.tolist()]
+
+
+def _timestamps(store, name, rows):
+    if name is None:
+        return [None] * len(rows)
+    stamps = np.asarray(store.raw(name))[rows]
+    out = []
+    for value in stamps.tolist():
+        if value == NAT:
+            out.append(None)
+            continue
+        ts = pd.Timestamp(value).to_pydatetime()
+        out.append(ts.replace(tzinfo=dt_timezone.utc) if settings.USE_TZ else ts)
+    return out
+
+
+def populate_readings(ds, store, batch_size=READING_BATCH_SIZE):
+    """
+    Copy the rows of ``ds`` from its columnar store into EquipmentReading
+    in batched bulk_creates. Returns the number of readings written.
+    """
+    if not STORE_READINGS or store is None or not len(store):
+        return 0
+    name_col = find_column(store, NAME_COLUMNS)
+    type_col = find_type_column(store)
+    date_col = find_date_column(store)
+    value_cols = {field: find_column(store, (col,)) for col, field in VALUE_COLUMNS.items()}
+
+    written = 0
+    with transaction.atomic():
+        for start in range(0, len(store), batch_size):
+            rows = np.arange(start, min(start + batch_size, len(store)))
+            columns = zip(
+                column_labels(store, name_col, rows),
+                column_labels(store, type_col, rows),
+                _floats(store, value_cols["flowrate"], rows),
+                _floats(store, value_cols["pressure"], rows),
+                _floats(store, value_cols["temperature"], rows),
+                _timestamps(store, date_col, rows),
+            )
+            EquipmentReading.objects.bulk_create([
+                EquipmentReading(dataset_id=ds.id, equipment_name=name[:255], equipment_type=kind[:100],
+                                 flowrate=flow, pressure=pressure, temperature=temperature, timestamp=ts)
+                for name, kind, flow, pressure, temperature, ts in columns
+            ], batch_size=batch_size)
+            written += len(rows)
+    return written
@@ -0,0 +1,183 @@
+from datetime import timedelta, timezone as dt_timezone
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+
+from .columnar import NAT
+from .models import ReadingRollup
+from .query import find_date_column
+from .readings import NAME_COLUMNS, VALUE_COLUMNS, column_labels, find_column
+
+METRICS = ("flowrate", "pressure", "temperature")
+RESOLUTIONS = (
+    (ReadingRollup.MINUTE, "min", 60),
+    (ReadingRollup.HOUR, "h", 3600),
+    (ReadingRollup.DAY, "D", 86400),
+)
+BUCKET_FIELDS = ("count",) + tuple(f"{m}_{s}" for m in METRICS for s in ("count", "sum", "min", "max"))
+DEFAULT_MAX_POINTS = 500
+ROLLUP_BATCH_SIZE = 500
+# Rows aggregated at a time; partial buckets of successive blocks are merged.
+ROLLUP_BLOCK_ROWS = 100_000
+
+
+def _aware(ts):
+    value = pd.Timestamp(ts).to_pydatetime()
+    return value.replace(tzinfo=dt_timezone.utc) if settings.USE_TZ else value
+
+
+def _blocks(store, block_rows):
+    """The dated rows of ``store`` as DataFrames of at most ``block_rows`` rows, read straight from the memory maps."""
+    date_col = find_date_column(store)
+    if date_col is None:
+        return
+    name_col = find_column(store, NAME_COLUMNS)
+    value_cols = {field: find_column(store, (col,)) for col, field in VALUE_COLUMNS.items()}
+    for start in range(0, len(store), block_rows):
+        stop = min(start + block_rows, len(store))
+        stamps = np.asarray(store.raw(date_col)[start:stop])
+        keep = np.flatnonzero(stamps != NAT)
+        if not len(keep):
+            continue
+        if name_col is not None and store.kind(name_col) == "category":
+            # group on dictionary codes rather than one Python string per row
+            codes = np.asarray(store.raw(name_col)[start:stop])[keep]
+            names = pd.Categorical.from_codes(codes, categories=pd.Index(store.dictionary(name_col), dtype=object))
+        else:
+            names = column_labels(store, name_col, start + keep)
+        df = pd.DataFrame({"equipment_name": names, "ts": stamps[keep].view("datetime64[ns]")})
+        for field, name in value_cols.items():
+            if name is not None and store.kind(name) == "float64":
+                df[field] = np.asarray(store.raw(name)[start:stop])[keep]
+            else:
+                df[field] = np.nan
+        yield df
+
+
+def _aggregate(df, freq):
+    spec = {"count": ("ts", "size")}
+    for metric in METRICS:
+        spec[f"{metric}_count"] = (metric, "count")
+        spec[f"{metric}_sum"] = (metric, "sum")
+        spec[f"{metric}_min"] = (metric, "min")
+        spec[f"{metric}_max"] = (metric, "max")
+    grouped = df.groupby(["equipment_name", df["ts"].dt.floor(freq).rename("bucket_start")],
+                         sort=False, observed=True, dropna=False)
+    agg = grouped.agg(**spec).reset_index()
+    names = agg["equipment_name"].astype(object)
+    agg["equipment_name"] = names.where(names.notna(), "")
+    return agg
+
+
+def _combine(existing, agg):
+    # fold two sets of buckets (stored and new, or two blocks of one dataset) together
+    if existing is None:
+        return agg
+    spec = {"count": "sum"}
+    for metric in METRICS:
+        spec.update({f"{metric}_count": "sum", f"{metric}_sum": "sum", f"{metric}_min": "min", f"{metric}_max": "max"})
+    both = pd.concat([existing[agg.columns], agg], ignore_index=True)
+    return both.groupby(["equipment_name", "bucket_start"], sort=False).agg(spec).reset_index()
+
+
+def _rollups(agg, resolution):
+    values = agg[list(BUCKET_FIELDS)].astype(object)
+    values = values.where(values.notna(), None)
+    return [ReadingRollup(equipment_name=name, resolution=resolution, bucket_start=_aware(start),
+                          **dict(zip(BUCKET_FIELDS, row)))
+            for name, start, row in zip(agg["equipment_name"].tolist(), agg["bucket_start"],
+                                        values.itertuples(index=False, name=None))]
+
+
+def update_rollups(store, block_rows=ROLLUP_BLOCK_ROWS):
+    """
+    Fold the rows of a newly ingested dataset into the minute/hour/day rollups.
+    The store is aggregated ``block_rows`` rows at a time and the partial
+    buckets merged, so memory follows the number of buckets, not rows.
+    Buckets that already exist are merged with the new counts, so history
+    is never re-scanned, and written back with one upsert per batch.
+    Returns the number of buckets touched.
+    """
+    buckets = dict.fromkeys(resolution for resolution, _, _ in RESOLUTIONS)
+    for df in _blocks(store, block_rows):
+        for resolution, freq, _ in RESOLUTIONS:
+            buckets[resolution] = _combine(buckets[resolution], _aggregate(df, freq))
+    if buckets[RESOLUTIONS[0][0]] is None:
+        return 0
+    touched = 0
+    with transaction.atomic():
+        for resolution, agg in buckets.items():
+            existing = pd.DataFrame.from_records(
+                ReadingRollup.objects.select_for_update().filter(
+                    resolution=resolution,
+                    bucket_start__gte=_aware(agg["bucket_start"].min()),
+                    bucket_start__lte=_aware(agg["bucket_start"].max()),
+                    equipment_name__in=agg["equipment_name"].unique().tolist(),
+                ).values_list("equipment_name", "bucket_start", *BUCKET_FIELDS),
+                columns=["equipment_name", "bucket_start", *BUCKET_FIELDS],
+            )
+            if len(existing):
+                existing["bucket_start"] = pd.to_datetime(existing["bucket_start"], utc=True).dt.tz_localize(None)
+                agg = _combine(existing, agg)
+            # merged buckets overwrite their rows in place (rollup_bucket_uniq)
+            ReadingRollup.objects.bulk_create(
+                _rollups(agg, resolution), batch_size=ROLLUP_BATCH_SIZE, update_conflicts=True,
+                unique_fields=["resolution", "equipment_name", "bucket_start"], update_fields=list(BUCKET_FIELDS),
+            )
+            touched += len(agg)
+    return touched
+
+
+def choose_resolution(start, end, max_points=DEFAULT_MAX_POINTS):
+    """Finest resolution that keeps the window at or under ``max_points`` buckets."""
+    span = max((end - start).total_seconds(), 0)
+    for resolution, _, seconds in RESOLUTIONS:
+        if span / seconds <= max_points:
+            return resolution
+    return RESOLUTIONS[-1][0]
+
+
+def rollup_series(start=None, end=None, equipment=None, max_points=DEFAULT_MAX_POINTS, resolution=None):
+    """
+    Bucketed min/max/mean/count of every metric between ``start`` and ``end``,
+    per equipment when ``equipment`` is given and summed over all equipment
+    otherwise. The window defaults to everything that has been rolled up.
+    """
+    rollups = ReadingRollup.objects.all()
+    if equipment:
+        rollups = rollups.filter(equipment_name__in=equipment)
+    if start is None or end is None:
+        bounds = rollups.filter(resolution=ReadingRollup.DAY).aggregate(first=Min("bucket_start"), last=Max("bucket_start"))
+        start = start or bounds["first"]
+        # the last day bucket covers the whole of that day at finer resolutions
+        end = end or (bounds["last"] and bounds["last"] + timedelta(days=1))
+        if start is None or end is None:
+            return {"resolution": resolution, "start": None, "end": None, "series": {}}
+    resolution = resolution or choose_resolution(start, end, max_points)
+
+    group = ["equipment_name", "bucket_start"] if equipment else ["bucket_start"]
+    sums = {"count": Sum("count")}
+    for metric in METRICS:
+        sums[f"{metric}_count"] = Sum(f"{metric}_count")
+        sums[f"{metric}_sum"] = Sum(f"{metric}_sum")
+        sums[f"{metric}_min"] = Min(f"{metric}_min")
+        sums[f"{metric}_max"] = Max(f"{metric}_max")
+    rows = (rollups.filter(resolution=resolution, bucket_start__gte=start, bucket_start__lte=end)
+            .values(*group).annotate(**sums).order_by(*group))
+
+    series = {}
+    for row in rows:
+        point = {"t": row["bucket_start"], "count": row["count"]}
+        for metric in METRICS:
+            count = row[f"{metric}_count"]
+            point[metric] = {
+                "count": count,
+                "mean": row[f"{metric}_sum"] / count if count else None,
+                "min": row[f"{metric}_min"],
+                "max": row[f"{metric}_max"],
+            }
+        series.setdefault(row.get("equipment_name", "all"), []).append(point)
+    return {"resolution": resolution, "start": start, "end": end, "series": series}
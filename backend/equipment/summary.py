@@ -0,0 +1,287 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from .downsample import lttb
+
+# Bump whenever the shape or semantics of the summary JSON change; stored
+# summaries with an older version are recomputed on first read.
+SUMMARY_VERSION = 2
+
+PREVIEW_ROWS = 5
+AVERAGE_COLUMNS = ["Flowrate", "Pressure", "Temperature"]
+# Column and length of the summary's ``sparkline``, the history thumbnail series.
+SPARKLINE_COLUMN = "Flowrate"
+SPARKLINE_POINTS = 48
+
+
+class NumericAccumulator:
+    """
+    Running count/sum/min/max plus Welford mean and variance for one column.
+    Chunks are folded in with Chan's parallel update, so accumulators built
+    on different chunks or workers can be merged without losing precision.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def push(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.total += x
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def update(self, values):
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        chunk = NumericAccumulator()
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(((values - chunk.mean) ** 2).sum())
+        chunk.total = float(values.sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        return self.merge(chunk)
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        if not self.count:
+            self.__dict__.update(other.__dict__)
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count else float("nan")
+
+    def as_dict(self):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.mean,
+            "variance": self.variance,
+            "std": math.sqrt(self.variance),
+            "min": self.min,
+            "max": self.max,
+        }
+
+
+class SeriesSketch:
+    """
+    Fixed number of row-position buckets holding the sum and count of one
+    column. When a row lands past the last bucket, neighbouring buckets are
+    paired up and the bucket width doubles, so any number of rows fits in
+    ``capacity`` buckets and early rows are weighed like late ones.
+    """
+
+    def __init__(self, capacity=SPARKLINE_POINTS * 4):
+        self.capacity = capacity + capacity % 2
+        self.width = 1
+        self.sums = np.zeros(self.capacity)
+        self.counts = np.zeros(self.capacity)
+
+    def _fit(self, row):
+        while row // self.width >= self.capacity:
+            half = self.capacity // 2
+            for buckets in (self.sums, self.counts):
+                buckets[:half] = buckets.reshape(half, 2).sum(axis=1)
+                buckets[half:] = 0
+            self.width *= 2
+
+    def push(self, row, x):
+        self._fit(row)
+        self.sums[row // self.width] += x
+        self.counts[row // self.width] += 1
+
+    def update(self, offset, values):
+        """Add a chunk whose first value is row ``offset``; NaN is skipped."""
+        values = np.asarray(values, dtype="float64")
+        if not len(values):
+            return self
+        self._fit(offset + len(values) - 1)
+        present = ~np.isnan(values)
+        buckets = (offset + np.flatnonzero(present)) // self.width
+        self.sums += np.bincount(buckets, weights=values[present], minlength=self.capacity)
+        self.counts += np.bincount(buckets, minlength=self.capacity)
+        return self
+
+    def merge(self, other, offset):
+        """Fold in a sketch of the rows after ``offset``; its buckets land at their midpoints."""
+        for i in np.flatnonzero(other.counts):
+            row = offset + int((i + 0.5) * other.width)
+            self._fit(row)
+            self.sums[row // self.width] += other.sums[i]
+            self.counts[row // self.width] += other.counts[i]
+        return self
+
+    def result(self, points=SPARKLINE_POINTS):
+        """Bucket means in row order, thinned to ``points`` with LTTB."""
+        filled = np.flatnonzero(self.counts)
+        means = self.sums[filled] / self.counts[filled]
+        if len(means) > points:
+            means = means[lttb(filled, means, points)]
+        return [round(float(v), 4) for v in means]
+
+
+def _coerce(value):
+    # best-effort typing for values coming from a raw row iterator (csv module)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if text == "":
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return value
+
+
+class SummaryBuilder:
+    """
+    Builds the dataset summary incrementally. Feed it DataFrame chunks
+    (``pd.read_csv(chunksize=...)``) with ``update`` or plain dict rows with
+    ``update_rows``; builders fed on separate chunks can be combined with
+    ``merge``. Memory depends on the number of columns and distinct types,
+    never on the number of rows.
+    """
+
+    def __init__(self, stat_columns=AVERAGE_COLUMNS):
+        self.stat_columns = list(stat_columns)
+        self.total_rows = 0
+        self.columns = None
+        self.preview = []
+        self.type_counts = {}
+        self.stats = {}
+        self.non_numeric = set()
+        self.sparkline = SeriesSketch()
+
+    def update(self, df):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        offset = self.total_rows
+        self.total_rows += len(df)
+
+        if len(self.preview) < PREVIEW_ROWS:
+            head = df.head(PREVIEW_ROWS - len(self.preview))
+            # missing cells become null: NaN is not valid JSON for the summary column
+            head = head.astype(object).where(head.notna(), None)
+            self.preview.extend(head.to_dict(orient="records"))
+
+        if "Type" in df.columns:
+            for key, count in df["Type"].value_counts().items():
+                self.type_counts[key] = self.type_counts.get(key, 0) + int(count)
+
+        for col in self.stat_columns:
+            if col not in df.columns or col in self.non_numeric:
+                continue
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                # one non-numeric chunk makes the whole column non-numeric
+                self.non_numeric.add(col)
+                continue
+            values = df[col].to_numpy(dtype="float64", na_value=np.nan)
+            self.stats.setdefault(col, NumericAccumulator()).update(values)
+            if col == SPARKLINE_COLUMN:
+                self.sparkline.update(offset, values)
+        return self
+
+    def update_rows(self, rows):
+        for row in rows:
+            if self.columns is None:
+                self.columns = list(row.keys())
+            self.total_rows += 1
+            if len(self.preview) < PREVIEW_ROWS:
+                self.preview.append({k: _coerce(v) for k, v in row.items()})
+
+            kind = _coerce(row.get("Type"))
+            if kind is not None:
+                self.type_counts[kind] = self.type_counts.get(kind, 0) + 1
+
+            for col in self.stat_columns:
+                if col not in row or col in self.non_numeric:
+                    continue
+                value = _coerce(row[col])
+                if value is None:
+                    self.stats.setdefault(col, NumericAccumulator())
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    if not math.isnan(value):
+                        self.stats.setdefault(col, NumericAccumulator()).push(float(value))
+                        if col == SPARKLINE_COLUMN:
+                            self.sparkline.push(self.total_rows - 1, float(value))
+                else:
+                    self.non_numeric.add(col)
+        return self
+
+    def merge(self, other):
+        if self.columns is None:
+            self.columns = other.columns
+        self.sparkline.merge(other.sparkline, self.total_rows)
+        self.total_rows += other.total_rows
+        self.preview.extend(other.preview[:max(0, PREVIEW_ROWS - len(self.preview))])
+        for key, count in other.type_counts.items():
+            self.type_counts[key] = self.type_counts.get(key, 0) + count
+        self.non_numeric |= other.non_numeric
+        for col, acc in other.stats.items():
+            self.stats.setdefault(col, NumericAccumulator()).merge(acc)
+        return self
+
+    def column_stats(self):
+        return {col: acc.as_dict() for col, acc in self.stats.items() if col not in self.non_numeric}
+
+    def result(self):
+        summary = {
+            "total_rows": self.total_rows,
+            "columns": self.columns or [],
+            "preview": self.preview,
+            "type_distribution": {},
+            "averages": {},
+            "sparkline": []
+        }
+        if self.columns and "Type" in self.columns:
+            ordered = sorted(self.type_counts.items(), key=lambda kv: kv[1], reverse=True)
+            summary["type_distribution"] = dict(ordered)
+        for col in AVERAGE_COLUMNS:
+            acc = self.stats.get(col)
+            if acc is not None and col not in self.non_numeric:
+                summary["averages"][f"{col.lower()}_avg"] = acc.mean if acc.count else None
+        if SPARKLINE_COLUMN not in self.non_numeric:
+            summary["sparkline"] = self.sparkline.result()
+        return summary
+
+
+def summarize_chunks(chunks):
+    builder = SummaryBuilder()
+    for df in chunks:
+        builder.update(df)
+    return builder.result()
+
+
+def compute_summary(df):
+    return SummaryBuilder().update(df).result()
@@ -0,0 +1,920 @@
+import csv
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from . import bulk, columnar, ingest, jobs, parsing, rollups, views
+from .columnar import ColumnarWriter
+from .downsample import downsample, lttb, minmax
+from .httpcache import RESPONSE_CACHE
+from .ingest import ingest_csv
+from .instrumentation import MetricsRegistry
+from .models import Dataset, EquipmentReading, IngestJob, ReadingRollup
+from .parsing import equipment_dtypes, pick_engine, read_equipment_csv
+from .summary import SUMMARY_VERSION, NumericAccumulator, SummaryBuilder, compute_summary, summarize_chunks
+
+
+def equipment_frame(rows=200, start="2024-01-01", freq="17min", seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Equipment Name": [f"P-{i % 7}" for i in range(rows)],
+        "Type": rng.choice(["Pump", "Valve", "Compressor"], rows),
+        "Flowrate": rng.normal(120, 25, rows).round(3),
+        "Pressure": rng.normal(6, 1.5, rows).round(3),
+        "Temperature": rng.normal(110, 12, rows).round(3),
+        "Timestamp": pd.date_range(start, periods=rows, freq=freq),
+    })
+    # a few gaps, as in real exports, after the preview rows
+    df.loc[6::13, "Flowrate"] = np.nan
+    df.loc[8::29, "Type"] = None
+    return df
+
+
+def equipment_csv(**kwargs):
+    return equipment_frame(**kwargs).to_csv(index=False).encode()
+
+
+class MediaRootMixin:
+    """Points MEDIA_ROOT and the upload and columnar folders derived from it at a fresh temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.mkdtemp(prefix="equipment-tests-")
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        uploads = os.path.join(root, "datasets")
+        os.makedirs(uploads)
+        media = override_settings(MEDIA_ROOT=root)
+        media.enable()
+        self.addCleanup(media.disable)
+        for module, name, value in ((ingest, "UPLOAD_DIR", uploads), (views, "UPLOAD_DIR", uploads),
+                                    (columnar, "COLUMNAR_DIR", os.path.join(root, "columnar"))):
+            patcher = mock.patch.object(module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.media_root = root
+
+
+class EquipmentAPITestCase(MediaRootMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        # rendered responses are cached by ETag, and ids repeat across rolled-back tests
+        caches[RESPONSE_CACHE].clear()
+        self.user = User.objects.create_user("tester", "tester@example.com", "secret")
+        self.client.force_authenticate(self.user)
+        # index on commit in this thread; a background thread cannot see the test transaction
+        patcher = mock.patch.object(jobs, "ASYNC_INDEX", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, data, name="equipment.csv", **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/upload/", {"file": SimpleUploadedFile(name, data, "text/csv"), **params},
+                                    format="multipart")
+
+
+class StreamingIngestTests(MediaRootMixin, SimpleTestCase):
+    def test_bytes_are_stored_while_parsing(self):
+        data = equipment_csv(rows=200)
+        dest = os.path.join(self.media_root, "out.csv")
+        # byte chunks split rows mid-line, and parse chunks are smaller than the file
+        summary = ingest_csv(iter([data[i:i + 100] for i in range(0, len(data), 100)]), dest, chunksize=50)
+        self.assertEqual(summary["total_rows"], 200)
+        with open(dest, "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_failure_leaves_nothing_behind(self):
+        def broken():
+            yield equipment_csv(rows=20)[:300]
+            raise OSError("connection reset")
+
+        with self.assertRaises(OSError):
+            ingest_csv(broken(), os.path.join(self.media_root, "out.csv"))
+        self.assertEqual(os.listdir(self.media_root), ["datasets"])
+
+
+class SummaryParityTests(SimpleTestCase):
+    def assertSummariesEqual(self, actual, expected):
+        self.assertEqual(actual["total_rows"], expected["total_rows"])
+        self.assertEqual(actual["columns"], expected["columns"])
+        self.assertEqual(actual["preview"], expected["preview"])
+        self.assertEqual(actual["type_distribution"], expected["type_distribution"])
+        self.assertEqual(actual["averages"].keys(), expected["averages"].keys())
+        for key, value in expected["averages"].items():
+            self.assertAlmostEqual(actual["averages"][key], value, places=9)
+        np.testing.assert_allclose(actual["sparkline"], expected["sparkline"], atol=1e-3)  # rounded to 4 places
+
+    def test_chunked_frames_match_whole_frame(self):
+        df = equipment_frame(rows=500)
+        whole = compute_summary(df)
+        for size in (1, 7, 64, 499):
+            with self.subTest(chunk_rows=size):
+                chunks = (df.iloc[i:i + size] for i in range(0, len(df), size))
+                self.assertSummariesEqual(summarize_chunks(chunks), whole)
+
+    def test_streamed_bytes_match_whole_file(self):
+        data = equipment_csv(rows=500)
+        blocks = [data[i:i + 333] for i in range(0, len(data), 333)]
+        self.assertSummariesEqual(ingest_csv(iter(blocks), chunksize=41), compute_summary(pd.read_csv(io.BytesIO(data))))
+
+    def test_merged_builders_match_single_builder(self):
+        df = equipment_frame(rows=300)
+        merged = SummaryBuilder().update(df.iloc[:110]).merge(SummaryBuilder().update(df.iloc[110:]))
+        self.assertSummariesEqual(merged.result(), compute_summary(df))
+
+    def test_row_iterator_matches_frame(self):
+        data = equipment_csv(rows=120)
+        rows = SummaryBuilder().update_rows(csv.DictReader(io.StringIO(data.decode()))).result()
+        self.assertSummariesEqual(rows, compute_summary(pd.read_csv(io.BytesIO(data))))
+
+    def test_sparkline_follows_flow(self):
+        df = equipment_frame(rows=5000).assign(Flowrate=np.arange(5000.0))
+        sparkline = compute_summary(df)["sparkline"]
+        self.assertEqual(len(sparkline), 48)
+        self.assertTrue(np.all(np.diff(sparkline) > 0))
+        self.assertLess(sparkline[0], 100)
+        self.assertGreater(sparkline[-1], 4900)
+
+    def test_accumulator_merge_matches_numpy(self):
+        values = np.random.default_rng(4).normal(1e6, 3.0, 1000)  # large mean: naive sums lose the variance
+        merged = NumericAccumulator()
+        for part in np.array_split(values, 9):
+            merged.merge(NumericAccumulator().update(part))
+        self.assertEqual(merged.count, 1000)
+        self.assertAlmostEqual(merged.mean, values.mean(), places=6)
+        self.assertAlmostEqual(merged.variance, values.var(), places=6)
+        self.assertEqual((merged.min, merged.max), (values.min(), values.max()))
+
+
+class UploadTests(EquipmentAPITestCase):
+    def test_upload_is_stored_and_summarized(self):
+        df = equipment_frame(rows=150)
+        data = df.to_csv(index=False).encode()
+        response = self.upload(data, "plant.csv")
+        self.assertEqual(response.status_code, 200)
+        summary = response.data["summary"]
+        self.assertEqual(summary["total_rows"], 150)
+        self.assertAlmostEqual(summary["averages"]["flowrate_avg"], df["Flowrate"].mean(), places=9)
+
+        ds = Dataset.objects.get()
+        self.assertEqual(ds.summary, summary)
+        self.assertEqual(ds.raw_csv, "")
+        with open(os.path.join(self.media_root, ds.stored_file), "rb") as f:
+            self.assertEqual(f.read(), data)
+
+    def test_upload_does_not_wait_for_index(self):
+        with mock.patch.object(jobs, "ASYNC_INDEX", True), mock.patch.object(jobs, "_get_index_executor") as executor:
+            response = self.upload(equipment_csv(rows=120))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["summary"]["total_rows"], 120)
+        executor.return_value.submit.assert_called_once_with(jobs.index_in_background)
+        ds = Dataset.objects.get()
+        self.assertTrue(ds.index_pending)
+        self.assertFalse(EquipmentReading.objects.exists())
+        self.assertFalse(ReadingRollup.objects.exists())
+
+        self.assertEqual(ingest.index_pending_datasets(), 1)
+        ds.refresh_from_db()
+        self.assertFalse(ds.index_pending)
+        self.assertEqual(EquipmentReading.objects.count(), 120)
+        self.assertTrue(ReadingRollup.objects.exists())
+        self.assertEqual(ingest.index_pending_datasets(), 0)
+
+    def test_missing_file_is_rejected(self):
+        response = self.client.post("/api/upload/", {}, format="multipart")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "No file uploaded")
+
+
+class LatestSummaryTests(EquipmentAPITestCase):
+    def test_stored_summary_is_served_without_parsing(self):
+        self.upload(equipment_csv(rows=60), "older.csv")
+        self.upload(equipment_csv(rows=90, seed=5), "newer.csv")
+        with mock.patch.object(ingest, "ingest_csv", side_effect=AssertionError("CSV parsed")):
+            response = self.client.get("/api/latest_summary/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["latest_summary"]["file_name"], "newer.csv")
+        self.assertEqual(response.data["latest_summary"]["total_rows"], 90)
+
+    def test_outdated_summary_is_recomputed_once(self):
+        self.upload(equipment_csv(rows=60))
+        Dataset.objects.update(summary={"total_rows": 0}, summary_version=SUMMARY_VERSION - 1)
+        response = self.client.get("/api/latest_summary/")
+        self.assertEqual(response.data["latest_summary"]["total_rows"], 60)
+        ds = Dataset.objects.get()
+        self.assertEqual((ds.summary_version, ds.summary["total_rows"]), (SUMMARY_VERSION, 60))
+        with mock.patch.object(ingest, "ingest_csv", side_effect=AssertionError("CSV parsed")):
+            caches[RESPONSE_CACHE].clear()
+            self.assertEqual(self.client.get("/api/latest_summary/").status_code, 200)
+
+    def test_no_datasets(self):
+        response = self.client.get("/api/latest_summary/")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["error"], "No datasets found")
+
+
+class ColumnarStoreTests(MediaRootMixin, SimpleTestCase):
+    def write(self, chunks, key="store"):
+        writer = ColumnarWriter(columnar.store_path(key))
+        for chunk in chunks:
+            writer.update(chunk)
+        return writer
+
+    def test_round_trip_across_chunks(self):
+        df = equipment_frame(rows=90)
+        df.loc[5, "Timestamp"] = pd.NaT
+        self.write([df.iloc[:40], df.iloc[40:]]).close()
+        store = columnar.open_store("store")
+        self.assertEqual(len(store), 90)
+        self.assertEqual([store.kind(c) for c in store.columns],
+                         ["category", "category", "float64", "float64", "float64", "datetime64[ns]"])
+        # one dictionary for the whole store, codes -1 for gaps
+        self.assertEqual(sorted(store.dictionary("Type")), sorted(df["Type"].dropna().unique()))
+        self.assertEqual(int(store.raw("Type")[8]), -1)
+        self.assertEqual(int(store.raw("Timestamp")[5]), columnar.NAT)
+        self.assertIsInstance(store.raw("Flowrate"), np.memmap)
+
+        back = store.to_pandas()
+        pd.testing.assert_series_equal(back["Flowrate"], df["Flowrate"], check_names=False)
+        pd.testing.assert_series_equal(back["Timestamp"], df["Timestamp"].astype("datetime64[ns]"), check_names=False)
+        self.assertEqual(back["Type"].astype(object).fillna("").tolist(), df["Type"].fillna("").tolist())
+
+    def test_text_after_numeric_chunks_widens_the_column(self):
+        first = pd.DataFrame({"Code": [1.0, 2.5, np.nan], "Note": [np.nan] * 3, "Flowrate": [1.0, 2.0, 3.0]})
+        second = pd.DataFrame({"Code": ["A-7", "3"], "Note": ["late", None], "Flowrate": [4.0, 5.0]})
+        self.write([first, second, first.iloc[:1]]).close()
+        store = columnar.open_store("store")
+        self.assertEqual([store.kind(c) for c in store.columns], ["category", "category", "float64"])
+        back = store.to_pandas().astype(object).where(lambda d: d.notna(), None)
+        self.assertEqual(back["Code"].tolist(), ["1", "2.5", None, "A-7", "3", "1"])
+        self.assertEqual(back["Note"].tolist(), [None, None, None, "late", None, None])
+        self.assertEqual(back["Flowrate"].tolist(), [1.0, 2.0, 3.0, 4.0, 5.0, 1.0])
+
+    def test_aware_dates_are_stored_as_utc(self):
+        df = pd.DataFrame({"Timestamp": ["2024-03-01T10:00:00+02:00", "2024-03-01T09:30:00Z"]})
+        self.write([df]).close()
+        stamps = columnar.open_store("store").series("Timestamp")
+        self.assertEqual(stamps.dt.strftime("%H:%M").tolist(), ["08:00", "09:30"])
+
+    def test_incomplete_store_is_not_opened(self):
+        writer = self.write([equipment_frame(rows=10)])
+        self.assertIsNone(columnar.open_store("store"))
+        writer.abort()
+        self.assertFalse(os.path.exists(columnar.store_path("store")))
+        self.assertIsNone(columnar.open_store(""))
+
+
+class DatasetColumnsTests(EquipmentAPITestCase):
+    def test_selected_columns(self):
+        df = equipment_frame(rows=40)
+        self.upload(df.to_csv(index=False).encode())
+        ds = Dataset.objects.get()
+        response = self.client.get(f"/api/columns/{ds.id}/", {"columns": "Pressure,Type"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data["columns"]), ["Pressure", "Type"])
+        self.assertEqual(response.data["columns"]["Pressure"], df["Pressure"].tolist())
+        self.assertIsNone(response.data["columns"]["Type"][8])
+
+        missing = self.client.get(f"/api/columns/{ds.id}/", {"columns": "Pressure,Vibration"})
+        self.assertEqual(missing.status_code, 400)
+        self.assertEqual(missing.data["error"], "Unknown columns: Vibration")
+        self.assertEqual(self.client.get("/api/columns/999999/").status_code, 404)
+
+    def test_store_is_built_for_older_datasets(self):
+        self.upload(equipment_csv(rows=40))
+        ds = Dataset.objects.get()
+        shutil.rmtree(columnar.store_path(ds.storage_key))
+        Dataset.objects.update(storage_key="")
+        response = self.client.get(f"/api/columns/{ds.id}/", {"columns": "Flowrate"})
+        self.assertEqual(response.data["total_rows"], 40)
+        ds.refresh_from_db()
+        self.assertIsNotNone(columnar.open_store(ds.storage_key))
+
+
+class DownloadTests(EquipmentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = equipment_csv(rows=300)
+        self.upload(self.data, "plant.csv")
+        self.upload(self.data, "plant-copy.csv")
+        self.original, self.copy = Dataset.objects.order_by("id")
+        self.url = f"/api/download/{self.copy.id}/"
+
+    def get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def test_full_download(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+        self.assertEqual(response["Content-Length"], str(len(self.data)))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["ETag"], f'"{self.copy.id}-{self.copy.content_hash}"')
+        self.assertIn("plant-copy.csv", response["Content-Disposition"])
+
+    def test_byte_range(self):
+        response = self.get(HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.data)}")
+        self.assertEqual(b"".join(response.streaming_content), self.data[100:200])
+
+    def test_suffix_and_open_ranges(self):
+        tail = self.get(HTTP_RANGE="bytes=-50")
+        self.assertEqual(tail.status_code, 206)
+        self.assertEqual(b"".join(tail.streaming_content), self.data[-50:])
+        rest = self.get(HTTP_RANGE=f"bytes={len(self.data) - 10}-")
+        self.assertEqual(b"".join(rest.streaming_content), self.data[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE=f"bytes={len(self.data)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.data)}")
+
+    def test_if_range_mismatch_sends_whole_file(self):
+        response = self.get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+        resumed = self.get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=response["ETag"])
+        self.assertEqual(resumed.status_code, 206)
+
+    def test_if_none_match(self):
+        etag = self.get()["ETag"]
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # the original upload has its own validator
+        self.assertNotEqual(self.client.get(f"/api/download/{self.original.id}/")["ETag"], etag)
+
+    def test_gzip(self):
+        response = self.get(HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(response.streaming_content)), self.data)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_unknown_dataset(self):
+        self.assertEqual(self.client.get("/api/download/999999/").status_code, 404)
+
+
+class DatasetListTests(EquipmentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        for seed in range(5):
+            self.upload(equipment_csv(rows=20, seed=seed), f"set-{seed}.csv")
+
+    def test_cursor_walks_every_dataset_once(self):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get("/api/datasets/", {"limit": 2, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data["datasets"]), 2)
+            seen += [row["id"] for row in response.data["datasets"]]
+            cursor = response.data["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(seen, list(Dataset.objects.order_by("-uploaded_at", "-id").values_list("id", flat=True)))
+
+    def test_field_and_summary_projection(self):
+        response = self.client.get("/api/datasets/", {"fields": "id,summary", "summary_fields": "total_rows"})
+        self.assertEqual(response.status_code, 200)
+        for row in response.data["datasets"]:
+            self.assertEqual(set(row), {"id", "summary"})
+            self.assertEqual(row["summary"], {"total_rows": 20})
+
+    def test_invalid_parameters(self):
+        for params, error in (({"limit": 0}, "limit must be a positive integer"),
+                              ({"limit": "ten"}, "limit must be a positive integer"),
+                              ({"cursor": "not-a-cursor"}, "Invalid cursor"),
+                              ({"fields": "id,raw_csv"}, "Unknown fields: raw_csv")):
+            with self.subTest(**params):
+                response = self.client.get("/api/datasets/", params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data["error"], error)
+
+
+class DatasetQueryTests(EquipmentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = equipment_frame(rows=400)
+        self.upload(self.frame.to_csv(index=False).encode())
+        self.url = f"/api/query/{Dataset.objects.get().id}/"
+
+    def test_filters_match_pandas(self):
+        response = self.client.get(self.url, {"type": "Pump,Valve", "min_Flowrate": 100,
+                                              "start": "2024-01-02", "end": "2024-01-04"})
+        self.assertEqual(response.status_code, 200)
+        df = self.frame
+        expected = df[df["Type"].isin(["Pump", "Valve"]) & (df["Flowrate"] >= 100)
+                      & (df["Timestamp"] >= "2024-01-02") & (df["Timestamp"] < "2024-01-05")]
+        self.assertEqual(response.data["matched_rows"], len(expected))
+        self.assertEqual(response.data["type_counts"], expected["Type"].value_counts().to_dict())
+        self.assertAlmostEqual(response.data["means"]["Pressure"], expected["Pressure"].mean(), places=9)
+
+    def test_json_body(self):
+        response = self.client.post(self.url, {"ranges": {"Pressure": {"max": 6}}, "aggregations": ["means"],
+                                               "series_points": 10}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["matched_rows"], int((self.frame["Pressure"] <= 6).sum()))
+        self.assertNotIn("type_counts", response.data)
+
+    def test_downsampled_series(self):
+        flow = self.frame.dropna(subset=["Flowrate"])
+        for method in ("lttb", "minmax"):
+            with self.subTest(method=method):
+                series = self.client.get(self.url, {"agg": "series", "series_points": 40,
+                                                    "series_method": method}).data["series"]
+                self.assertEqual(series["column"], "Flowrate")
+                self.assertLessEqual(len(series["x"]), 40)
+                self.assertEqual(series["x"], sorted(series["x"]))
+                self.assertEqual(series["x"][0], flow["Timestamp"].iloc[0].strftime("%Y-%m-%dT%H:%M:%S"))
+                if method == "minmax":
+                    self.assertIn(flow["Flowrate"].max(), series["y"])
+
+    def test_gaps_in_preview_are_stored_as_null(self):
+        df = equipment_frame(rows=30)
+        df.loc[1, "Flowrate"] = np.nan
+        self.upload(df.to_csv(index=False).encode(), "gaps.csv")
+        preview = Dataset.objects.get(file_name="gaps.csv").summary["preview"]
+        self.assertIsNone(preview[1]["Flowrate"])
+
+    def test_invalid_parameters(self):
+        for params in ({"agg": "median"}, {"min_Flowrate": "high"}, {"series_points": "many"},
+                       {"series_method": "spline"}, {"min_Type": 1}, {"start": "yesterday-ish"},
+                       {"agg": "series", "series_column": "Type"}):
+            with self.subTest(**params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.data)
+
+    def test_unknown_dataset(self):
+        self.assertEqual(self.client.get("/api/query/999999/").status_code, 404)
+
+
+class IngestJobTests(EquipmentAPITestCase):
+    def test_async_upload_runs_as_job(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            # posted directly: upload() would run the queued worker callback
+            file = SimpleUploadedFile("equipment.csv", equipment_csv(rows=80), "text/csv")
+            response = self.client.post("/api/upload/", {"file": file, "async": "1"}, format="multipart")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], IngestJob.QUEUED)
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(Dataset.objects.exists())
+
+        job = jobs.claim_next_job()
+        self.assertEqual(job.id, response.data["job_id"])
+        self.assertIsNone(jobs.claim_next_job())
+        jobs.run_job(job)
+
+        status = self.client.get(f"/api/jobs/{job.id}/").data
+        self.assertEqual(status["status"], IngestJob.DONE)
+        self.assertEqual(status["progress"], 1.0)
+        self.assertEqual(status["summary"]["total_rows"], 80)
+        self.assertEqual(status["dataset_id"], Dataset.objects.get().id)
+
+    def test_failed_job_reports_error(self):
+        job = IngestJob.objects.create(file_name="gone.csv", stored_file="datasets/gone.csv",
+                                       status=IngestJob.RUNNING, started_at=timezone.now())
+        with self.assertLogs(jobs.logger, "ERROR"):
+            self.assertIsNone(jobs.run_job(job))
+        status = self.client.get(f"/api/jobs/{job.id}/").data
+        self.assertEqual(status["status"], IngestJob.FAILED)
+        self.assertIn("gone.csv", status["error"])
+
+    def test_stale_running_jobs_are_failed(self):
+        now = timezone.now()
+        stale = IngestJob.objects.create(file_name="stale.csv", stored_file="datasets/stale.csv",
+                                         status=IngestJob.RUNNING, started_at=now - jobs.JOB_TIMEOUT - timedelta(minutes=1))
+        live = IngestJob.objects.create(file_name="live.csv", stored_file="datasets/live.csv",
+                                        status=IngestJob.RUNNING, started_at=now)
+        with self.assertLogs(jobs.logger, "WARNING"):
+            self.assertIsNone(jobs.claim_next_job())
+        stale.refresh_from_db()
+        live.refresh_from_db()
+        self.assertEqual(stale.status, IngestJob.FAILED)
+        self.assertEqual(stale.error, "Ingest worker stopped before the job finished")
+        self.assertIsNotNone(stale.finished_at)
+        self.assertEqual(live.status, IngestJob.RUNNING)
+
+    def test_unknown_job(self):
+        self.assertEqual(self.client.get("/api/jobs/999999/").status_code, 404)
+
+
+class BulkUploadTests(EquipmentAPITestCase):
+    def bulk(self, *files):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/upload/bulk/", {"files": list(files)}, format="multipart")
+
+    def archive(self, members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+        return SimpleUploadedFile("batch.zip", buffer.getvalue(), "application/zip")
+
+    def check_batch(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["message"], "Uploaded 3 of 4 files")
+        self.assertEqual([d["file_name"] for d in response.data["datasets"]], ["a.csv", "b.csv", "a-again.csv"])
+        self.assertEqual([e["file_name"] for e in response.data["errors"]], ["empty.csv"])
+        a, b, again = Dataset.objects.order_by("id")
+        self.assertEqual(again.storage_key, a.storage_key)
+        self.assertNotEqual(b.storage_key, a.storage_key)
+        self.assertEqual(a.summary["total_rows"], 40)
+        self.assertEqual(EquipmentReading.objects.count(), 70)
+
+    def members(self):
+        a = equipment_csv(rows=40)
+        return {"a.csv": a, "nested/b.csv": equipment_csv(rows=30, seed=3), "a-again.csv": a,
+                "empty.csv": b"", "notes.txt": b"not a dataset", "__MACOSX/a.csv": b"resource fork"}
+
+    def test_zip_archive(self):
+        with mock.patch.object(bulk, "BULK_WORKERS", 1):
+            self.check_batch(self.bulk(self.archive(self.members())))
+
+    def test_parallel_parse(self):
+        # the pool spawns fresh interpreters, so this also checks they write to the parent's store paths
+        with mock.patch.object(bulk, "BULK_WORKERS", 2):
+            self.check_batch(self.bulk(self.archive(self.members())))
+
+    def test_plain_files_and_existing_content(self):
+        data = equipment_csv(rows=25)
+        self.upload(data, "single.csv")
+        with mock.patch.object(bulk, "BULK_WORKERS", 1):
+            response = self.bulk(SimpleUploadedFile("copy.csv", data, "text/csv"),
+                                 SimpleUploadedFile("new.csv", equipment_csv(rows=25, seed=9), "text/csv"))
+        self.assertEqual(response.status_code, 200)
+        single, copy, new = Dataset.objects.order_by("id")
+        self.assertEqual(copy.storage_key, single.storage_key)
+        self.assertEqual(new.summary["total_rows"], 25)
+
+    def test_rejected_uploads(self):
+        for files, error in (((), "No files uploaded"),
+                             ((self.archive({"notes.txt": b"x"}),), "No CSV files found in upload"),
+                             ((SimpleUploadedFile("broken.zip", b"not a zip"),), "Could not read upload")):
+            with self.subTest(error=error):
+                response = self.bulk(*files)
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.data["error"].startswith(error))
+
+
+class UploadDedupTests(EquipmentAPITestCase):
+    def test_reupload_reuses_stored_content(self):
+        data = equipment_csv(rows=150)
+        first = self.upload(data, "first.csv")
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn("deduplicated", first.data)
+        self.assertEqual(first.data["summary"]["total_rows"], 150)
+
+        second = self.upload(data, "second.csv")
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.data["deduplicated"])
+        self.assertEqual(second.data["summary"], first.data["summary"])
+
+        original, copy = Dataset.objects.order_by("id")
+        self.assertEqual(original.content_hash, hashlib.sha256(data).hexdigest())
+        self.assertEqual(original.stored_file, os.path.join("datasets", f"{original.content_hash}.csv"))
+        self.assertEqual(copy.file_name, "second.csv")
+        self.assertEqual(copy.content_hash, original.content_hash)
+        self.assertEqual((copy.stored_file, copy.storage_key), (original.stored_file, original.storage_key))
+        # readings stay with the first upload of the content
+        self.assertEqual(EquipmentReading.objects.filter(dataset=original).count(), 150)
+        self.assertFalse(EquipmentReading.objects.filter(dataset=copy).exists())
+
+    def test_different_content_is_ingested(self):
+        self.upload(equipment_csv(rows=50))
+        response = self.upload(equipment_csv(rows=50, seed=1))
+        self.assertNotIn("deduplicated", response.data)
+        first, second = Dataset.objects.order_by("id")
+        self.assertNotEqual(first.content_hash, second.content_hash)
+        self.assertNotEqual(first.storage_key, second.storage_key)
+
+
+class ReadingListTests(EquipmentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = equipment_frame(rows=250)
+        self.upload(self.frame.to_csv(index=False).encode())
+        self.dataset = Dataset.objects.get()
+
+    def test_rows_are_normalized(self):
+        readings = self.client.get("/api/readings/", {"limit": 10}).data["readings"]
+        first, row = readings[0], self.frame.iloc[0]
+        self.assertEqual(first["dataset_id"], self.dataset.id)
+        self.assertEqual(first["equipment_name"], row["Equipment Name"])
+        self.assertEqual(first["equipment_type"], row["Type"])
+        self.assertEqual(first["pressure"], row["Pressure"])
+        self.assertEqual(first["timestamp"].replace(tzinfo=None), row["Timestamp"].to_pydatetime())
+        # gaps in the CSV: a missing label is blank, a missing value is null
+        self.assertIsNone(readings[6]["flowrate"])
+        self.assertEqual(readings[8]["equipment_type"], "")
+
+    def test_filters_and_paging(self):
+        params = {"type": "Pump", "equipment": "P-1,P-2", "min_pressure": 5, "start": "2024-01-02",
+                  "dataset": self.dataset.id, "limit": 7}
+        df = self.frame
+        expected = df[(df["Type"] == "Pump") & df["Equipment Name"].isin(["P-1", "P-2"])
+                      & (df["Pressure"] >= 5) & (df["Timestamp"] >= "2024-01-02")]
+        rows, after = [], 0
+        while after is not None:
+            page = self.client.get("/api/readings/", {**params, "after": after}).data
+            self.assertLessEqual(len(page["readings"]), 7)
+            rows += page["readings"]
+            after = page["next_after"]
+        self.assertEqual(len(rows), len(expected))
+        self.assertEqual([r["pressure"] for r in rows], expected["Pressure"].tolist())
+        self.assertFalse(self.client.get("/api/readings/", {"dataset": self.dataset.id + 1}).data["readings"])
+
+    def test_dataset_still_indexing(self):
+        with mock.patch.object(jobs, "ASYNC_INDEX", True), mock.patch.object(jobs, "_get_index_executor"):
+            self.upload(equipment_csv(rows=40, seed=4), "pending.csv")
+            self.upload(self.frame.to_csv(index=False).encode(), "copy.csv")
+        pending, copy = Dataset.objects.exclude(id=self.dataset.id).order_by("id")
+        for dataset in (pending, copy):
+            with self.subTest(dataset=dataset.file_name):
+                page = self.client.get("/api/readings/", {"dataset": dataset.id}).data
+                self.assertEqual((page["readings"], page["next_after"]), ([], None))
+                self.assertIs(page["index_pending"], dataset == pending)
+        self.assertTrue(self.client.get("/api/readings/").data["index_pending"])
+
+        latest = self.client.get("/api/latest_summary/")
+        self.assertEqual(latest.data["latest_summary"]["file_name"], "copy.csv")
+        self.assertFalse(latest.data["latest_summary"]["index_pending"])
+
+        ingest.index_pending_datasets()
+        page = self.client.get("/api/readings/", {"dataset": pending.id, "limit": 100}).data
+        self.assertEqual((len(page["readings"]), page["index_pending"]), (40, False))
+
+    def test_invalid_parameters(self):
+        for params, error in (({"limit": 0}, "limit and after must be positive integers"),
+                              ({"after": "last"}, "limit and after must be positive integers"),
+                              ({"dataset": "latest"}, "dataset must be an integer id"),
+                              ({"start": "soon"}, "Invalid filter value"),
+                              ({"max_temperature": "hot"}, "Invalid filter value")):
+            with self.subTest(**params):
+                response = self.client.get("/api/readings/", params)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data["error"], error)
+
+
+class RollupTests(EquipmentAPITestCase):
+    def hourly(self, frames):
+        # what the hour rollups should hold, straight from the uploaded rows
+        df = pd.concat(frames, ignore_index=True)
+        grouped = df.groupby(["Equipment Name", df["Timestamp"].dt.floor("h")])
+        return grouped.agg(count=("Timestamp", "size"), flow_count=("Flowrate", "count"),
+                           flow_sum=("Flowrate", "sum"), flow_min=("Flowrate", "min"),
+                           pressure_max=("Pressure", "max"))
+
+    def stored(self, resolution=ReadingRollup.HOUR):
+        rows = ReadingRollup.objects.filter(resolution=resolution).values_list(
+            "equipment_name", "bucket_start", "count", "flowrate_count", "flowrate_sum", "flowrate_min", "pressure_max")
+        df = pd.DataFrame.from_records(rows, columns=["Equipment Name", "Timestamp", "count", "flow_count",
+                                                      "flow_sum", "flow_min", "pressure_max"])
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"], utc=True).dt.tz_localize(None)
+        return df.set_index(["Equipment Name", "Timestamp"]).sort_index()
+
+    def assertRollupsMatch(self, frames):
+        expected = self.hourly(frames).sort_index()
+        pd.testing.assert_frame_equal(self.stored(), expected, check_dtype=False)
+
+    def test_uploads_merge_into_shared_buckets(self):
+        # the second upload overlaps the first by half, so their buckets must be merged, not duplicated
+        first = equipment_frame(rows=200, freq="7min")
+        second = equipment_frame(rows=200, freq="7min", start="2024-01-01 11:40", seed=2)
+        self.upload(first.to_csv(index=False).encode())
+        self.assertRollupsMatch([first])
+        self.upload(second.to_csv(index=False).encode())
+        self.assertRollupsMatch([first, second])
+        days = ReadingRollup.objects.filter(resolution=ReadingRollup.DAY)
+        self.assertEqual(sum(days.values_list("count", flat=True)), 400)
+
+    def test_deduplicated_upload_is_not_counted_twice(self):
+        data = equipment_csv(rows=100)
+        self.upload(data)
+        before = self.stored()
+        self.upload(data, "again.csv")
+        pd.testing.assert_frame_equal(self.stored(), before)
+
+    def test_block_size_does_not_change_buckets(self):
+        df = equipment_frame(rows=300, freq="3min")
+        self.upload(df.to_csv(index=False).encode())
+        whole = {res: self.stored(res) for res, _ in ReadingRollup.RESOLUTION_CHOICES}
+        ReadingRollup.objects.all().delete()
+        rollups.update_rollups(columnar.open_store(Dataset.objects.get().storage_key), block_rows=37)
+        for resolution, expected in whole.items():
+            with self.subTest(resolution=resolution):
+                pd.testing.assert_frame_equal(self.stored(resolution), expected)
+
+    def test_series(self):
+        df = equipment_frame(rows=300)
+        self.upload(df.to_csv(index=False).encode())
+        response = self.client.get("/api/rollups/", {"resolution": "day"})
+        self.assertEqual(response.status_code, 200)
+        points = response.data["series"]["all"]
+        self.assertEqual([p["count"] for p in points], df.groupby(df["Timestamp"].dt.floor("D")).size().tolist())
+        self.assertAlmostEqual(points[0]["pressure"]["mean"],
+                               df[df["Timestamp"] < "2024-01-02"]["Pressure"].mean(), places=9)
+
+        hourly = self.client.get("/api/rollups/", {"equipment": "P-3", "start": "2024-01-02",
+                                                   "end": "2024-01-02"}).data
+        self.assertEqual(hourly["resolution"], ReadingRollup.HOUR)
+        self.assertEqual(list(hourly["series"]), ["P-3"])
+        day = df[(df["Equipment Name"] == "P-3") & (df["Timestamp"].dt.date == pd.Timestamp("2024-01-02").date())]
+        self.assertEqual(sum(p["count"] for p in hourly["series"]["P-3"]), len(day))
+
+    def test_invalid_parameters(self):
+        for params in ({"start": "last week"}, {"end": "2024-13-01"}, {"max_points": "all"},
+                       {"resolution": "second"}):
+            with self.subTest(**params):
+                response = self.client.get("/api/rollups/", params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("error", response.data)
+
+
+class ParsingTests(SimpleTestCase):
+    def test_dtype_hints(self):
+        df = read_equipment_csv(equipment_csv(rows=30))
+        self.assertIsInstance(df["Type"].dtype, pd.CategoricalDtype)
+        self.assertEqual(df["Flowrate"].dtype, np.float32)
+        self.assertEqual(df["Equipment Name"].tolist()[:2], ["P-0", "P-1"])
+
+    def test_usecols(self):
+        df = read_equipment_csv(equipment_csv(rows=30), usecols=["Type", "Pressure"])
+        self.assertEqual(list(df.columns), ["Type", "Pressure"])
+        self.assertEqual(equipment_dtypes(["Pressure"]), {"Pressure": "float32"})
+
+    def test_text_in_numeric_column_falls_back_to_inference(self):
+        data = b"Equipment Name,Type,Flowrate\nP-1,Pump,12.5\nP-2,Valve,n/a-ish\n"
+        df = read_equipment_csv(io.BytesIO(data))
+        self.assertEqual(df["Flowrate"].tolist(), ["12.5", "n/a-ish"])
+        with self.assertRaises(ValueError):
+            read_equipment_csv(io.BytesIO(data), chunksize=10, float_dtype="float32").read()
+
+    def test_bad_lines(self):
+        data = b"Equipment Name,Type,Flowrate\nP-1,Pump,12.5\nP-2,Valve,1,extra\nP-3,Pump,3\n"
+        self.assertEqual(read_equipment_csv(data)["Equipment Name"].tolist(), ["P-1", "P-3"])
+        with self.assertRaises(pd.errors.ParserError):
+            read_equipment_csv(data, on_bad_lines="error")
+        with self.assertRaises(ValueError):
+            read_equipment_csv(data, on_bad_lines="ignore")
+
+    def test_engine_choice(self):
+        with mock.patch.object(parsing, "HAVE_PYARROW", True):
+            self.assertEqual(pick_engine(), "pyarrow")
+            self.assertEqual(pick_engine(chunksize=1000), "c")
+        with mock.patch.object(parsing, "HAVE_PYARROW", False):
+            self.assertEqual(pick_engine(), "c")
+
+
+class MetricsTests(EquipmentAPITestCase):
+    def test_requests_are_timed(self):
+        response = self.upload(equipment_csv(rows=20))
+        timing = response["Server-Timing"]
+        self.assertTrue(timing.startswith("total;dur="))
+        self.assertIn("upload-receive;dur=", timing)
+
+        body = self.client.get("/api/metrics/").content.decode()
+        self.assertIn('equipment_http_requests_total{method="POST",status="200",view="upload_csv"}', body)
+        self.assertIn('equipment_span_duration_seconds_count{span="ingest.rollups"}', body)
+        self.assertIn("# TYPE equipment_http_request_duration_seconds histogram", body)
+
+    def test_requires_login(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+
+    @override_settings(EQUIPMENT_METRICS_TOKEN="scrape-token")
+    def test_scrape_token(self):
+        self.client.force_authenticate(None)
+        response = self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer scrape-token")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertEqual(self.client.get("/api/metrics/", HTTP_AUTHORIZATION="Bearer guess").status_code, 401)
+        # the token opens the metrics endpoint only
+        self.assertEqual(self.client.get("/api/datasets/", HTTP_AUTHORIZATION="Bearer scrape-token").status_code, 401)
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.inc("demo_total", {"view": 'say "hi"\\\n'})
+        self.assertIn('demo_total{view="say \\"hi\\"\\\\\\n"} 1', registry.render())
+
+
+class ConditionalResponseTests(EquipmentAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload(equipment_csv(rows=30))
+
+    def test_if_none_match_until_data_changes(self):
+        first = self.client.get("/api/datasets/")
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("private", first["Cache-Control"])
+        self.assertIn("Last-Modified", first)
+        self.assertEqual(self.client.get("/api/datasets/", HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+        # validators are per query
+        self.assertNotEqual(self.client.get("/api/datasets/", {"limit": 1})["ETag"], first["ETag"])
+
+        self.upload(equipment_csv(rows=30, seed=1))
+        changed = self.client.get("/api/datasets/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.data["datasets"]), 2)
+
+    def test_refreshed_summary_changes_validators(self):
+        Dataset.objects.update(summary_version=SUMMARY_VERSION - 1)
+        stale = self.client.get("/api/latest_summary/")["ETag"]
+        # serving it saved the recomputed summary, which bumps updated_at
+        fresh = self.client.get("/api/latest_summary/", HTTP_IF_NONE_MATCH=stale)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh["ETag"], stale)
+        self.assertEqual(self.client.get("/api/latest_summary/", HTTP_IF_NONE_MATCH=fresh["ETag"]).status_code, 304)
+
+    def test_bodies_are_cached_server_side(self):
+        with mock.patch.object(views.DatasetList, "_page", autospec=True,
+                               side_effect=views.DatasetList._page) as page:
+            first = self.client.get("/api/datasets/")
+            second = self.client.get("/api/datasets/")
+            self.assertEqual(page.call_count, 1)
+            self.assertEqual(second.data, first.data)
+
+            # errors are never cached
+            for _ in range(2):
+                self.assertEqual(self.client.get("/api/datasets/", {"limit": 0}).status_code, 400)
+            self.assertEqual(page.call_count, 3)
+
+
+def reference_lttb(x, y, points):
+    # the textbook loop, bucket by bucket
+    n = len(x)
+    every = (n - 2) / (points - 2)
+    keep, a = [0], 0
+    for i in range(points - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        nlo, nhi = hi, min(int((i + 2) * every) + 1, n)
+        if i == points - 3:
+            nx, ny = x[n - 1], y[n - 1]
+        else:
+            nx, ny = np.mean(x[nlo:nhi]), np.mean(y[nlo:nhi])
+        area = [abs((x[a] - nx) * (y[j] - y[a]) - (x[a] - x[j]) * (ny - y[a])) for j in range(lo, hi)]
+        a = lo + int(np.argmax(area))
+        keep.append(a)
+    return keep + [n - 1]
+
+
+class DownsampleTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.x = np.arange(1000, dtype=float)
+        self.y = np.sin(self.x / 40) + rng.normal(0, 0.05, 1000)
+        self.y[613] = 9.0  # a spike that striding would skip
+
+    def test_lttb_matches_reference(self):
+        # 1002 points: the 1000 interior ones split evenly, so bucket edges need no rounding
+        x = np.arange(1002, dtype=float)
+        y = np.random.default_rng(3).normal(0, 1, 1002)
+        for points in (3, 7, 12, 52, 202):
+            with self.subTest(points=points):
+                self.assertEqual(lttb(x, y, points).tolist(), reference_lttb(x, y, points))
+
+    def test_lttb_keeps_ends_and_spikes(self):
+        for points in (3, 10, 48, 200):
+            with self.subTest(points=points):
+                keep = lttb(self.x, self.y, points)
+                self.assertEqual(len(keep), points)
+                self.assertEqual((keep[0], keep[-1]), (0, 999))
+                self.assertTrue(np.all(np.diff(keep) > 0))
+                self.assertIn(613, keep)
+
+    def test_minmax_keeps_every_extreme(self):
+        keep = minmax(self.x, self.y, 50)
+        self.assertLessEqual(len(keep), 50)
+        self.assertEqual((keep[0], keep[-1]), (0, 999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        edges = np.linspace(0, 1000, 25).astype(int)
+        for bucket in (np.arange(lo, hi) for lo, hi in zip(edges[:-1], edges[1:])):
+            self.assertIn(bucket[np.argmax(self.y[bucket])], keep)
+            self.assertIn(bucket[np.argmin(self.y[bucket])], keep)
+
+    def test_datetimes_and_short_series(self):
+        stamps = pd.date_range("2024-01-01", periods=1000, freq="min").values
+        x, y = downsample(stamps, self.y, 100)
+        self.assertEqual(x.dtype, stamps.dtype)
+        self.assertIn(9.0, y)
+        x, y = downsample(stamps[:20], self.y[:20], 100, "minmax")
+        self.assertEqual(len(x), 20)
+
+    def test_lttb_against_striding(self):
+        # the spike survives where every n-th point would lose it
+        self.assertNotIn(9.0, self.y[::10])
+        self.assertIn(9.0, downsample(self.x, self.y, 100)[1])
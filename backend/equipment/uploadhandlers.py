@@ -0,0 +1,32 @@
+import hashlib
+
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """
+    Computes the sha256 of every uploaded file while the request body is
+    being received and passes the data on untouched to the next handler.
+    Must be inserted first, before ``request.FILES`` is accessed.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.digests = {}
+        self._hasher = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self._hasher = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self._hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.digests.setdefault(self.field_name, []).append(self._hasher.hexdigest())
+        return None
+
+    def digest(self, field_name, index=0):
+        digests = self.digests.get(field_name, [])
+        return digests[index] if index < len(digests) else None
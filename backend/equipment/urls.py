@@ -3,7 +3,14 @@ from . import views
 
 urlpatterns = [
     path('upload/', views.UploadCSV.as_view(), name='upload_csv'),
+    path('upload/bulk/', views.BulkUploadCSV.as_view(), name='bulk_upload_csv'),
+    path('jobs/<int:id>/', views.IngestJobStatus.as_view(), name='ingest_job_status'),
     path('datasets/', views.DatasetList.as_view(), name='dataset_list'),
     path('download/<int:id>/', views.DatasetDownload.as_view(), name='dataset_download'),
+    path('columns/<int:id>/', views.DatasetColumns.as_view(), name='dataset_columns'),
+    path('query/<int:id>/', views.DatasetQuery.as_view(), name='dataset_query'),
+    path('readings/', views.ReadingList.as_view(), name='reading_list'),
+    path('rollups/', views.RollupSeries.as_view(), name='rollup_series'),
     path('latest_summary/', views.LatestSummary.as_view(), name='latest_summary'),
+    path('metrics/', views.Metrics.as_view(), name='metrics'),
 ]
@@ -3,99 +3,432 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
-from .models import Dataset
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.crypto import constant_time_compare
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from .models import Dataset, EquipmentReading, IngestJob, ReadingRollup
+from .bulk import ingest_bulk, stage_uploads
+from .columnar import ColumnarWriter, store_path
+from .ingest import (
+    UPLOAD_DIR, content_path, create_dataset, ensure_store, find_duplicate, ingest_csv, new_storage_key,
+    refresh_summary, reuse_dataset, store_content,
+)
+from .httpcache import conditional_response, datasets_state, query_key, strong_etag
+from .instrumentation import REGISTRY, span
+from .jobs import ASYNC_INGEST, enqueue, enqueue_index
+from .query import QueryError, parse_query, run_query
+from .rollups import DEFAULT_MAX_POINTS, rollup_series
+from .streaming import DownloadSource, csv_download_response
+from .summary import SUMMARY_VERSION
+from .uploadhandlers import ContentHashUploadHandler
+import hashlib
 import os
-import pandas as pd
-
-UPLOAD_DIR = os.path.join(settings.MEDIA_ROOT, "datasets")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-def compute_summary(df):
-    summary = {
-        "total_rows": len(df),
-        "columns": list(df.columns),
-        "preview": df.head(5).to_dict(orient="records"),
-        "type_distribution": {},
-        "averages": {}
-    }
-    if "Type" in df.columns:
-        summary["type_distribution"] = df["Type"].value_counts().to_dict()
-    for col in ["Flowrate", "Pressure", "Temperature"]:
-        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
-            summary["averages"][f"{col.lower()}_avg"] = df[col].mean()
-    return summary
+import zipfile
+from datetime import datetime, time, timezone as dt_timezone
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+LIST_FIELDS = ("id", "file_name", "uploaded_at", "summary")
+MAX_READINGS_PAGE_SIZE = 1000
+READING_VALUE_FIELDS = ("flowrate", "pressure", "temperature")
+
+
+def _flag(request, name, default):
+    value = str(request.query_params.get(name, request.data.get(name, ""))).lower()
+    if value in ("1", "true", "yes"):
+        return True
+    if value in ("0", "false", "no"):
+        return False
+    return default
+
+
+def _parse_when(value, end_of_day=False):
+    # ISO datetime, or a bare date meaning the start (or end) of that day; naive values are UTC
+    # dates first: parse_datetime also accepts a bare date, as midnight
+    day = parse_date(value)
+    if day is not None:
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    else:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"Invalid date: {value}")
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _metrics_token_matches(request):
+    token = getattr(settings, "EQUIPMENT_METRICS_TOKEN", None)
+    return bool(token) and constant_time_compare(request.META.get("HTTP_AUTHORIZATION", ""), f"Bearer {token}")
+
+
+class MetricsAccess(IsAuthenticated):
+    # scrapers present EQUIPMENT_METRICS_TOKEN as a bearer token; anyone else must be logged in
+    def has_permission(self, request, view):
+        return _metrics_token_matches(request) or super().has_permission(request, view)
+
+
+def _split_param(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else []
+
+
+def _index_pending(dataset_id=None):
+    """
+    Whether readings and rollups are still being built, for every dataset or
+    just ``dataset_id``. A deduplicated copy waits on the upload that owns its store.
+    """
+    pending = Dataset.objects.filter(index_pending=True)
+    if dataset_id is not None:
+        pending = pending.filter(storage_key__in=Dataset.objects.filter(id=dataset_id).exclude(storage_key="")
+                                 .values("storage_key"))
+    return pending.exists()
+
+
+def encode_cursor(ds):
+    raw = f"{ds.uploaded_at.isoformat()}|{ds.id}"
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(cursor):
+    try:
+        uploaded_at, last_id = urlsafe_base64_decode(cursor).decode().rsplit("|", 1)
+        return datetime.fromisoformat(uploaded_at), int(last_id)
+    except (TypeError, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+
 
 class UploadCSV(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
     def post(self, request):
-        file = request.FILES.get("file")
+        # hash the upload while it is received so duplicates can skip parsing entirely
+        hashing = ContentHashUploadHandler(request)
+        request.upload_handlers.insert(0, hashing)
+        with span("upload.receive") as received:
+            file = request.FILES.get("file")
+            received.bytes = file.size if file else 0
         if not file:
             return Response({"error": "No file uploaded"}, status=400)
 
-        file_path = os.path.join(UPLOAD_DIR, file.name)
+        digest = hashing.digest("file")
+        with span("upload.dedup"):
+            existing = find_duplicate(digest)
+        if existing is not None:
+            try:
+                ds = reuse_dataset(existing, file.name)
+            except Exception as e:
+                return Response({"error": f"Could not save to database: {str(e)}"}, status=500)
+            return Response({"message": "Uploaded successfully", "summary": ds.summary, "deduplicated": True})
+
+        if _flag(request, "async", ASYNC_INGEST):
+            return self._enqueue(file)
 
+        storage_key = new_storage_key()
+        hasher = hashlib.sha256()
+        # the digest is only unknown if the body was parsed before our handler was installed
+        file_path = content_path(digest) if digest else os.path.join(UPLOAD_DIR, f".{storage_key}.csv")
         try:
-            with open(file_path, "wb") as f:
-                for chunk in file.chunks():
-                    f.write(chunk)
-            df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip')
+            summary = ingest_csv(file.chunks(), file_path, consumers=[ColumnarWriter(store_path(storage_key))],
+                                 hasher=hasher)
+            if not digest:
+                digest = hasher.hexdigest()
+                os.replace(file_path, content_path(digest))
+                file_path = content_path(digest)
         except Exception as e:
             return Response({"error": f"Could not save/parse CSV: {str(e)}"}, status=500)
 
-        summary = compute_summary(df)
+        try:
+            create_dataset(file.name, file_path, storage_key, summary, digest)
+        except Exception as e:
+            return Response({"error": f"Could not save to database: {str(e)}"}, status=500)
+        enqueue_index()
 
+        return Response({"message": "Uploaded successfully", "summary": summary})
+
+    def _enqueue(self, file):
+        # only store the bytes here; parsing, summary and storage run on the worker pool
         try:
-            file.seek(0)
-            Dataset.objects.create(
+            _, file_path = store_content(file.chunks())
+            job = IngestJob.objects.create(
                 file_name=file.name,
-                raw_csv=file.read().decode(errors='ignore'),
-                summary=summary
+                stored_file=os.path.relpath(file_path, settings.MEDIA_ROOT),
+                bytes_total=file.size or 0,
             )
+        except Exception as e:
+            return Response({"error": f"Could not stage CSV: {str(e)}"}, status=500)
+        enqueue(job)
+        return Response({"message": "Upload queued", "job_id": job.id, "status": job.status}, status=202)
+
+class BulkUploadCSV(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        files = request.FILES.getlist("files") or request.FILES.getlist("file")
+        if not files:
+            return Response({"error": "No files uploaded"}, status=400)
+
+        try:
+            staged = stage_uploads(files)
+        except (ValueError, zipfile.BadZipFile) as e:
+            return Response({"error": f"Could not read upload: {str(e)}"}, status=400)
+        except Exception as e:
+            return Response({"error": f"Could not save CSV: {str(e)}"}, status=500)
+        if not staged:
+            return Response({"error": "No CSV files found in upload"}, status=400)
+
+        try:
+            datasets, errors = ingest_bulk(staged)
         except Exception as e:
             return Response({"error": f"Could not save to database: {str(e)}"}, status=500)
 
-        return Response({"message": "Uploaded successfully", "summary": summary})
+        return Response({
+            "message": f"Uploaded {len(datasets)} of {len(staged)} files",
+            "datasets": [{"id": ds.id, "file_name": ds.file_name, "summary": ds.summary} for ds in datasets],
+            "errors": errors,
+        }, status=200 if datasets else 400)
+
+class IngestJobStatus(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        try:
+            job = IngestJob.objects.select_related("dataset").get(id=id)
+        except IngestJob.DoesNotExist:
+            return Response({"error": "Job not found"}, status=404)
+        body = {
+            "job_id": job.id,
+            "status": job.status,
+            "file_name": job.file_name,
+            "progress": job.progress,
+            "bytes_done": job.bytes_done,
+            "bytes_total": job.bytes_total,
+            "rows_done": job.rows_done,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+        }
+        if job.status == IngestJob.FAILED:
+            body["error"] = job.error
+        if job.dataset is not None:
+            body["dataset_id"] = job.dataset.id
+            body["summary"] = job.dataset.summary
+        return Response(body)
 
 class DatasetList(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        datasets = Dataset.objects.all().order_by('-uploaded_at')
-        return Response([
-            {"id": ds.id, "file_name": ds.file_name, "uploaded_at": ds.uploaded_at, "summary": ds.summary}
-            for ds in datasets
-        ])
+        count, last_id, last_modified = datasets_state()
+        etag = strong_etag("datasets", count, last_id, last_modified, SUMMARY_VERSION, query_key(request))
+        return conditional_response(request, etag, last_modified, lambda: self._page(request))
+
+    def _page(self, request):
+        try:
+            limit = min(int(request.query_params.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({"error": "limit must be a positive integer"}, status=400)
+
+        fields = _split_param(request.query_params.get("fields")) or list(LIST_FIELDS)
+        unknown = [f for f in fields if f not in LIST_FIELDS]
+        if unknown:
+            return Response({"error": f"Unknown fields: {', '.join(unknown)}"}, status=400)
+        summary_fields = _split_param(request.query_params.get("summary_fields"))
+
+        # raw_csv is never loaded: only the projected columns (plus the cursor keys) are selected
+        datasets = Dataset.objects.only(*{"id", "uploaded_at", *fields}).order_by('-uploaded_at', '-id')
+        cursor = request.query_params.get("cursor")
+        if cursor:
+            try:
+                uploaded_at, last_id = decode_cursor(cursor)
+            except ValueError:
+                return Response({"error": "Invalid cursor"}, status=400)
+            datasets = datasets.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=last_id))
+
+        page = list(datasets[:limit + 1])
+        next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+        rows = []
+        for ds in page[:limit]:
+            row = {f: getattr(ds, f) for f in fields}
+            if "summary" in row and summary_fields and isinstance(ds.summary, dict):
+                row["summary"] = {k: v for k, v in ds.summary.items() if k in summary_fields}
+            rows.append(row)
+        return Response({"datasets": rows, "next_cursor": next_cursor})
 
 class DatasetDownload(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, id=None, filename=None):
         try:
-            if id is not None:
-                ds = Dataset.objects.get(id=id)
-            elif filename is not None:
-                ds = Dataset.objects.get(file_name=filename)
+            with span("download.lookup"):
+                if id is not None:
+                    ds = Dataset.objects.defer("summary").get(id=id)
+                elif filename is not None:
+                    ds = Dataset.objects.defer("summary").get(file_name=filename)
+                else:
+                    return Response({"error": "Provide id or filename"}, status=400)
+        except Dataset.DoesNotExist:
+            return Response({"error": "Dataset not found"}, status=404)
+        try:
+            # strong validator: the dataset and its exact bytes
+            tag = f"{ds.id}-{ds.content_hash}" if ds.content_hash else ""
+            if ds.stored_file:
+                source = DownloadSource(path=os.path.join(settings.MEDIA_ROOT, ds.stored_file), tag=tag)
             else:
-                return Response({"error": "Provide id or filename"}, status=400)
+                source = DownloadSource(data=ds.raw_csv.encode(), tag=tag)
+        except OSError as e:
+            return Response({"error": f"Could not read CSV: {str(e)}"}, status=500)
+        return csv_download_response(request, source, ds.file_name, last_modified=ds.uploaded_at)
+
+class DatasetColumns(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        try:
+            ds = Dataset.objects.defer("raw_csv", "summary").get(id=id)
+        except Dataset.DoesNotExist:
+            return Response({"error": "Dataset not found"}, status=404)
+        try:
+            store = ensure_store(ds)
+        except Exception as e:
+            return Response({"error": f"Could not read dataset: {str(e)}"}, status=500)
+
+        requested = request.query_params.get("columns")
+        names = [c for c in requested.split(",") if c] if requested else store.columns
+        missing = [c for c in names if c not in store.columns]
+        if missing:
+            return Response({"error": f"Unknown columns: {', '.join(missing)}"}, status=400)
+
+        df = store.to_pandas(names)
+        df = df.astype(object).where(df.notna(), None)
+        return Response({
+            "id": ds.id,
+            "total_rows": len(store),
+            "columns": {name: df[name].tolist() for name in names},
+        })
+
+class DatasetQuery(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, id):
+        return self._run(id, request.query_params)
+
+    def post(self, request, id):
+        return self._run(id, request.data)
+
+    def _run(self, id, params):
+        try:
+            ds = Dataset.objects.defer("raw_csv", "summary").get(id=id)
         except Dataset.DoesNotExist:
             return Response({"error": "Dataset not found"}, status=404)
-        return Response(ds.raw_csv)
+        try:
+            query = parse_query(params)
+            store = ensure_store(ds)
+            result = run_query(store, query)
+        except QueryError as e:
+            return Response({"error": str(e)}, status=400)
+        except Exception as e:
+            return Response({"error": f"Could not query dataset: {str(e)}"}, status=500)
+        result["id"] = ds.id
+        return Response(result)
+
+class ReadingList(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            limit = min(int(params.get("limit", DEFAULT_PAGE_SIZE)), MAX_READINGS_PAGE_SIZE)
+            after = int(params.get("after", 0))
+            if limit < 1:
+                raise ValueError
+        except ValueError:
+            return Response({"error": "limit and after must be positive integers"}, status=400)
+        try:
+            dataset = int(params["dataset"]) if params.get("dataset") else None
+        except ValueError:
+            return Response({"error": "dataset must be an integer id"}, status=400)
+
+        readings = EquipmentReading.objects.all()
+        if params.get("type"):
+            readings = readings.filter(equipment_type__in=_split_param(params["type"]))
+        if params.get("equipment"):
+            readings = readings.filter(equipment_name__in=_split_param(params["equipment"]))
+        if dataset is not None:
+            readings = readings.filter(dataset_id=dataset)
+        try:
+            for param, lookup in (("start", "timestamp__gte"), ("end", "timestamp__lte")):
+                if params.get(param):
+                    readings = readings.filter(**{lookup: _parse_when(params[param], end_of_day=param == "end")})
+            for field in READING_VALUE_FIELDS:
+                for bound, lookup in (("min", "gte"), ("max", "lte")):
+                    if params.get(f"{bound}_{field}"):
+                        readings = readings.filter(**{f"{field}__{lookup}": float(params[f"{bound}_{field}"])})
+        except (TypeError, ValueError):
+            return Response({"error": "Invalid filter value"}, status=400)
+
+        page = list(readings.filter(id__gt=after).order_by("id")[:limit + 1].values(
+            "id", "dataset_id", "equipment_name", "equipment_type", *READING_VALUE_FIELDS, "timestamp"))
+        next_after = page[limit - 1]["id"] if len(page) > limit else None
+        # rows of a dataset whose index is still building show up once it is done
+        return Response({"readings": page[:limit], "next_after": next_after,
+                         "index_pending": _index_pending(dataset)})
+
+class RollupSeries(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            start = _parse_when(params["start"]) if params.get("start") else None
+            end = _parse_when(params["end"], end_of_day=True) if params.get("end") else None
+            max_points = max(1, int(params.get("max_points", DEFAULT_MAX_POINTS)))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        resolution = params.get("resolution") or None
+        if resolution and resolution not in dict(ReadingRollup.RESOLUTION_CHOICES):
+            return Response({"error": f"Unknown resolution: {resolution}"}, status=400)
+        return Response(rollup_series(start, end, _split_param(params.get("equipment")), max_points, resolution))
 
 class LatestSummary(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        ds = Dataset.objects.all().order_by('-uploaded_at').first()
-        if not ds:
+        with span("summary.lookup"):
+            latest = Dataset.objects.order_by('-uploaded_at').values_list("id", "uploaded_at", "updated_at").first()
+        if not latest:
             return Response({"error": "No datasets found"}, status=404)
+        # the summary is stored with the dataset; only index_pending changes once the index is built
+        pending = _index_pending(latest[0])
+        etag = strong_etag("latest_summary", *latest, pending, SUMMARY_VERSION)
+        return conditional_response(request, etag, latest[2], lambda: self._summary(latest[0], pending))
 
+    def _summary(self, id, pending):
+        ds = Dataset.objects.only("id", "file_name", "stored_file", "summary", "summary_version").get(id=id)
         try:
-            df = pd.read_csv(os.path.join(UPLOAD_DIR, ds.file_name), encoding='utf-8', on_bad_lines='skip')
+            with span("summary.refresh"):
+                summary = dict(refresh_summary(ds))
         except Exception as e:
             return Response({"error": f"Could not read CSV: {str(e)}"}, status=500)
 
-        summary = compute_summary(df)
         summary["file_name"] = ds.file_name
+        summary["index_pending"] = pending
         return Response({"latest_summary": summary})
+
+class Metrics(APIView):
+    """Prometheus text exposition of the request and phase metrics."""
+    permission_classes = [MetricsAccess]
+
+    def get_authenticators(self):
+        # the metrics token is not a JWT, so it must not reach the default authenticators
+        if _metrics_token_matches(self.request):
+            return []
+        return super().get_authenticators()
+
+    def get(self, request):
+        return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
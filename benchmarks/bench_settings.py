@@ -0,0 +1,9 @@
+"""Backend settings for benchmark runs: a throwaway database and media root under BENCH_DIR."""
+import os
+
+from config.settings import *  # noqa: F401,F403
+
+BENCH_DIR = os.environ["BENCH_DIR"]
+DATABASES = {"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": os.path.join(BENCH_DIR, "db.sqlite3")}}
+MEDIA_ROOT = os.path.join(BENCH_DIR, "media")
+os.makedirs(MEDIA_ROOT, exist_ok=True)
@@ -0,0 +1,48 @@
+"""
+Compare two benchmark result files written by run.py.
+
+    python benchmarks/compare.py benchmarks/results/old.json benchmarks/results/new.json
+
+Exits non-zero when any shared benchmark's median got slower than --threshold.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(base, new):
+    """``[(name, base_median, new_median, ratio)]`` for benchmarks present in both reports."""
+    rows = []
+    for name, result in new["results"].items():
+        old = base["results"].get(name)
+        if old is not None:
+            rows.append((name, old["median"], result["median"], result["median"] / old["median"]))
+    return rows
+
+
+def print_comparison(rows, threshold=1.10):
+    for name, old, new, ratio in rows:
+        flag = "  slower" if ratio > threshold else "  faster" if ratio < 1 / threshold else ""
+        print(f"{name:32s} {old * 1000:9.1f} ms -> {new * 1000:9.1f} ms  x{ratio:5.2f}{flag}")
+    return [name for name, _, _, ratio in rows if ratio > threshold]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.10, help="slowdown ratio that counts as a regression")
+    args = parser.parse_args(argv)
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    for key in ("rows", "equipment", "dirty", "seed"):
+        if base["meta"].get(key) != new["meta"].get(key):
+            print(f"warning: {key} differs ({base['meta'].get(key)} vs {new['meta'].get(key)})")
+    regressions = print_comparison(compare(base, new), args.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Seeded generator of equipment CSVs in the schema the app ingests.
+
+    python benchmarks/generate.py out.csv --rows 1000000 --equipment 500 --dirty 0.01
+
+The same arguments always produce the same bytes.
+"""
+import argparse
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+TYPES = ["Pump", "Compressor", "Valve", "HeatExchanger", "Reactor", "Condenser"]
+
+# Per-type (flowrate, pressure, temperature) means, so correlations and
+# type filters behave like plant data rather than white noise.
+TYPE_PROFILES = {
+    "Pump": (140, 5.5, 105),
+    "Compressor": (95, 8.5, 125),
+    "Valve": (70, 4.5, 100),
+    "HeatExchanger": (150, 6.0, 130),
+    "Reactor": (120, 7.5, 140),
+    "Condenser": (160, 5.0, 90),
+}
+
+
+def equipment_frame(rows, equipment=5000, types=TYPES, seed=0, timestamps=True, interval="10s"):
+    rng = np.random.default_rng(seed)
+    tags = rng.integers(0, equipment, rows)
+    kinds = np.array(types)[tags % len(types)]
+    profile = np.array([TYPE_PROFILES.get(t, (120, 6.0, 110)) for t in types])[tags % len(types)]
+    load = rng.normal(0, 1, rows)
+    df = pd.DataFrame({
+        "Equipment Name": np.char.add(np.char.add(kinds.astype(str), "-"), tags.astype(str)),
+        "Type": kinds,
+        "Flowrate": (profile[:, 0] * (1 + 0.15 * load) + rng.normal(0, 5, rows)).round(2),
+        "Pressure": (profile[:, 1] * (1 + 0.10 * load) + rng.normal(0, 0.4, rows)).round(2),
+        "Temperature": (profile[:, 2] + 8 * load + rng.normal(0, 4, rows)).round(1),
+    })
+    if timestamps:
+        df["Timestamp"] = pd.Timestamp("2024-01-01") + np.arange(rows) * pd.Timedelta(interval)
+    return df
+
+
+def _dirty(text, fraction, seed):
+    # malformed lines a plant export really contains: extra fields (dropped by the
+    # parser), truncated rows, missing and "n/a" readings
+    lines = text.split("\n")
+    rng = np.random.default_rng(seed + 1)
+    count = int((len(lines) - 2) * fraction)
+    for i in rng.choice(np.arange(1, len(lines) - 1), size=count, replace=False):
+        fields = lines[i].split(",")
+        kind = rng.integers(0, 4)
+        if kind == 0:
+            fields.append("unexpected")
+        elif kind == 1:
+            fields = fields[:3]
+        elif kind == 2:
+            fields[2] = ""
+        else:
+            fields[2 + rng.integers(0, 3)] = "n/a"
+        lines[i] = ",".join(fields)
+    return "\n".join(lines)
+
+
+def equipment_csv(rows, dirty=0.0, seed=0, **kwargs):
+    """CSV bytes for ``equipment_frame(rows, seed=seed, **kwargs)`` with ``dirty`` of the lines damaged."""
+    buf = io.StringIO()
+    equipment_frame(rows, seed=seed, **kwargs).to_csv(buf, index=False, date_format="%Y-%m-%dT%H:%M:%S")
+    text = buf.getvalue()
+    if dirty:
+        text = _dirty(text, dirty, seed)
+    return text.encode("utf-8")
+
+
+def write_equipment_csv(path, rows, **kwargs):
+    data = equipment_csv(rows, **kwargs)
+    with open(path, "wb") as f:
+        f.write(data)
+    return os.path.getsize(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--equipment", type=int, default=500)
+    parser.add_argument("--types", default=",".join(TYPES), help="comma-separated equipment types")
+    parser.add_argument("--no-timestamps", action="store_true")
+    parser.add_argument("--dirty", type=float, default=0.0, help="fraction of malformed lines")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    size = write_equipment_csv(
+        args.path, args.rows, equipment=args.equipment, types=args.types.split(","),
+        timestamps=not args.no_timestamps, dirty=args.dirty, seed=args.seed,
+    )
+    print(f"wrote {args.rows:,} rows ({size / 1e6:.1f} MB) to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Memory footprint of a loaded equipment dataset.
+
+    python benchmarks/memory_bench.py --rows 100000 1000000 5000000
+
+For each size, compares a default ``pd.read_csv`` frame, the dtype-hinted
+``read_equipment_csv`` frame and the ``CompactDataset`` built from it.
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Desktop-Frontend"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from compact import CompactDataset, StringPool  # noqa: E402
+from equipment.parsing import read_equipment_csv  # noqa: E402
+from generate import write_equipment_csv  # noqa: E402
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(deep=True).sum())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--equipment", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>10} {'csv MB':>8} {'read_csv MB':>12} {'hinted MB':>10} {'compact MB':>11} {'ratio':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"equipment-{rows}.csv")
+            size = write_equipment_csv(path, rows, equipment=args.equipment)
+            baseline = frame_bytes(pd.read_csv(path))
+            gc.collect()
+            hinted_df = read_equipment_csv(path)
+            hinted = frame_bytes(hinted_df)
+            compact = CompactDataset.from_frame(hinted_df, pool=StringPool())
+            del hinted_df
+            gc.collect()
+            print(f"{rows:>10,} {size / 1e6:>8.1f} {baseline / 1e6:>12.1f} {hinted / 1e6:>10.1f} "
+                  f"{compact.nbytes / 1e6:>11.1f} {baseline / compact.nbytes:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
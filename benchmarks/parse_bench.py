@@ -0,0 +1,62 @@
+"""
+CSV parse throughput for the equipment schema.
+
+    python benchmarks/parse_bench.py --rows 1000000
+
+Writes a generated equipment CSV to a temporary directory and reports the
+MB/s of plain ``pd.read_csv`` against ``read_equipment_csv`` on each
+available engine, with and without a ``usecols`` projection.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from equipment.parsing import HAVE_PYARROW, read_equipment_csv  # noqa: E402
+from generate import write_equipment_csv  # noqa: E402
+
+
+def best_of(repeat, fn):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    cases = [
+        ("pd.read_csv (baseline)", lambda p: pd.read_csv(p)),
+        ("read_equipment_csv engine=c", lambda p: read_equipment_csv(p, engine="c")),
+        ("read_equipment_csv engine=c usecols", lambda p: read_equipment_csv(p, engine="c", usecols=["Type", "Flowrate"])),
+    ]
+    if HAVE_PYARROW:
+        cases += [
+            ("read_equipment_csv engine=pyarrow", lambda p: read_equipment_csv(p, engine="pyarrow")),
+            ("read_equipment_csv engine=pyarrow usecols",
+             lambda p: read_equipment_csv(p, engine="pyarrow", usecols=["Type", "Flowrate"])),
+        ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "equipment.csv")
+        size = write_equipment_csv(path, args.rows, timestamps=False)
+        print(f"{args.rows:,} rows, {size / 1e6:.1f} MB" + ("" if HAVE_PYARROW else " (pyarrow not installed)"))
+        for label, fn in cases:
+            seconds = best_of(args.repeat, lambda: fn(path))
+            mem = fn(path).memory_usage(deep=True).sum() / 1e6
+            print(f"{label:45s} {seconds:7.3f} s {size / 1e6 / seconds:8.1f} MB/s {mem:8.1f} MB in memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Benchmark suite for the ingest and analytics paths.
+
+    python benchmarks/run.py --rows 200000 --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/run.py --only api --baseline benchmarks/results/<older>.json --threshold 1.2
+
+Backend benchmarks run in-process against a throwaway database and media
+root (see bench_settings.py) through the DRF test client; desktop ones
+drive MainWindow headlessly with the Qt "offscreen" platform. Every input
+comes from the seeded generator, so two runs with the same arguments are
+comparable across commits. With --baseline the run exits non-zero when any
+median is slower than the baseline's by more than --threshold.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, os.path.join(ROOT, "backend"))
+
+import pandas as pd  # noqa: E402
+
+from compare import compare, print_comparison  # noqa: E402
+from generate import equipment_csv  # noqa: E402
+
+BENCHMARKS = []
+
+
+def benchmark(group):
+    def register(fn):
+        BENCHMARKS.append((group, fn.__name__.replace("bench_", f"{group}."), fn))
+        return fn
+    return register
+
+
+def measure(run, repeat, setup=None):
+    """Wall time of ``run`` over ``repeat`` calls; ``setup(i)`` builds each call's argument untimed."""
+    times = []
+    for i in range(repeat):
+        args = (setup(i),) if setup else ()
+        t0 = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+class Context:
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.csv = equipment_csv(args.rows, equipment=args.equipment, dirty=args.dirty, seed=args.seed)
+        self.frame = pd.read_csv(BytesIO(self.csv), on_bad_lines="skip")
+        self._client = None
+        self._window = None
+
+    # -- backend --
+    def client(self):
+        if self._client is None:
+            os.environ["BENCH_DIR"] = self.workdir
+            os.environ["DJANGO_SETTINGS_MODULE"] = "bench_settings"
+            import django
+            django.setup()
+            from django.contrib.auth.models import User
+            from django.core.management import call_command
+            from rest_framework.test import APIClient
+
+            call_command("migrate", verbosity=0)
+            self._client = APIClient()
+            self._client.force_authenticate(User.objects.create(username="bench"))
+            self.upload(self.csv, "base.csv")
+            from equipment.models import Dataset
+            self.dataset_id = Dataset.objects.latest("id").id
+        return self._client
+
+    def upload(self, data, name):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        resp = self.client().post("/api/upload/", {"file": SimpleUploadedFile(name, data, "text/csv")},
+                                  format="multipart")
+        assert resp.status_code == 200, resp.content[:200]
+        return resp
+
+    # -- desktop --
+    def window(self):
+        if self._window is None:
+            os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+            sys.path.insert(0, os.path.join(ROOT, "Desktop-Frontend"))
+            spec = importlib.util.spec_from_file_location("desk_app", os.path.join(ROOT, "Desktop-Frontend", "desk-app.py"))
+            desk_app = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(desk_app)
+            self._app = desk_app.QApplication.instance() or desk_app.QApplication([])
+            self._window = desk_app.MainWindow()
+            # charts skip drawing while hidden, so show the window to time real redraws
+            self._window.resize(1200, 820)
+            self._window.show()
+            dataset = desk_app.CompactDataset.from_frame(desk_app.read_equipment_csv(self.csv))
+            # what a finished background load hands to the GUI thread: table, filters, date range, charts
+            self._window._show_dataset({"file_name": "bench.csv"}, dataset, dataset.to_pandas(), None)
+            self._app.processEvents()
+        return self._window
+
+    def redraw(self):
+        # chart redraws are queued with draw_idle; run them inside the timed call
+        self._app.processEvents()
+
+
+@benchmark("summary")
+def bench_compute_summary(ctx):
+    from equipment.summary import compute_summary
+    return measure(lambda: compute_summary(ctx.frame), ctx.args.repeat)
+
+
+@benchmark("api")
+def bench_upload(ctx):
+    ctx.client()
+    # fresh content per run, or the upload is answered from the dedup index
+    setup = lambda i: equipment_csv(ctx.args.rows, equipment=ctx.args.equipment, dirty=ctx.args.dirty,  # noqa: E731
+                                    seed=ctx.args.seed + 1 + i)
+    return measure(lambda data: ctx.upload(data, "bench.csv"), ctx.args.repeat, setup)
+
+
+@benchmark("api")
+def bench_upload_duplicate(ctx):
+    ctx.client()
+    return measure(lambda: ctx.upload(ctx.csv, "again.csv"), ctx.args.repeat)
+
+
+@benchmark("api")
+def bench_dataset_list(ctx):
+    client = ctx.client()
+    return measure(lambda: client.get("/api/datasets/").json(), ctx.args.repeat)
+
+
+@benchmark("api")
+def bench_download(ctx):
+    client = ctx.client()
+
+    def run():
+        resp = client.get(f"/api/download/{ctx.dataset_id}/")
+        assert sum(len(block) for block in resp.streaming_content) == len(ctx.csv)
+    return measure(run, ctx.args.repeat)
+
+
+@benchmark("api")
+def bench_latest_summary(ctx):
+    client = ctx.client()
+    return measure(lambda: client.get("/api/latest_summary/").json(), ctx.args.repeat)
+
+
+@benchmark("desktop")
+def bench_apply_filters(ctx):
+    window = ctx.window()
+    window.min_flow.setText("100")
+    return measure(lambda: (window.apply_filters_and_update(), ctx.redraw()), ctx.args.repeat)
+
+
+@benchmark("desktop")
+def bench_filter_change(ctx):
+    window = ctx.window()
+    # a new Min Flow value per run, so neither masks nor views are already cached
+    setup = lambda i: window.min_flow.setText(str(90 + i))  # noqa: E731
+    return measure(lambda _: (window.apply_filters_and_update(), ctx.redraw()), ctx.args.repeat, setup)
+
+
+@benchmark("desktop")
+def bench_update_insights(ctx):
+    window = ctx.window()
+    return measure(lambda: window._update_insights(window.current_df), ctx.args.repeat)
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--equipment", type=int, default=500)
+    parser.add_argument("--dirty", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", action="append", help="group or benchmark name prefix; repeatable")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against an earlier results file")
+    parser.add_argument("--threshold", type=float, default=1.10,
+                        help="slowdown ratio against --baseline that counts as a regression")
+    args = parser.parse_args(argv)
+
+    selected = [(group, name, fn) for group, name, fn in BENCHMARKS
+                if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="equipment-bench-") as workdir:
+        ctx = Context(args, workdir)
+        print(f"{args.rows:,} rows, {len(ctx.csv) / 1e6:.1f} MB, repeat {args.repeat}")
+        for group, name, fn in selected:
+            try:
+                times = fn(ctx)
+            except ImportError as e:
+                print(f"{name:32s} skipped ({e})")
+                continue
+            results[name] = {
+                "group": group,
+                "runs": times,
+                "best": min(times),
+                "median": statistics.median(times),
+                "mb_per_s": len(ctx.csv) / 1e6 / statistics.median(times),
+            }
+            print(f"{name:32s} best {min(times) * 1000:9.1f} ms  median {statistics.median(times) * 1000:9.1f} ms")
+
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "rows": args.rows,
+            "bytes": len(ctx.csv),
+            "equipment": args.equipment,
+            "dirty": args.dirty,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = print_comparison(compare(json.load(f), report), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) slower than x{args.threshold:.2f}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())